@@ -1,37 +1,954 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, g
+import atexit
+import io
+import json
+import os
+import queue
 import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date
+
+import hospital_lab_system as hls
 
 app = Flask(__name__)
+app.config["DATABASE"] = os.environ.get("HOSPITAL_DB", "hospital.db")
+# SQLite PRAGMA preset, see hospital_lab_system.PERF_PROFILES.
+app.config["DB_PROFILE"] = hls.DB_PROFILE
+# Keep one connection per worker thread instead of reconnecting per request.
+app.config["DB_POOL"] = os.environ.get("HOSPITAL_DB_POOL", "1") != "0"
+app.config["DB_CACHED_STATEMENTS"] = 256
+# ETags and cached list responses, invalidated by this process's writes.
+# Disable when other processes (or the console app) write to the database.
+app.config["RESPONSE_CACHE"] = os.environ.get("HOSPITAL_RESPONSE_CACHE", "1") != "0"
+app.config["RESPONSE_CACHE_MAX_BYTES"] = 32 * 1024 * 1024
+# Per-route latency and SQL histograms at /metrics, and a slow-query log.
+# Read once at import: when off, no hooks run and connections are not wrapped.
+app.config["METRICS"] = os.environ.get("HOSPITAL_METRICS", "0") != "0"
+app.config["SLOW_QUERY_MS"] = hls.SLOW_QUERY_MS
+# Funnel add_* writes through one writer thread that commits them in groups.
+app.config["GROUP_COMMIT"] = os.environ.get("HOSPITAL_GROUP_COMMIT", "0") != "0"
+app.config["GROUP_COMMIT_MAX_ROWS"] = 256
+app.config["GROUP_COMMIT_MAX_WAIT"] = 0.005  # seconds a batch stays open for more rows
+# Serve listings from a read-only snapshot at most this many seconds old
+# (0 = read the live database); see hospital_lab_system.Snapshot.
+app.config["SNAPSHOT_MAX_AGE"] = hls.SNAPSHOT_MAX_AGE
+# Rows moved out by `hospital_lab_system.py archive`; listings read them with ?history=1.
+app.config["ARCHIVE_DB"] = hls.archive_path(app.config["DATABASE"])
+
+# ---------- Connection Pool ----------
+class ConnectionPool:
+    """Per-thread SQLite connections that live as long as their worker thread.
+
+    A persistent connection keeps its prepared-statement cache warm, so the
+    connect/parse/close cost is paid once per thread instead of per request.
+    Connections owned by threads that have exited are closed the next time a
+    new connection is opened.
+    """
+
+    def __init__(self, connect, cached_statements=256):
+        self.connect = connect
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owned = []  # (thread, connection)
+
+    def acquire(self, path):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(path)
+        if conn is None:
+            conn = self.connect(path, check_same_thread=False,
+                                cached_statements=self.cached_statements)
+            conns[path] = conn
+            with self._lock:
+                self._reap()
+                self._owned.append((threading.current_thread(), conn))
+        return conn
+
+    def release(self, conn):
+        # Never hand a connection to the next request mid-transaction.
+        if conn.in_transaction:
+            conn.rollback()
+
+    def _reap(self):
+        alive = []
+        for thread, conn in self._owned:
+            if thread.is_alive():
+                alive.append((thread, conn))
+            else:
+                conn.close()
+        self._owned = alive
+
+    def close_all(self):
+        with self._lock:
+            for _, conn in self._owned:
+                conn.close()
+            self._owned = []
+        self._local = threading.local()
+
+
+def open_connection(path, **kwargs):
+    conn = sqlite3.connect(path, factory=hls.connection_class(), **kwargs)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return hls.apply_profile(conn, app.config["DB_PROFILE"])
+
+
+pool = ConnectionPool(open_connection, app.config["DB_CACHED_STATEMENTS"])
+atexit.register(pool.close_all)
+
+
+def get_db():
+    if "db" not in g:
+        path = app.config["DATABASE"]
+        if app.config["DB_POOL"]:
+            g.db = pool.acquire(path)
+        else:
+            g.db = open_connection(path)
+        track_sql(g.db)
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    read_conn = g.pop("read_db", None)
+    if read_conn is not None:
+        read_conn.close()
+    conn = g.pop("db", None)
+    if conn is None:
+        return
+    if app.config["DB_POOL"]:
+        pool.release(conn)
+    else:
+        conn.close()
+
+
+# ---------- Reporting snapshot ----------
+# Listings read a copy of the database that a background thread refreshes
+# every SNAPSHOT_MAX_AGE / 2 seconds, so long scans never share the live
+# file with writers. Snapshot connections are per request: each refresh
+# swaps in a new file, and a pooled connection would keep the old one.
+snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    global snapshot
+    with _snapshot_lock:
+        if snapshot is None:
+            snapshot = hls.Snapshot(app.config["DATABASE"], app.config["SNAPSHOT_MAX_AGE"])
+            snapshot.refresh()
+            snapshot.start()
+        return snapshot
+
+
+def open_read_connection(**kwargs):
+    """A connection for list and report queries: the snapshot if enabled."""
+    if app.config["SNAPSHOT_MAX_AGE"] > 0:
+        return get_snapshot().connect(**kwargs)
+    return open_connection(app.config["DATABASE"], **kwargs)
+
+
+def get_read_db():
+    if app.config["SNAPSHOT_MAX_AGE"] <= 0:
+        return get_db()
+    if "read_db" not in g:
+        g.read_db = track_sql(open_read_connection())
+    return g.read_db
+
+
+# ---------- Response Cache ----------
+class ResponseCache:
+    """LRU cache of rendered GET bodies, capped by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (etag, body, mimetype)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.not_modified = self.evictions = 0
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, key, etag, body, mimetype):
+        # One response may not take more than an eighth of the budget.
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (etag, body, mimetype)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self._bytes -= len(self._entries.pop(key)[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses,
+                "not_modified": self.not_modified, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+response_cache = ResponseCache(app.config["RESPONSE_CACHE_MAX_BYTES"])
+
+# Per-table write counters; any add_* bumps its table, which changes the
+# ETag of every cached response built from it. PROCESS_TAG makes ETags from
+# a previous run never match.
+PROCESS_TAG = uuid.uuid4().hex[:8]
+table_versions = {}
+_versions_lock = threading.Lock()
+
+
+def bump_version(table):
+    with _versions_lock:
+        table_versions[table] = table_versions.get(table, 0) + 1
+    if table == "doctors":  # called after the commit, like the console's invalidations
+        hls.DOCTORS.invalidate()
+
+
+# Other processes (more workers, the console app) write without bumping
+# table_versions here. PRAGMA data_version on a connection that never
+# writes changes whenever any other connection commits, in this process or
+# another, so it is part of every ETag: any commit anywhere invalidates.
+_monitor = None  # (path, connection)
+_monitor_lock = threading.Lock()
+
+
+def data_version():
+    global _monitor
+    path = app.config["DATABASE"]
+    with _monitor_lock:
+        if _monitor is None or _monitor[0] != path:
+            if _monitor is not None:
+                _monitor[1].close()
+            _monitor = (path, sqlite3.connect(path, check_same_thread=False))
+        return _monitor[1].execute("PRAGMA data_version").fetchone()[0]
+
+
+def response_etag(table, key):
+    # Reading from a snapshot, a refresh changes the data without a write here.
+    generation = f"s{snapshot.generation}-" if snapshot is not None else ""
+    return (f"{PROCESS_TAG}-{generation}d{data_version()}-{table}-{table_versions.get(table, 0)}-"
+            f"{zlib.crc32(repr(key).encode()):08x}")
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+
+# ---------- Metrics ----------
+# Histogram buckets: request and SQL seconds, and statements per request.
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class Histogram:
+    """Bucket counts in the Prometheus layout (upper bounds, plus +Inf)."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.bounds + ("+Inf",), self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class RouteMetrics:
+    """Per (route, method) latency, SQLite time and statement histograms."""
+
+    def __init__(self):
+        self._routes = {}  # (route, method) -> (duration, sql seconds, statements)
+        self._statuses = {}  # (route, method, status) -> requests
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds, sql):
+        key = (route, method)
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = (Histogram(SECONDS_BUCKETS),
+                                                  Histogram(SECONDS_BUCKETS),
+                                                  Histogram(STATEMENT_BUCKETS))
+            histograms[0].observe(seconds)
+            histograms[1].observe(sql.seconds)
+            histograms[2].observe(sql.statements)
+            status_key = key + (status,)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+
+    def lines(self):
+        names = [("hms_request_duration_seconds", "Time from request start to the last byte sent."),
+                 ("hms_request_sql_seconds", "Time spent in SQLite per request."),
+                 ("hms_request_sql_statements", "SQL statements run per request.")]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            statuses = sorted(self._statuses.items())
+            for i, (name, help_text) in enumerate(names):
+                yield f"# HELP {name} {help_text}"
+                yield f"# TYPE {name} histogram"
+                for (route, method), histograms in routes:
+                    yield from histograms[i].lines(name, f'route="{route}",method="{method}"')
+            yield "# HELP hms_requests_total Requests served, by status code."
+            yield "# TYPE hms_requests_total counter"
+            for (route, method, status), n in statuses:
+                yield f'hms_requests_total{{route="{route}",method="{method}",status="{status}"}} {n}'
+
+
+route_metrics = RouteMetrics()
+
+
+def track_sql(conn):
+    """Add the connection's statements to the current request's SQL stats (metrics on)."""
+    stats = g.get("sql_stats")
+    if stats is not None:
+        conn.stats = stats
+    return conn
+
+
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    g.sql_stats = hls.SQLStats()
+
+
+def _stop_request_timer(response):
+    start, sql = g.request_start, g.sql_stats
+    route = request.url_rule.rule if request.url_rule else "(unmatched)"
+    method, status = request.method, response.status_code
+
+    # Streamed bodies are still being read from SQLite here; count them in.
+    def done():
+        route_metrics.observe(route, method, status, time.perf_counter() - start, sql)
+
+    response.call_on_close(done)
+    return response
+
+
+if app.config["METRICS"]:
+    hls.enable_profiling(hls.Profiler(app.config["SLOW_QUERY_MS"], app.logger.warning))
+    app.before_request(_start_request_timer)
+    app.after_request(_stop_request_timer)
+
+
+def _counter(name, help_text, value, kind="counter"):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text exposition of the request, SQL and response-cache metrics."""
+    profiler = hls.PROFILER
+    if profiler is None:
+        return jsonify({"status": "error", "error": "metrics are off; set HOSPITAL_METRICS=1"}), 404
+    lines = list(route_metrics.lines())
+    lines += _counter("hms_sql_statements_total", "SQL statements run, including commits.",
+                      profiler.totals.statements)
+    lines += _counter("hms_sql_seconds_total", "Time spent in SQLite.", profiler.totals.seconds)
+    lines += _counter("hms_slow_queries_total",
+                      f"Statements slower than {profiler.slow_ms:g} ms.", profiler.slow)
+    cache = response_cache.stats()
+    for key in ("hits", "misses", "not_modified", "evictions"):
+        lines += _counter(f"hms_response_cache_{key}_total", f"Response cache {key}.", cache[key])
+    lines += _counter("hms_response_cache_bytes", "Bytes held by the response cache.",
+                      cache["bytes"], "gauge")
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
 
 # ---------- Database Setup ----------
+# The schema is the console app's (hospital_lab_system): patients and doctors
+# are referenced by integer id, and the JSON API resolves the names it is
+# sent to registered patients and doctors. A hospital.db from an older
+# version gets the new columns at startup and is backfilled online with
+# `python hospital_lab_system.py migrate-legacy`; while its old name columns
+# exist, listings fall back to them.
 def init_db():
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    # Patients
-    c.execute("""CREATE TABLE IF NOT EXISTS patients (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT, age INTEGER, gender TEXT)""")
-    # Doctors
-    c.execute("""CREATE TABLE IF NOT EXISTS doctors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT, specialization TEXT)""")
-    # Appointments
-    c.execute("""CREATE TABLE IF NOT EXISTS appointments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient TEXT, doctor TEXT, date TEXT)""")
-    # Lab Tests
-    c.execute("""CREATE TABLE IF NOT EXISTS lab_tests (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient TEXT, test_name TEXT)""")
-    # Billing
-    c.execute("""CREATE TABLE IF NOT EXISTS billing (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient TEXT, amount REAL)""")
-    conn.commit()
-    conn.close()
+    hls.init_db(app.config["DATABASE"], app.config["DB_PROFILE"])
 
 init_db()
 
+# ---------- Listing: keyset pages and streamed responses ----------
+PAGE_LIMIT_DEFAULT = 100
+PAGE_LIMIT_MAX = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def _list_sources(legacy, history=False):
+    """table -> (columns of a JSON row, FROM clause aliasing the table as t).
+
+    With history=True archived tables are read through their _history views.
+    """
+    join = "LEFT JOIN" if legacy else "JOIN"
+    src = hls.history_sources(history)
+
+    def name(alias, legacy_column):
+        return f"COALESCE({alias}.name, t.{legacy_column})" if legacy else f"{alias}.name"
+
+    return {
+        "patients": ("t.name, t.age, t.gender", "patients t"),
+        "doctors": ("t.name, t.specialization", "doctors t"),
+        "appointments": (f"{name('p', 'patient')}, {name('d', 'doctor')}, t.date",
+                         f"{src['appointments']} t {join} patients p ON p.id = t.patient_id "
+                         f"{join} doctors d ON d.id = t.doctor_id"),
+        "lab_tests": (f"{name('p', 'patient')}, t.test_name",
+                      f"{src['lab_tests']} t {join} patients p ON p.id = t.patient_id"),
+        "billing": (f"{name('p', 'patient')}, t.amount",
+                    f"{src['billing']} t {join} patients p ON p.id = t.patient_id"),
+    }
+
+
+# PRAGMA schema_version -> (sources, history sources). Keyed on the schema
+# version, so migrate-legacy --drop-legacy-columns takes effect without a
+# restart.
+_sources_by_schema = {}
+
+
+def _list_source(conn, table, args):
+    """_list_sources entry for table, with archived rows if ?history=1 and there is an archive."""
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    sources = _sources_by_schema.get(version)
+    if sources is None:
+        legacy = hls.has_legacy_columns(conn)
+        sources = _sources_by_schema[version] = (_list_sources(legacy),
+                                                 _list_sources(legacy, history=True))
+    if (args.get("history", "0") != "0" and table in hls.ARCHIVE_TABLES
+            and hls.attach_archive(conn, app.config["ARCHIVE_DB"], create=False)):
+        return sources[1][table]
+    return sources[0][table]
+
+
+def _stream_rows(cur, ndjson, done):
+    try:
+        if not ndjson:
+            yield "["
+        sep = ""
+        while True:
+            rows = cur.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            if ndjson:
+                yield "".join(json.dumps(r) + "\n" for r in rows)
+            else:
+                yield sep + ",".join(json.dumps(r) for r in rows)
+                sep = ","
+        if not ndjson:
+            yield "]"
+    finally:
+        done()
+
+
+def _cached(response, key, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    if not response.is_streamed:
+        response_cache.put(key, etag, response.get_data(), response.mimetype)
+        return response
+
+    # Keep a copy of a streamed body while it is small enough to cache.
+    def tee(chunks, limit=response_cache.max_bytes // 8):
+        parts, size = [], 0
+        for chunk in chunks:
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > limit:
+                    parts = None
+            yield chunk
+        if parts is not None:
+            response_cache.put(key, etag, "".join(parts).encode(), response.mimetype)
+
+    response.response = tee(response.response)
+    return response
+
+
+def list_rows(table):
+    """List a table without materializing it.
+
+    ?after_id=&limit= returns one keyset page plus the cursor for the next
+    one; otherwise all rows are streamed from the cursor as a JSON array
+    (the original contract) or, with ?format=ndjson, one row per line.
+    ?history=1 includes archived appointments, lab tests and bills.
+    Responses carry an ETag derived from the table's write counter and the
+    database's data_version, so a poll with If-None-Match gets a 304 from
+    one PRAGMA instead of a query.
+    """
+    args = request.args
+    if not app.config["RESPONSE_CACHE"]:
+        return _list_response(table, args)
+    key = (table, tuple(sorted(args.items(multi=True))))
+    etag = response_etag(table, key)  # taken before reading: never newer than the data
+    if request.if_none_match.contains(etag):
+        response_cache.count_not_modified()
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    entry = response_cache.get(key, etag)
+    if entry is not None:
+        response = Response(entry[1], mimetype=entry[2])
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return _cached(_list_response(table, args), key, etag)
+
+
+def _doctors_response(args):
+    """/get_doctors from the in-process doctor directory, in list_rows' formats.
+
+    ?specialization= narrows it to one specialization.
+    """
+    conn = get_db()
+    specialization = args.get("specialization")
+    if "after_id" in args or "limit" in args:
+        after_id = args.get("after_id", 0, type=int)
+        limit = args.get("limit", PAGE_LIMIT_DEFAULT, type=int)
+        limit = max(1, min(limit, PAGE_LIMIT_MAX))
+        if specialization is None:
+            doctors = hls.DOCTORS.page(after_id, limit, conn)
+        else:
+            doctors = [d for d in hls.DOCTORS.with_specialization(specialization, conn)
+                       if d.id > after_id][:limit]
+        next_after_id = doctors[-1].id if len(doctors) == limit else None
+        return jsonify({"rows": [[d.name, d.specialization] for d in doctors],
+                        "next_after_id": next_after_id})
+    if specialization is None:
+        doctors = hls.DOCTORS.all(conn)
+    else:
+        doctors = hls.DOCTORS.with_specialization(specialization, conn)
+    rows = [json.dumps([d.name, d.specialization]) for d in doctors]
+    if args.get("format") == "ndjson":
+        return Response("".join(r + "\n" for r in rows), mimetype="application/x-ndjson")
+    return Response("[" + ",".join(rows) + "]", mimetype="application/json")
+
+
+def _list_response(table, args):
+    if table == "doctors":
+        return _doctors_response(args)
+    if "after_id" in args or "limit" in args:
+        conn = get_read_db()
+        columns, source = _list_source(conn, table, args)
+        after_id = args.get("after_id", 0, type=int)
+        limit = args.get("limit", PAGE_LIMIT_DEFAULT, type=int)
+        limit = max(1, min(limit, PAGE_LIMIT_MAX))
+        rows = conn.execute(f"SELECT t.id, {columns} FROM {source} WHERE t.id > ? "
+                            f"ORDER BY t.id LIMIT ?", (after_id, limit)).fetchall()
+        next_after_id = rows[-1][0] if len(rows) == limit else None
+        return jsonify({"rows": [r[1:] for r in rows], "next_after_id": next_after_id})
+
+    # The body is produced after the request has been torn down, possibly on
+    # another thread (see asgi.py), so the stream owns a private connection.
+    ndjson = args.get("format") == "ndjson"
+    conn = track_sql(open_read_connection(check_same_thread=False))
+    columns, source = _list_source(conn, table, args)
+    cur = conn.execute(f"SELECT {columns} FROM {source} ORDER BY t.id")
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    return Response(_stream_rows(cur, ndjson, conn.close), mimetype=mimetype)
+
+# ---------- Bulk inserts ----------
+BULK_CHUNK_SIZE = 5000
+BULK_MAX_ERRORS = 1000
+
+
+def _text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("must be a non-empty string")
+    return value
+
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("must be an integer")
+    return int(value)
+
+
+def _amount(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError("must be a number")
+    value = float(value)
+    if value < 0:
+        raise ValueError("must be >= 0")
+    return value
+
+
+def _date(value):
+    return hls.parse_date(_text(value))
+
+
+def _time(value):
+    return hls.parse_time(_text(value))
+
+
+# Values the JSON API does not take, filled in by SQLite.
+NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+TODAY_SQL = "date('now', 'localtime')"
+# JSON fields holding a name that is stored as an id into this table
+NAME_FIELDS = {"patient": "patients", "doctor": "doctors"}
+# Fields a bulk row may leave out, and the value used then
+FIELD_DEFAULTS = {"time": "00:00"}
+
+# resource -> (table, INSERT statement, [(JSON field, validator), ...])
+BULK_SPECS = {
+    "patients": ("patients", "INSERT INTO patients (name, age, gender) VALUES (?, ?, ?)",
+                 [("name", _text), ("age", _integer), ("gender", _text)]),
+    "doctors": ("doctors", "INSERT INTO doctors (name, specialization) VALUES (?, ?)",
+                [("name", _text), ("specialization", _text)]),
+    "appointments": ("appointments",
+                     "INSERT INTO appointments (patient_id, doctor_id, date, time) "
+                     "VALUES (?, ?, ?, ?)",
+                     [("patient", _text), ("doctor", _text), ("date", _date), ("time", _time)]),
+    "lab": ("lab_tests",
+            f"INSERT INTO lab_tests (patient_id, test_name, ordered_on) VALUES (?, ?, {NOW_SQL})",
+            [("patient", _text), ("test", _text)]),
+    "bills": ("billing",
+              f"INSERT INTO billing (patient_id, amount, billed_on) VALUES (?, ?, {TODAY_SQL})",
+              [("patient", _text), ("amount", _amount)]),
+}
+
+
+def _bulk_items():
+    """Yield (index, row) from a JSON array body or, streamed, an NDJSON body."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        index = 0
+        for line in io.BufferedReader(request.stream, 1 << 16):
+            if not line.strip():
+                continue
+            try:
+                yield index, json.loads(line)
+            except ValueError:
+                yield index, None
+            index += 1
+        return
+    body = request.get_json(silent=True)
+    if not isinstance(body, list):
+        raise ValueError("body must be a JSON array or NDJSON")
+    yield from enumerate(body)
+
+
+def _validate(row, fields):
+    if not isinstance(row, dict):
+        raise ValueError("row must be a JSON object")
+    params = []
+    for field, check in fields:
+        if field not in row:
+            if field in FIELD_DEFAULTS:
+                params.append(FIELD_DEFAULTS[field])
+                continue
+            raise ValueError(f"missing field {field!r}")
+        try:
+            params.append(check(row[field]))
+        except ValueError as e:
+            raise ValueError(f"{field}: {e}") from None
+    return params
+
+
+class BulkErrors:
+    """Per-row error positions; only the first BULK_MAX_ERRORS are kept."""
+
+    def __init__(self):
+        self.rows = []
+        self.count = 0
+
+    def add(self, index, message):
+        self.count += 1
+        if len(self.rows) < BULK_MAX_ERRORS:
+            self.rows.append({"index": index, "error": message})
+
+
+class NameLookupError(ValueError):
+    """A patient or doctor name that does not pick out one registered row."""
+    status = 400
+
+
+class UnknownName(NameLookupError):
+    """A patient or doctor name that is not registered."""
+
+
+class AmbiguousName(NameLookupError):
+    """A patient or doctor name shared by more than one registered row."""
+    status = 409
+
+
+@app.errorhandler(NameLookupError)
+def name_lookup_error(e):
+    return jsonify({"status": "error", "error": str(e)}), e.status
+
+
+def name_id(conn, field, name, cache=None):
+    """Id of the one patient/doctor called name; UnknownName or AmbiguousName otherwise."""
+    ids = ()
+    if isinstance(name, str) and name.strip():
+        name = name.strip()
+        if cache is not None and name in cache:
+            ids = cache[name]
+        else:
+            ids = tuple(r[0] for r in conn.execute(
+                f"SELECT id FROM {NAME_FIELDS[field]} WHERE name = ? LIMIT 2", (name,)))
+            if cache is not None and ids:
+                cache[name] = ids
+    if not ids:
+        raise UnknownName(f"{field}: no {field} named {name!r}")
+    if len(ids) > 1:
+        raise AmbiguousName(f"{field}: more than one {field} named {name!r}")
+    return ids[0]
+
+
+def _resolve_chunk(conn, chunk, fields, caches, errors):
+    """chunk with names replaced by ids; rows naming no one are reported and dropped."""
+    positions = [(i, field) for i, (field, _) in enumerate(fields) if field in NAME_FIELDS]
+    if not positions:
+        return chunk
+    resolved = []
+    for index, params in chunk:
+        try:
+            for i, field in positions:
+                params[i] = name_id(conn, field, params[i], caches[field])
+        except NameLookupError as e:
+            errors.add(index, str(e))
+            continue
+        resolved.append((index, params))
+    return resolved
+
+
+def _write_chunk(conn, sql, chunk, errors):
+    try:
+        conn.executemany(sql, [params for _, params in chunk])
+        conn.commit()
+        return len(chunk)
+    except sqlite3.Error:
+        conn.rollback()
+    # Replay the chunk row by row to pinpoint the rows the database rejects.
+    inserted = 0
+    for index, params in chunk:
+        try:
+            conn.execute(sql, params)
+            inserted += 1
+        except sqlite3.Error as e:
+            errors.add(index, str(e))
+    conn.commit()
+    return inserted
+
+
+@app.route("/<resource>/bulk", methods=["POST"])
+def bulk_insert(resource):
+    if resource not in BULK_SPECS:
+        return jsonify({"status": "error", "error": f"unknown resource {resource!r}"}), 404
+    table, sql, fields = BULK_SPECS[resource]
+    conn = get_db()
+    inserted, errors, chunk = 0, BulkErrors(), []
+    caches = {field: {} for field in NAME_FIELDS}
+
+    def flush():
+        written = _write_chunk(conn, sql, _resolve_chunk(conn, chunk, fields, caches, errors), errors)
+        bump_version(table)
+        return written
+
+    try:
+        for index, row in _bulk_items():
+            try:
+                chunk.append((index, _validate(row, fields)))
+            except ValueError as e:
+                errors.add(index, str(e))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                inserted += flush()
+                chunk = []
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    if chunk:
+        inserted += flush()
+    return jsonify({
+        "status": "partial" if errors.count else "success",
+        "inserted": inserted,
+        "error_count": errors.count,
+        "errors": errors.rows,
+    })
+
+# ---------- Search ----------
+SEARCH_K_MAX = 100
+
+
+@app.route("/search", methods=["GET"])
+def search():
+    """Top-k patients or doctors for ?q=, best match first (prefix and typo tolerant)."""
+    table = request.args.get("type", "patients")
+    if table not in hls.SEARCH_INDEXES:
+        return jsonify({"status": "error",
+                        "error": f"type must be one of {', '.join(hls.SEARCH_INDEXES)}"}), 400
+    k = max(1, min(request.args.get("k", hls.SEARCH_K, type=int), SEARCH_K_MAX))
+    rows = hls.search(get_db(), table, request.args.get("q", ""), k)
+    return jsonify({"rows": [list(r) for r in rows]})
+
+# ---------- Reports ----------
+@app.route("/revenue", methods=["GET"])
+def revenue():
+    """Billed, collected and outstanding amounts per day or month, from the rollups.
+
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (default: this month so far) &by=day|month
+    """
+    today = date.today()
+    by = request.args.get("by", "day")
+    try:
+        start = hls.parse_date(request.args.get("from", today.replace(day=1).isoformat()))
+        end = hls.parse_date(request.args.get("to", today.isoformat()))
+        rows = hls.revenue(get_read_db(), start, end, by)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    return jsonify({"rows": [list(r) for r in rows], "total": list(hls.revenue_totals(rows))})
+
+# ---------- Group commit ----------
+class GroupCommitWriter:
+    """One thread that runs queued writes in shared transactions.
+
+    Each write runs in its own SAVEPOINT, so a failing one is undone
+    without affecting the rest. A batch closes at max_rows writes or
+    max_wait seconds after its first write, and is committed once; every
+    caller's Future resolves after that commit, so concurrent requests share
+    one fsync instead of queueing for the write lock one by one.
+    """
+
+    _STOP = object()
+
+    def __init__(self, connect, max_rows=256, max_wait=0.005):
+        self.connect = connect
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.batches = self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="hms-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        """Queue fn(conn); the Future gets its return value once committed."""
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_rows:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)  # finish this batch, then stop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        conn = self.connect()
+        try:
+            while True:
+                batch = self._collect()
+                if batch is None:
+                    return
+                self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    done.append((future, fn(conn)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    future.set_exception(e)
+                conn.execute("RELEASE write")
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result in done:
+            future.set_result(result)
+
+
+writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global writer
+    with _writer_lock:
+        if writer is None:
+            path = app.config["DATABASE"]
+            writer = GroupCommitWriter(lambda: open_connection(path, check_same_thread=False),
+                                       app.config["GROUP_COMMIT_MAX_ROWS"],
+                                       app.config["GROUP_COMMIT_MAX_WAIT"])
+            atexit.register(writer.close)
+        return writer
+
+
+def write(table, fn):
+    """Run fn(conn) -> row id and commit it; returns the id."""
+    if app.config["GROUP_COMMIT"]:
+        row_id = get_writer().submit(fn).result()
+    else:
+        conn = get_db()
+        row_id = fn(conn)
+        conn.commit()
+    bump_version(table)
+    return row_id
+
 # ---------- Routes ----------
 @app.route("/")
 def home():
@@ -41,107 +958,75 @@ def home():
 @app.route("/add_patient", methods=["POST"])
 def add_patient():
     data = request.json
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO patients (name, age, gender) VALUES (?, ?, ?)",
-              (data["name"], data["age"], data["gender"]))
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "success"})
+    params = (data["name"], data["age"], data["gender"])
+    row_id = write("patients", lambda conn: conn.execute(
+        "INSERT INTO patients (name, age, gender) VALUES (?, ?, ?)", params).lastrowid)
+    return jsonify({"status": "success", "id": row_id})
 
 # Get Patients
 @app.route("/get_patients", methods=["GET"])
 def get_patients():
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("SELECT name, age, gender FROM patients")
-    rows = c.fetchall()
-    conn.close()
-    return jsonify(rows)
+    return list_rows("patients")
 
 # Similar APIs for Doctors
 @app.route("/add_doctor", methods=["POST"])
 def add_doctor():
     data = request.json
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO doctors (name, specialization) VALUES (?, ?)",
-              (data["name"], data["specialization"]))
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "success"})
+    params = (data["name"], data["specialization"])
+    row_id = write("doctors", lambda conn: conn.execute(
+        "INSERT INTO doctors (name, specialization) VALUES (?, ?)", params).lastrowid)
+    return jsonify({"status": "success", "id": row_id})
 
 @app.route("/get_doctors", methods=["GET"])
 def get_doctors():
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("SELECT name, specialization FROM doctors")
-    rows = c.fetchall()
-    conn.close()
-    return jsonify(rows)
+    return list_rows("doctors")
 
 # Appointments
 @app.route("/add_appointment", methods=["POST"])
 def add_appointment():
     data = request.json
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO appointments (patient, doctor, date) VALUES (?, ?, ?)",
-              (data["patient"], data["doctor"], data["date"]))
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "success"})
+    patient, doctor = data["patient"], data["doctor"]
+    try:
+        when = tuple(_validate(data, [("date", _date), ("time", _time)]))
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    row_id = write("appointments", lambda conn: conn.execute(
+        "INSERT INTO appointments (patient_id, doctor_id, date, time) VALUES (?, ?, ?, ?)",
+        (name_id(conn, "patient", patient),
+         name_id(conn, "doctor", doctor)) + when).lastrowid)
+    return jsonify({"status": "success", "id": row_id})
 
 @app.route("/get_appointments", methods=["GET"])
 def get_appointments():
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("SELECT patient, doctor, date FROM appointments")
-    rows = c.fetchall()
-    conn.close()
-    return jsonify(rows)
+    return list_rows("appointments")
 
 # Lab Tests
 @app.route("/add_lab", methods=["POST"])
 def add_lab():
     data = request.json
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO lab_tests (patient, test_name) VALUES (?, ?)",
-              (data["patient"], data["test"]))
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "success"})
+    patient, test = data["patient"], data["test"]
+    row_id = write("lab_tests", lambda conn: conn.execute(
+        f"INSERT INTO lab_tests (patient_id, test_name, ordered_on) VALUES (?, ?, {NOW_SQL})",
+        (name_id(conn, "patient", patient), test)).lastrowid)
+    return jsonify({"status": "success", "id": row_id})
 
 @app.route("/get_lab", methods=["GET"])
 def get_lab():
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("SELECT patient, test_name FROM lab_tests")
-    rows = c.fetchall()
-    conn.close()
-    return jsonify(rows)
+    return list_rows("lab_tests")
 
 # Billing
 @app.route("/add_bill", methods=["POST"])
 def add_bill():
     data = request.json
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO billing (patient, amount) VALUES (?, ?)",
-              (data["patient"], data["amount"]))
-    conn.commit()
-    conn.close()
-    return jsonify({"status": "success"})
+    patient, amount = data["patient"], data["amount"]
+    row_id = write("billing", lambda conn: conn.execute(
+        f"INSERT INTO billing (patient_id, amount, billed_on) VALUES (?, ?, {TODAY_SQL})",
+        (name_id(conn, "patient", patient), amount)).lastrowid)
+    return jsonify({"status": "success", "id": row_id})
 
 @app.route("/get_bills", methods=["GET"])
 def get_bills():
-    conn = sqlite3.connect("hospital.db")
-    c = conn.cursor()
-    c.execute("SELECT patient, amount FROM billing")
-    rows = c.fetchall()
-    conn.close()
-    return jsonify(rows)
+    return list_rows("billing")
 
 # Run
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+"""
+Asynchronous (ASGI) serving mode for the HTTP API in app.py.
+
+How to run:
+    pip install uvicorn
+    uvicorn asgi:application --port 5000
+
+The routes and JSON contract are exactly those of app.py: each request is
+handed to the Flask app on a bounded thread pool, while the event loop does
+all socket work. Reading a slow request body, writing to a slow client and
+waiting between keep-alive requests therefore cost no thread, so thousands
+of idle or slow clients (kiosks polling /get_appointments) are served by
+HOSPITAL_ASGI_WORKERS threads and as many pooled SQLite connections.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, pool
+
+WORKERS = int(os.environ.get("HOSPITAL_ASGI_WORKERS", "16"))
+# Request bodies larger than this are spooled to a temp file (bulk uploads).
+MAX_MEMORY_BODY = 1024 * 1024
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="hms-db")
+_DONE = object()
+
+
+async def _read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=MAX_MEMORY_BODY)
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body.write(message.get("body", b""))
+        more = message.get("more_body", False)
+    body.seek(0)
+    return body
+
+
+def _environ(scope, body):
+    # The whole body is already spooled, so its length is known even when the
+    # client sent it chunked (no Content-Length); without one Werkzeug would
+    # read an empty body.
+    body.seek(0, 2)
+    length = body.tell()
+    body.seek(0)
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            environ[key] = environ[key] + "," + value if key in environ else value
+    environ["CONTENT_LENGTH"] = str(length)
+    return environ
+
+
+def _call_app(environ):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    body = app(environ, start_response)
+    return started, body
+
+
+async def _watch_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+async def _http(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    body = await _read_body(receive)
+    if body is None:
+        return
+    try:
+        started, app_iter = await loop.run_in_executor(executor, _call_app, _environ(scope, body))
+        disconnected = asyncio.Event()
+        watcher = loop.create_task(_watch_disconnect(receive, disconnected))
+        try:
+            await send({"type": "http.response.start",
+                        "status": started["status"], "headers": started["headers"]})
+            # Each chunk is produced on the pool (it may read from SQLite) and
+            # written from the loop, so a slow reader holds no thread.
+            chunks = iter(app_iter)
+            while not disconnected.is_set():
+                chunk = await loop.run_in_executor(executor, next, chunks, _DONE)
+                if chunk is _DONE:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+            if hasattr(app_iter, "close"):
+                await loop.run_in_executor(executor, app_iter.close)
+    finally:
+        body.close()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=True)
+            pool.close_all()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http":
+        await _http(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await _lifespan(receive, send)
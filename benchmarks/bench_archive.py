@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Hot tables before and after archiving, and what reading history costs.
+
+Loads --patients of synthetic data (two years of activity), then measures
+appointments, lab_tests and billing before and after
+`archive_rows(before=--before)`:
+
+  * hot working set: bytes of each table and its indexes (dbstat)
+  * first and 50th keyset page of the appointments, lab_tests and bills
+    listings, and lab_turnaround() (a full scan of the reported tests)
+  * the same on the <table>_history views, which must match the
+    pre-archive results row for row
+  * archival throughput
+
+How to run:
+    python benchmarks/bench_archive.py [--patients 200000] [--before 2024-07-01] [--vacuum]
+
+Uses throwaway databases in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+LISTINGS = ["appointments", "lab_tests", "bills"]
+PAGES = 50
+
+
+def working_set(path):
+    conn = sqlite3.connect(path)
+    sizes = dict.fromkeys(hls.ARCHIVE_TABLES, 0)
+    for name, tbl, size in conn.execute("""
+            SELECT s.name, m.tbl_name, SUM(s.pgsize) FROM dbstat s
+              JOIN sqlite_master m ON m.name = s.name GROUP BY s.name"""):
+        if tbl in sizes:
+            sizes[tbl] += size
+    conn.close()
+    return sizes
+
+
+def page_through(conn, name, history):
+    """(seconds for the first page, seconds for page PAGES, rows on the pages read)."""
+    keys = [column for _, column in hls.LISTINGS[name]["keys"]]
+    times, rows_seen = [], []
+    start = time.perf_counter()
+    rows = conn.execute(hls.listing_sql(name, limit=True, history=history),
+                        (hls.PAGE_SIZE,)).fetchall()
+    times.append(time.perf_counter() - start)
+    rows_seen += [tuple(r) for r in rows]
+    for _ in range(PAGES - 1):
+        if len(rows) < hls.PAGE_SIZE:
+            break
+        start = time.perf_counter()
+        rows = conn.execute(hls.listing_sql(name, after=True, limit=True, history=history),
+                            (*[rows[-1][k] for k in keys], hls.PAGE_SIZE)).fetchall()
+        times.append(time.perf_counter() - start)
+        rows_seen += [tuple(r) for r in rows]
+    return times[0], times[-1], rows_seen
+
+
+def measure(path, history=False):
+    conn = hls.connect(path)
+    if history:
+        hls.attach_archive(conn, create=False)
+    results, pages = {}, {}
+    for name in LISTINGS:
+        first, last, rows = page_through(conn, name, history)
+        results[name] = (first, last)
+        pages[name] = rows
+    start = time.perf_counter()
+    by_test, _ = hls.lab_turnaround(conn, history=history)
+    results["lab_turnaround"] = (time.perf_counter() - start, None)
+    pages["lab_turnaround"] = sorted((k, t.reported) for k, t in by_test.items())
+    conn.close()
+    return results, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot/cold archival.")
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--before", default="2024-07-01", help="archive cutoff (data: 2023-2024)")
+    parser.add_argument("--batch", type=int, default=hls.ARCHIVE_BATCH_ROWS)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM after archiving")
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "archive.db")
+    datagen.load(path, args.patients)
+    hls.init_db(path)
+
+    hot_before = working_set(path)
+    before, pages_before = measure(path)
+    start = time.perf_counter()
+    moved = hls.archive_rows(path, args.before, batch_size=args.batch, pause=0, vacuum=args.vacuum)
+    elapsed = time.perf_counter() - start
+    hot_after = working_set(path)
+    after, _ = measure(path)
+    history, pages_history = measure(path, history=True)
+
+    print(f"\narchived {sum(moved.values())} rows in {elapsed:.1f}s "
+          f"({sum(moved.values()) / elapsed:.0f} rows/s, batches of {args.batch}"
+          f"{', then VACUUM' if args.vacuum else ''})")
+    print(f"\n{'hot table + indexes':<22} {'before MB':>10} {'after MB':>10} {'archived rows':>14}")
+    for table in hls.ARCHIVE_TABLES:
+        print(f"{table:<22} {hot_before[table] / 2**20:10.1f} {hot_after[table] / 2**20:10.1f} "
+              f"{moved[table]:14d}")
+    print(f"\n{'ms':<22} {'before':>16} {'hot after':>16} {'history':>16} {'same rows':>10}")
+    for name in before:
+        cells = []
+        for result in (before, after, history):
+            first, last = result[name]
+            cells.append(f"{first * 1000:7.2f}" + (f" /{last * 1000:7.2f}" if last is not None else " " * 9))
+        same = "yes" if pages_before[name] == pages_history[name] else "NO"
+        print(f"{name:<22} " + " ".join(f"{c:>16}" for c in cells) + f" {same:>10}")
+    print(f"(listings: first page / page {PAGES})")
+
+
+if __name__ == "__main__":
+    main()
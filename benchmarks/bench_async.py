@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Load test: sync (Flask/werkzeug threaded server) vs async (asgi.py on uvicorn).
+
+Each run opens --idle connections that send half a request and then stall,
+like kiosks on a bad network, and meanwhile --clients workers poll
+GET /get_appointments?limit=50 for --seconds. Reported per mode: completed
+requests/sec, latency percentiles, failures and the server's thread count.
+
+How to run:
+    pip install uvicorn
+    python benchmarks/bench_async.py [--idle 1000] [--clients 50] [--seconds 5]
+
+Uses a throwaway database in a temp directory, never hospital.db.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "sync": [sys.executable, "-c",
+             "import sys, app; app.app.run(port=int(sys.argv[1]), threaded=True)"],
+    "async": [sys.executable, "-m", "uvicorn", "asgi:application",
+              "--log-level", "warning", "--port"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def thread_count(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def idle_client(port, stop):
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        return False
+    writer.write(b"GET /get_appointments HTTP/1.1\r\nHost: localhost\r\n")
+    await writer.drain()
+    await stop.wait()
+    writer.close()
+    return True
+
+
+async def poll_client(port, deadline, latencies, failures):
+    request = (b"GET /get_appointments?limit=50 HTTP/1.1\r\n"
+               b"Host: localhost\r\nConnection: close\r\n\r\n")
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", port), 10)
+            writer.write(request)
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), 10)
+            writer.close()
+            if not data.startswith(b"HTTP/1.") or b" 200 " not in data[:16]:
+                raise ValueError(data[:40])
+            latencies.append(time.perf_counter() - start)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            failures.append(1)
+
+
+async def load(port, pid, args):
+    stop = asyncio.Event()
+    idle = [asyncio.create_task(idle_client(port, stop)) for _ in range(args.idle)]
+    await asyncio.sleep(1)  # let the server accept them
+    latencies, failures = [], []
+    deadline = time.perf_counter() + args.seconds
+    threads = thread_count(pid)
+    await asyncio.gather(*(poll_client(port, deadline, latencies, failures)
+                           for _ in range(args.clients)))
+    threads = max(filter(None, [threads, thread_count(pid)]), default=None)
+    stop.set()
+    await asyncio.gather(*idle)
+    return latencies, len(failures), threads
+
+
+def pct(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async API load test.")
+    parser.add_argument("--idle", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--modes", nargs="*", default=list(SERVERS))
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hms-bench-")
+    env = dict(os.environ, HOSPITAL_DB=os.path.join(tmp, "bench.db"))
+    subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT, env=env, check=True)
+    with sqlite3.connect(env["HOSPITAL_DB"]) as conn:
+        conn.executemany("INSERT INTO doctors (id, name) VALUES (?, ?)",
+                         [(i, f"Dr. {i}") for i in range(1, 21)])
+        conn.executemany("INSERT INTO patients (id, name) VALUES (?, ?)",
+                         [(i, f"Patient {i}") for i in range(1, 5001)])
+        conn.executemany("INSERT INTO appointments (patient_id, doctor_id, date, time) "
+                         "VALUES (?, ?, '2025-09-10', '09:00')",
+                         [(i, i % 20 + 1) for i in range(1, 5001)])
+
+    print(f"{args.idle} stalled connections, {args.clients} polling clients, {args.seconds}s")
+    print(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7} {'threads':>8}")
+    for mode in args.modes:
+        port = free_port()
+        server = subprocess.Popen(SERVERS[mode] + [str(port)], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            latencies, failed, threads = asyncio.run(load(port, server.pid, args))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:<6} {len(latencies) / args.seconds:8.0f} {pct(latencies, 50):8.1f} "
+              f"{pct(latencies, 99):8.1f} {failed:7d} {threads if threads else '?':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Import N patients through POST /add_patient one by one and through
+POST /patients/bulk (JSON array and NDJSON), and report rows/sec.
+
+How to run:
+    python benchmarks/bench_bulk.py [--rows 100000] [--single 2000]
+
+Uses a throwaway database in a temp directory, never hospital.db.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk vs single-row patient import.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--single", type=int, default=2000,
+                        help="rows to post one by one (extrapolated)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hms-bench-")
+    os.environ["HOSPITAL_DB"] = os.path.join(tmp, "bench.db")
+    import app as api
+
+    client = api.app.test_client()
+    rows = [{"name": f"Patient {i}", "age": i % 90, "gender": "MF"[i % 2]}
+            for i in range(args.rows)]
+
+    start = time.perf_counter()
+    for row in rows[:args.single]:
+        client.post("/add_patient", json=row)
+    single = args.single / (time.perf_counter() - start)
+    print(f"{'one by one':<12} {single:10.0f} rows/s  (~{args.rows / single:6.1f}s for {args.rows})")
+
+    start = time.perf_counter()
+    resp = client.post("/patients/bulk", json=rows)
+    elapsed = time.perf_counter() - start
+    assert resp.json["inserted"] == args.rows, resp.json
+    print(f"{'bulk json':<12} {args.rows / elapsed:10.0f} rows/s  ({elapsed:6.1f}s)")
+
+    body = "".join(json.dumps(r) + "\n" for r in rows)
+    start = time.perf_counter()
+    resp = client.post("/patients/bulk", data=body, content_type="application/x-ndjson")
+    elapsed = time.perf_counter() - start
+    assert resp.json["inserted"] == args.rows, resp.json
+    print(f"{'bulk ndjson':<12} {args.rows / elapsed:10.0f} rows/s  ({elapsed:6.1f}s)")
+    api.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Doctor reads: SQL on every call vs. the in-process doctor directory.
+
+  * id check (pick_doctor, next-slot): `SELECT 1 FROM doctors WHERE id = ?`
+    on an open connection vs. DOCTORS.exists()
+  * full list (view_doctors): fetching every row vs. DOCTORS.all()
+  * by specialization: `WHERE specialization = ?` (no index) vs. the
+    specialization index
+  * memory per record: sqlite3.Row and dict rows vs. __slots__ Doctor
+  * GET /get_doctors through the Flask test client, response cache off
+
+How to run:
+    python benchmarks/bench_doctors.py [--patients 200000] [--repeat 20000]
+
+Uses throwaway databases in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+
+def rate(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def record_bytes(record):
+    size = sys.getsizeof(record)
+    if isinstance(record, dict):
+        size += sum(sys.getsizeof(k) for k in record)
+    elif isinstance(record, sqlite3.Row):  # plus the tuple it wraps
+        size += sys.getsizeof(tuple(record))
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the doctor directory.")
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "doctors.db")
+    datagen.load(path, args.patients)
+    hls.init_db(path)
+    os.environ["HOSPITAL_DB"] = path
+
+    conn = hls.connect(path)
+    ids = [r[0] for r in conn.execute("SELECT id FROM doctors")]
+    specs = [r[0] for r in conn.execute("SELECT DISTINCT specialization FROM doctors")]
+    n, full = args.repeat, max(1, args.repeat // 100)
+    hls.DOCTORS.all(conn)
+    cases = [
+        ("id check", n,
+         lambda i: conn.execute("SELECT 1 FROM doctors WHERE id = ?", (ids[i % len(ids)],)).fetchone(),
+         lambda i: hls.DOCTORS.exists(ids[i % len(ids)], conn)),
+        ("full list", full,
+         lambda i: conn.execute("SELECT id, name, specialization, contact FROM doctors "
+                                "ORDER BY id").fetchall(),
+         lambda i: hls.DOCTORS.all(conn)),
+        ("by specialization", full,
+         lambda i: conn.execute("SELECT id, name, specialization, contact FROM doctors "
+                                "WHERE specialization = ?", (specs[i % len(specs)],)).fetchall(),
+         lambda i: hls.DOCTORS.with_specialization(specs[i % len(specs)], conn)),
+    ]
+    print(f"{len(ids)} doctors, {len(specs)} specializations")
+    print(f"{'calls/s':<22} {'SQL':>12} {'directory':>12} {'speedup':>8}")
+    for label, calls, sql, directory in cases:
+        a, b = rate(sql, calls), rate(directory, calls)
+        print(f"{label:<22} {a:12.0f} {b:12.0f} {b / a:7.1f}x")
+
+    row = conn.execute("SELECT id, name, specialization, contact FROM doctors LIMIT 1").fetchone()
+    print(f"\nbytes per record (without the values): sqlite3.Row {record_bytes(row)}, "
+          f"dict {record_bytes(dict(row))}, Doctor {record_bytes(hls.DOCTORS.all(conn)[0])}")
+    conn.close()
+
+    import app  # noqa: E402  (reads HOSPITAL_DB at import)
+    app.app.config["RESPONSE_CACHE"] = False
+    client = app.app.test_client()
+    for query in ("/get_doctors", "/get_doctors?limit=100"):
+        hls.DOCTORS.invalidate()
+        reqs = max(1, n // 20)
+        print(f"GET {query:<26} {rate(lambda i: client.get(query).close(), reqs):8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Write throughput: one commit per request vs. the group-commit writer.
+
+For each mode an app.py server (threaded werkzeug) is started on a fresh
+database with HOSPITAL_GROUP_COMMIT=0 or 1, and --clients threads POST
+/add_bill (resolving an existing patient name) over keep-alive connections
+for --seconds. Reported: committed rows/sec, latency percentiles, and
+whether every returned id is distinct and present in the table.
+
+How to run:
+    python benchmarks/bench_group_commit.py [--clients 64] [--seconds 5] [--profile durable]
+
+Uses throwaway databases in a temp directory, never hospital.db.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import ROOT, free_port, pct, wait_for_port  # noqa: E402
+
+SERVER = ("import sys, app; from werkzeug.serving import WSGIRequestHandler; "
+          "WSGIRequestHandler.protocol_version = 'HTTP/1.1'; "
+          "app.app.run(port=int(sys.argv[1]), threaded=True)")
+
+
+def client(port, deadline, latencies, ids, failures):
+    body = json.dumps({"patient": "Bench Patient", "amount": 500})
+    headers = {"Content-Type": "application/json"}
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/add_bill", body, headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            if resp.status != 200:
+                raise ValueError(resp.status)
+            ids.append(json.loads(data)["id"])
+            latencies.append(time.perf_counter() - start)
+        except (OSError, ValueError, http.client.HTTPException):
+            failures.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.close()
+
+
+def run(mode, args, tmp):
+    path = os.path.join(tmp, f"{mode}.db")
+    env = dict(os.environ, HOSPITAL_DB=path, HOSPITAL_DB_PROFILE=args.profile,
+               HOSPITAL_GROUP_COMMIT="1" if mode == "group" else "0")
+    subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT, env=env, check=True)
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO patients (name) VALUES ('Bench Patient')")
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    latencies, ids, failures = [], [], []
+    try:
+        wait_for_port(port)
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=client, args=(port, deadline, latencies, ids, failures))
+                   for _ in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        server.terminate()
+        server.wait()
+    with sqlite3.connect(path) as conn:
+        stored = {r[0] for r in conn.execute("SELECT id FROM billing")}
+    consistent = len(set(ids)) == len(ids) and set(ids) <= stored
+    return latencies, len(failures), consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group commit under concurrent writes.")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--profile", default="durable", help="HOSPITAL_DB_PROFILE for the server")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix="hms-bench-")
+
+    print(f"{args.clients} clients POSTing /add_bill for {args.seconds}s, profile {args.profile}")
+    print(f"{'mode':<8} {'rows/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7} {'ids ok':>7}")
+    for mode in ("single", "group"):
+        latencies, failed, consistent = run(mode, args, tmp)
+        print(f"{mode:<8} {len(latencies) / args.seconds:8.0f} {pct(latencies, 50):8.1f} "
+              f"{pct(latencies, 99):8.1f} {failed:7d} {'yes' if consistent else 'NO':>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Opening and migrating a legacy app.py database, with a consistency check.
+
+Builds a --schema legacy database with datagen (names instead of ids, no
+billing dates), then:
+
+  * starts the API on it (`import app` in a subprocess), which must succeed
+    before the backfill has run
+  * runs migrate_legacy() and reports rows/sec
+  * checks that the summary tables and revenue rollups kept by triggers
+    during the backfill equal a recomputation from the base tables, and
+    that every bill is counted once
+
+How to run:
+    python benchmarks/bench_legacy.py [--patients 100000] [--batch 500]
+
+Exits with status 1 if a check fails. Uses throwaway databases in a temp
+directory, never hospital.db.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+COUNTERS = list(hls.SUMMARY_TABLES) + [table for table, _, _ in hls.REVENUE_ROLLUPS]
+
+
+def snapshot(conn):
+    return {t: conn.execute(f"SELECT * FROM {t} ORDER BY 1").fetchall() for t in COUNTERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check the legacy migration.")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=hls.LEGACY_BATCH_SIZE)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "legacy.db")
+    counts = datagen.load(path, args.patients, schema="legacy")
+
+    start = time.perf_counter()
+    started = subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT,
+                             env=dict(os.environ, HOSPITAL_DB=path),
+                             capture_output=True, text=True)
+    startup = time.perf_counter() - start
+    checks = {"API starts on the legacy database": started.returncode == 0}
+    if started.returncode:
+        print(started.stderr.strip().splitlines()[-1], file=sys.stderr)
+
+    start = time.perf_counter()
+    scanned = hls.migrate_legacy(path, args.batch, pause=0)
+    elapsed = time.perf_counter() - start
+
+    conn = hls.connect(path)
+    kept = snapshot(conn)
+    bills, cents = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(CAST(ROUND(amount * 100) AS INTEGER)), 0) FROM billing").fetchone()
+    rolled = conn.execute(
+        "SELECT COALESCE(SUM(bills), 0), COALESCE(SUM(billed_cents), 0) FROM revenue_daily").fetchone()
+    hls.rebuild_summaries(conn)
+    recomputed = snapshot(conn)
+    conn.rollback()
+    conn.close()
+    checks["every bill in the revenue rollups once"] = tuple(rolled) == (bills, cents)
+    for table in COUNTERS:
+        checks[f"{table} matches a rebuild"] = kept[table] == recomputed[table]
+
+    print(f"{sum(counts.values())} legacy rows; API start {startup * 1000:.0f} ms; "
+          f"backfilled {scanned} rows in {elapsed:.1f}s ({scanned / elapsed:.0f} rows/s)")
+    for label, ok in checks.items():
+        print(f"{label:<44} {'ok' if ok else 'FAILED'}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+What the instrumentation costs, switched off and on.
+
+  * statements: point lookups (execute + fetchone) on a plain sqlite3
+    connection vs. a ProfiledConnection
+  * requests: GET /get_patients?limit=100 and POST /add_patient through the
+    Flask test client, in a fresh process per HOSPITAL_METRICS setting
+    (it is read at import)
+
+How to run:
+    python benchmarks/bench_metrics.py [--patients 10000] [--requests 3000]
+
+Uses throwaway databases in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+CLIENT = """
+import sys, time, app
+app.app.config["RESPONSE_CACHE"] = False
+client = app.app.test_client()
+n = int(sys.argv[1])
+payload = {"name": "Bench Patient", "age": 40, "gender": "F"}
+for label, call in (("GET /get_patients?limit=100", lambda: client.get("/get_patients?limit=100")),
+                    ("POST /add_patient", lambda: client.post("/add_patient", json=payload))):
+    start = time.perf_counter()
+    for _ in range(n):
+        call().close()
+    print(f"{label}\\t{n / (time.perf_counter() - start):.0f}")
+"""
+
+
+def statements(path, n):
+    results = {}
+    for label in ("plain", "profiled"):
+        hls.PROFILER = hls.Profiler(slow_ms=float("inf")) if label == "profiled" else None
+        conn = hls.connect(path)
+        start = time.perf_counter()
+        for i in range(n):
+            conn.execute("SELECT name, age FROM patients WHERE id = ?", (i % 1000 + 1,)).fetchone()
+        results[label] = n / (time.perf_counter() - start)
+        conn.close()
+    hls.PROFILER = None
+    return results
+
+
+def requests(path, n):
+    results = {}
+    for metrics in ("0", "1"):
+        env = dict(os.environ, HOSPITAL_DB=path, HOSPITAL_METRICS=metrics)
+        out = subprocess.run([sys.executable, "-c", CLIENT, str(n)], cwd=ROOT, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        for line in out.splitlines():
+            label, rate = line.split("\t")
+            results.setdefault(label, {})[metrics] = float(rate)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the metrics and SQL profiling overhead.")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--statements", type=int, default=200000)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "metrics.db")
+    datagen.load(path, args.patients)
+
+    rates = statements(path, args.statements)
+    print(f"{'':<32} {'off':>10} {'on':>10} {'overhead':>9}")
+    print(f"{'point lookups /s':<32} {rates['plain']:10.0f} {rates['profiled']:10.0f} "
+          f"{rates['plain'] / rates['profiled'] - 1:8.1%}")
+    for label, rate in requests(path, args.requests).items():
+        print(f"{label + ' /s':<32} {rate['0']:10.0f} {rate['1']:10.0f} {rate['0'] / rate['1'] - 1:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
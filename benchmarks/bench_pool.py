@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Requests/sec of the Flask API with and without the per-thread connection pool.
+
+How to run:
+    python benchmarks/bench_pool.py [--requests 5000] [--rows 200]
+
+Uses a throwaway database in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run(client, n_requests):
+    payload = {"name": "Bench Patient", "age": 40, "gender": "F"}
+    start = time.perf_counter()
+    for i in range(n_requests):
+        if i % 10 == 0:
+            client.post("/add_patient", json=payload)
+        else:
+            client.get("/get_doctors")
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=200, help="doctors to seed")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hms-bench-")
+    os.environ["HOSPITAL_DB"] = os.path.join(tmp, "bench.db")
+    import app as api
+
+    with api.app.app_context():
+        conn = api.get_db()
+        conn.executemany("INSERT INTO doctors (name, specialization) VALUES (?, ?)",
+                         [(f"Dr. {i}", "General") for i in range(args.rows)])
+        conn.commit()
+
+    client = api.app.test_client()
+    results = {}
+    for label, pooled in (("connect per request", False), ("pooled", True)):
+        api.app.config["DB_POOL"] = pooled
+        run(client, 200)  # warm-up
+        results[label] = run(client, args.requests)
+        print(f"{label:<22} {results[label]:10.0f} req/s")
+    api.pool.close_all()
+    base = results["connect per request"]
+    print(f"{'speedup':<22} {results['pooled'] / base:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
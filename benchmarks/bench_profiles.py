@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Compare the SQLite performance profiles from hospital_lab_system.PERF_PROFILES.
+
+For each profile, on a fresh database:
+  * commits/sec of single-row insert transactions (what every "add" does)
+  * read queries/sec while a second thread keeps committing writes
+
+How to run:
+    python benchmarks/bench_profiles.py [--commits 2000] [--seconds 2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hospital_lab_system as hls  # noqa: E402
+
+
+def bench_commits(path, profile, n):
+    conn = hls.connect(path, profile)
+    start = time.perf_counter()
+    for i in range(n):
+        conn.execute("INSERT INTO doctors(name, specialization, contact) VALUES(?,?,?)",
+                     (f"Dr. {i}", "General", ""))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return n / elapsed
+
+
+def bench_mixed(path, profile, seconds):
+    stop = threading.Event()
+    writes = [0]
+
+    def writer():
+        conn = hls.connect(path, profile)
+        while not stop.is_set():
+            conn.execute("INSERT INTO doctors(name, specialization, contact) VALUES(?,?,?)",
+                         ("Dr. W", "General", ""))
+            conn.commit()
+            writes[0] += 1
+        conn.close()
+
+    t = threading.Thread(target=writer)
+    t.start()
+    conn = hls.connect(path, profile)
+    reads = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            conn.execute("SELECT COUNT(*) FROM doctors").fetchone()
+            reads += 1
+        except hls.sqlite3.OperationalError:  # "database is locked" without a busy timeout
+            pass
+    stop.set()
+    t.join()
+    conn.close()
+    return reads / seconds, writes[0] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite performance profiles.")
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--profiles", nargs="*", default=list(hls.PERF_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':<12} {'commits/s':>10} {'reads/s (mixed)':>16} {'writes/s (mixed)':>17}")
+    for profile in args.profiles:
+        tmp = tempfile.mkdtemp(prefix="hms-bench-")
+        path = os.path.join(tmp, f"{profile}.db")
+        hls.init_db(path, profile)
+        commits = bench_commits(path, profile, args.commits)
+        reads, writes = bench_mixed(path, profile, args.seconds)
+        print(f"{profile:<12} {commits:10.0f} {reads:16.0f} {writes:17.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Search: prefix hits, and misspelt words that fall back to close spellings.
+
+  * search(): words that match as prefixes vs. misspelt words
+  * close-spelling lookup for one misspelt word: scoring every vocabulary
+    term with the same first letter vs. _fuzzy_terms (two-letter prefix
+    ranges, length window, capped scan)
+
+--vocab adds that many patients with made-up surnames that all start with
+"s", so the vocabulary has a large block of terms sharing a first letter
+(the worst case for the first-letter scan).
+
+How to run:
+    python benchmarks/bench_search.py [--patients 300000] [--vocab 200000] [--repeat 50]
+
+Uses a throwaway database in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+PREFIX_QUERIES = ["rahul", "priya diab", "sharma fever", "neha chest", "kab"]
+TYPO_QUERIES = ["rahull", "priyaa", "sharmaa", "chaterjee", "diabetis", "sourv"]
+
+
+def first_letter_scan(conn, table, term):
+    """The close-spelling lookup before the prefix ranges and the cap."""
+    limit = 1 if len(term) < 7 else 2
+    rows = conn.execute(f"SELECT term, doc FROM {table}_fts_vocab WHERE term >= ? AND term < ?",
+                        (term[0], chr(ord(term[0]) + 1)))
+    scored = [(hls.edit_distance(term, t, limit), -doc, t) for t, doc in rows
+              if abs(len(t) - len(term)) <= limit]
+    return [t for d, _, t in sorted(scored) if 0 < d <= limit][:hls.SEARCH_MAX_CANDIDATES]
+
+
+def add_vocab(conn, n, seed=7):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    rows = (("Sneha S" + "".join(rng.choice(letters) for _ in range(rng.randint(4, 9))),
+             30, "Female", "9000000000", "Checkup") for _ in range(n))
+    with conn:
+        conn.executemany("INSERT INTO patients (name, age, gender, contact, disease) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def ms_per_call(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-text search.")
+    parser.add_argument("--patients", type=int, default=300000)
+    parser.add_argument("--vocab", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "search.db")
+    datagen.load(path, args.patients)
+    hls.init_db(path)
+    conn = hls.connect(path)
+    add_vocab(conn, args.vocab)
+    terms = conn.execute("SELECT count(*) FROM patients_fts_vocab").fetchone()[0]
+    s_terms = conn.execute("SELECT count(*) FROM patients_fts_vocab "
+                           "WHERE term >= 's' AND term < 't'").fetchone()[0]
+    print(f"{args.patients + args.vocab} patients, {terms} indexed terms ({s_terms} starting with s)")
+
+    print(f"\n{'search()':<28} {'ms/query':>10}")
+    for label, queries in (("prefix words", PREFIX_QUERIES), ("misspelt words", TYPO_QUERIES)):
+        print(f"{label:<28} {ms_per_call(lambda q: hls.search(conn, 'patients', q), queries, args.repeat):10.2f}")
+
+    words = [q.split()[0] for q in TYPO_QUERIES]
+    repeat = max(1, args.repeat // 10)
+    old = ms_per_call(lambda w: first_letter_scan(conn, "patients", w), words, repeat)
+    new = ms_per_call(lambda w: hls._fuzzy_terms(conn, "patients", w), words, args.repeat)
+    print(f"\n{'close spellings, one word':<28} {'ms/word':>10}")
+    print(f"{'first-letter scan':<28} {old:10.2f}")
+    print(f"{'prefix ranges, capped':<28} {new:10.2f}   {old / new:.0f}x")
+    for w in words:
+        print(f"  {w:<12} {', '.join(hls._fuzzy_terms(conn, 'patients', w)) or '-'}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the slot finder (hospital_lab_system.SlotIndex) on 1M appointments.
+
+Reported:
+  * time to build every doctor's schedule from the idx_appointments_doctor scan
+  * conflict checks/sec and next-free-slot lookups/sec from the index
+  * the same conflict check done with one SQL query per check, for comparison
+
+How to run:
+    python benchmarks/bench_slots.py [--appointments 1000000] [--doctors 200] [--checks 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hospital_lab_system as hls  # noqa: E402
+
+START = date(2024, 1, 1)
+SLOTS = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 15, 30, 45)]
+
+
+def populate(path, appointments, doctors, days, seed):
+    hls.init_db(path, "throughput")
+    conn = hls.connect(path, "throughput")
+    conn.executemany("INSERT INTO doctors(id, name, specialization, contact) VALUES(?,?,?,?)",
+                     [(d, f"Dr. {d}", "General", "") for d in range(1, doctors + 1)])
+    conn.executemany("INSERT INTO patients(id, name) VALUES(?,?)",
+                     [(p, f"Patient {p}") for p in range(1, 1001)])
+    rng = random.Random(seed)
+    batch = []
+    for i in range(appointments):
+        day = (START + timedelta(days=rng.randrange(days))).isoformat()
+        batch.append((rng.randint(1, 1000), rng.randint(1, doctors), day, rng.choice(SLOTS)))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO appointments(patient_id, doctor_id, date, time) "
+                             "VALUES(?,?,?,?)", batch)
+            batch.clear()
+    conn.executemany("INSERT INTO appointments(patient_id, doctor_id, date, time) "
+                     "VALUES(?,?,?,?)", batch)
+    conn.commit()
+    return conn
+
+
+def queries(n, doctors, days, seed):
+    rng = random.Random(seed)
+    return [(rng.randint(1, doctors), (START + timedelta(days=rng.randrange(days))).isoformat(),
+             rng.choice(SLOTS)) for _ in range(n)]
+
+
+def sql_is_free(conn, doctor_id, day, hhmm):
+    t = hls.to_minutes(day, hhmm)
+    for (other,) in conn.execute("SELECT time FROM appointments WHERE doctor_id = ? AND date = ?",
+                                 (doctor_id, day)):
+        u = hls.to_minutes(day, other)
+        if u < t + hls.SLOT_MINUTES and t < u + hls.SLOT_MINUTES:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the appointment slot finder.")
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "slots.db")
+    start = time.perf_counter()
+    conn = populate(path, args.appointments, args.doctors, args.days, args.seed)
+    print(f"loaded {args.appointments} appointments in {time.perf_counter() - start:.1f}s")
+
+    index = hls.SlotIndex()
+    start = time.perf_counter()
+    for doctor_id in range(1, args.doctors + 1):
+        index.schedule(conn, doctor_id)
+    print(f"build all schedules:  {time.perf_counter() - start:8.2f} s")
+
+    checks = queries(args.checks, args.doctors, args.days, args.seed + 1)
+    start = time.perf_counter()
+    free = sum(index.is_free(conn, d, day, t) for d, day, t in checks)
+    elapsed = time.perf_counter() - start
+    print(f"conflict checks:      {args.checks / elapsed:8.0f} /s  ({free} free)")
+
+    start = time.perf_counter()
+    for d, day, t in checks:
+        index.next_free(conn, d, day, t)
+    elapsed = time.perf_counter() - start
+    print(f"next free slot:       {args.checks / elapsed:8.0f} /s")
+
+    n = min(args.checks, 10000)
+    start = time.perf_counter()
+    sql_free = sum(sql_is_free(conn, d, day, t) for d, day, t in checks[:n])
+    elapsed = time.perf_counter() - start
+    print(f"SQL conflict checks:  {n / elapsed:8.0f} /s")
+    assert sql_free == sum(index.is_free(conn, d, day, t) for d, day, t in checks[:n])
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
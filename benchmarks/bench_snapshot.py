@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Front-desk writes while reports run: on the live database vs. the snapshot.
+
+A writer process commits one appointment at a time for --seconds while
+--readers threads loop over every report and full listing query
+(hospital_lab_system.QUERIES), either against the live file or through
+connect_reports() with a snapshot refreshed in the background. Reported per
+mode: writer commits/sec, commit latency percentiles, commits that gave up
+with "database is locked", report queries completed and snapshot refreshes.
+
+How to run:
+    python benchmarks/bench_snapshot.py [--patients 100000] [--readers 4] [--profile durable]
+
+Try --profile rollback too: there a reader on the live file blocks commits.
+Uses throwaway databases in a temp directory, never hospital.db.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+WRITER = """
+import json, sqlite3, sys, time
+import hospital_lab_system as hls
+path, seconds = sys.argv[1], float(sys.argv[2])
+conn = hls.connect(path)
+latencies, failed = [], 0
+deadline = time.perf_counter() + seconds
+while time.perf_counter() < deadline:
+    start = time.perf_counter()
+    try:
+        conn.execute("INSERT INTO appointments(patient_id, doctor_id, date, time) "
+                     "VALUES(1, 1, '2030-01-01', '09:00')")
+        conn.commit()
+        latencies.append(time.perf_counter() - start)
+    except sqlite3.OperationalError:  # database is locked, after busy_timeout
+        conn.rollback()
+        failed += 1
+print(json.dumps({"latencies": sorted(latencies), "failed": failed}))
+"""
+
+
+def reader(open_conn, deadline, done):
+    while time.perf_counter() < deadline:
+        for sql in hls.QUERIES.values():
+            conn = open_conn()
+            cur = conn.execute(sql)
+            while cur.fetchmany(1000):
+                pass
+            conn.close()
+            done.append(1)
+            if time.perf_counter() >= deadline:
+                return
+
+
+def run(mode, path, args):
+    hls.SNAPSHOT_MAX_AGE = args.max_age if mode == "snapshot" else 0
+    hls._snapshots.clear()
+    if mode == "snapshot":
+        hls._snapshots[path] = snapshot = hls.Snapshot(path)
+        snapshot.refresh()
+        snapshot.start()
+
+    def open_conn():
+        return hls.connect_reports(path)
+
+    env = dict(os.environ, HOSPITAL_DB_PROFILE=args.profile)
+    writer = subprocess.Popen([sys.executable, "-c", WRITER, path, str(args.seconds)],
+                              cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    done = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=reader, args=(open_conn, deadline, done))
+               for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    result = json.loads(writer.communicate()[0])
+    for t in threads:
+        t.join()
+    refreshes = hls._snapshots[path].generation if mode == "snapshot" else 0
+    return result["latencies"], result["failed"], len(done), refreshes
+
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark writes under reporting load.")
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--max-age", type=float, default=2, help="snapshot staleness bound (s)")
+    parser.add_argument("--profile", default="durable", choices=list(hls.PERF_PROFILES))
+    args = parser.parse_args()
+    hls.DB_PROFILE = args.profile
+
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "snapshot.db")
+    datagen.load(path, args.patients)
+    hls.init_db(path, args.profile)
+
+    print(f"{args.readers} report readers, 1 writer, {args.seconds}s, profile {args.profile}")
+    print(f"{'mode':<9} {'commits/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'locked':>7} {'reports':>8} {'refreshes':>9}")
+    for mode in ("live", "snapshot"):
+        latencies, failed, reports, refreshes = run(mode, path, args)
+        print(f"{mode:<9} {len(latencies) / args.seconds:9.0f} {pct(latencies, 50):8.2f} "
+              f"{pct(latencies, 99):8.2f} {pct(latencies, 100):8.1f} {failed:7d} {reports:8d} "
+              f"{refreshes:9d}")
+
+
+if __name__ == "__main__":
+    main()
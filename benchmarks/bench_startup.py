@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Cold start of both entry points, and what the schema check costs.
+
+  * subprocess: `import app` (API) and init_db() (console), median of
+    --repeat runs, on a new database, on one whose schema is current and on
+    one whose PRAGMA user_version was reset (every migration's DDL re-run,
+    which is what each start used to do)
+  * in process: init_db() on a current database vs. replaying every
+    migration, with --extra synthetic migrations (a table and an index each)
+    appended to show the current-schema path does not grow with the schema
+
+How to run:
+    python benchmarks/bench_startup.py [--repeat 5] [--extra 200]
+
+Uses throwaway databases in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hospital_lab_system as hls  # noqa: E402
+
+ENTRY_POINTS = {
+    "console": "import sys, hospital_lab_system as h; h.init_db(sys.argv[1])",
+    "api": "import app",
+}
+
+
+def reset_version(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+
+def cold_start(entry, path, prepare, repeat):
+    times = []
+    for i in range(repeat):
+        db = f"{path}.{entry}.{i}"
+        prepare(db)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", ENTRY_POINTS[entry], db], cwd=ROOT, check=True,
+                       env=dict(os.environ, HOSPITAL_DB=db))
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def add_synthetic_migrations(n):
+    def make(i):
+        def step(conn):
+            conn.execute(f"CREATE TABLE IF NOT EXISTS synthetic_{i} (id INTEGER PRIMARY KEY, v TEXT)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_synthetic_{i} ON synthetic_{i}(v)")
+        return step
+    hls.MIGRATIONS.extend((f"synthetic {i}", make(i)) for i in range(n))
+    hls.SCHEMA_VERSION = len(hls.MIGRATIONS)
+
+
+def in_process(path, repeat):
+    hls.init_db(path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        hls.init_db(path)
+    current = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        reset_version(path)
+        hls.init_db(path)
+    replay = (time.perf_counter() - start) / repeat
+    return current, replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start and schema checks.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--extra", type=int, default=200, help="synthetic migrations to add")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix="hms-bench-")
+    base = os.path.join(tmp, "start.db")
+
+    scenarios = {
+        "new database": lambda db: None,
+        "current schema": lambda db: hls.init_db(db),
+        "version reset": lambda db: (hls.init_db(db), reset_version(db)),
+    }
+    print(f"{'entry point':<10} " + " ".join(f"{name:>16}" for name in scenarios))
+    for entry in ENTRY_POINTS:
+        row = [cold_start(entry, base + name.replace(" ", "_"), prepare, args.repeat)
+               for name, prepare in scenarios.items()]
+        print(f"{entry:<10} " + " ".join(f"{t * 1000:13.1f} ms" for t in row))
+
+    print(f"\nin process, init_db() ({hls.SCHEMA_VERSION} migrations, then +{args.extra}):")
+    for label in ("schema", f"schema + {args.extra}"):
+        path = os.path.join(tmp, f"inproc{hls.SCHEMA_VERSION}.db")
+        current, replay = in_process(path, args.repeat * 20)
+        print(f"{label:<16} current {current * 1000:8.3f} ms   replay all {replay * 1000:8.2f} ms")
+        add_synthetic_migrations(args.extra)
+
+
+if __name__ == "__main__":
+    main()
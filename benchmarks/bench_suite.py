@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: every query in hospital_lab_system.py and every route in
+app.py, on synthetic data from datagen.py, with results written as JSON.
+
+How to run:
+    python benchmarks/bench_suite.py --patients 100000 --out results.json
+    python benchmarks/bench_suite.py --patients 100000 --compare results.json
+
+Timings are the best of --repeat runs. A query is timed to the last row
+(fetched in batches) and, for paged listings, to the first page. Routes go
+through the Flask test client, with streamed bodies read to the end.
+--compare prints the ratio to a previous results file and flags anything
+more than --threshold slower.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import hospital_lab_system as hls  # noqa: E402
+
+
+def best_of(repeat, fn):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def drain(cur, size=1000):
+    n = 0
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return n
+        n += len(rows)
+
+
+def bench_console(path, repeat):
+    results = {}
+    conn = hls.connect(path)
+    for name, sql in hls.QUERIES.items():
+        seconds, rows = best_of(repeat, lambda: drain(conn.execute(sql)))
+        results[f"query.{name}"] = {"seconds": seconds, "rows": rows}
+    for name in hls.LISTINGS:
+        sql = hls.listing_sql(name, limit=True)
+        seconds, rows = best_of(repeat, lambda: len(conn.execute(sql, (hls.PAGE_SIZE,)).fetchall()))
+        results[f"page.{name}"] = {"seconds": seconds, "rows": rows}
+    for by in ("day", "month"):  # the whole generated range, from the rollups
+        seconds, rows = best_of(repeat, lambda: len(hls.revenue(conn, "2023-01-01", "2024-12-31", by)))
+        results[f"report.revenue.{by}"] = {"seconds": seconds, "rows": rows}
+    conn.close()
+    return results
+
+
+API_LISTS = ["get_patients", "get_doctors", "get_appointments", "get_lab", "get_bills"]
+# The patient and doctor the other rows name are registered once, before the
+# timed adds: a name shared by two rows is refused.
+BENCH_PATIENT = {"name": "Bench Patient", "age": 40, "gender": "F"}
+BENCH_DOCTOR = {"name": "Dr. Bench", "specialization": "General Medicine"}
+API_ADDS = {
+    "add_patient": {"name": "Bench Walk-in", "age": 40, "gender": "F"},
+    "add_doctor": {"name": "Dr. Walk-in", "specialization": "General Medicine"},
+    "add_appointment": {"patient": "Bench Patient", "doctor": "Dr. Bench", "date": "2025-09-10"},
+    "add_lab": {"patient": "Bench Patient", "test": "CBC"},
+    "add_bill": {"patient": "Bench Patient", "amount": 500},
+}
+API_BULK = {
+    "patients": API_ADDS["add_patient"],
+    "doctors": API_ADDS["add_doctor"],
+    "appointments": API_ADDS["add_appointment"],
+    "lab": API_ADDS["add_lab"],
+    "bills": API_ADDS["add_bill"],
+}
+
+
+def bench_api(path, repeat):
+    os.environ["HOSPITAL_DB"] = path
+    import app as api
+    api.app.config["DATABASE"] = path
+    api.app.config["RESPONSE_CACHE"] = False  # measure the database, not the cache
+    client = api.app.test_client()
+
+    def get(url):
+        resp = client.get(url)
+        body = resp.get_data()
+        assert resp.status_code == 200, (url, resp.status_code)
+        return len(body)
+
+    def post(url, payload):
+        resp = client.post(url, json=payload)
+        assert resp.status_code == 200, (url, resp.status_code, resp.get_json())
+        return resp
+
+    results = {}
+    for route in API_LISTS:
+        for label, url in (("", f"/{route}"), (".page", f"/{route}?limit=100"),
+                           (".ndjson", f"/{route}?format=ndjson")):
+            seconds, size = best_of(repeat, lambda: get(url))
+            results[f"route.{route}{label}"] = {"seconds": seconds, "bytes": size}
+    post("/add_patient", BENCH_PATIENT)
+    post("/add_doctor", BENCH_DOCTOR)
+    for route, payload in API_ADDS.items():
+        seconds, _ = best_of(repeat, lambda: post(f"/{route}", payload))
+        results[f"route.{route}"] = {"seconds": seconds}
+    for resource, payload in API_BULK.items():
+        rows = [payload] * 1000
+        seconds, _ = best_of(repeat, lambda: post(f"/{resource}/bulk", rows))
+        results[f"route.bulk.{resource}"] = {"seconds": seconds, "rows": len(rows)}
+    api.pool.close_all()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, previous, threshold):
+    regressions = 0
+    print(f"{'benchmark':<40} {'before':>10} {'after':>10} {'ratio':>7}")
+    for name, result in sorted(current["results"].items()):
+        old = previous["results"].get(name)
+        if not old:
+            continue
+        ratio = result["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        flag = "  SLOWER" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{name:<40} {old['seconds'] * 1000:9.2f}ms {result['seconds'] * 1000:9.2f}ms "
+              f"{ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark console queries and API routes.")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="flag benchmarks this much slower than --compare (0.2 = 20%%)")
+    parser.add_argument("--skip-api", action="store_true")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="hms-bench-")
+    report = {
+        "meta": {
+            "patients": args.patients, "seed": args.seed, "repeat": args.repeat,
+            "git_commit": git_commit(), "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version, "platform": platform.platform(),
+            "db_profile": hls.DB_PROFILE, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+
+    console_db = os.path.join(tmp, "console.db")
+    seconds, counts = best_of(1, lambda: datagen.load(console_db, args.patients, args.seed))
+    report["results"]["load.console"] = {"seconds": seconds, "rows": sum(counts.values())}
+    report["results"].update(bench_console(console_db, args.repeat))
+
+    if not args.skip_api:  # same schema; runs last because it adds rows
+        report["results"].update(bench_api(console_db, args.repeat))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        sys.exit(1 if compare(report, previous, args.threshold) else 0)
+    for name, result in sorted(report["results"].items()):
+        print(f"{name:<40} {result['seconds'] * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
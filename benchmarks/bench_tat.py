@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Lab turnaround analytics (hospital_lab_system.lab_turnaround) on 10M rows.
+
+Fills lab_tests with --rows reported tests in SQL (a recursive CTE, so the
+load itself is quick), then runs the per-test/per-week percentile pass in a
+fresh process with NumPy and with the stdlib fallback. Reported per mode:
+seconds, rows/sec and the process's peak RSS (Linux), which should not grow
+with --rows because rows are read in chunks; most of it is SQLite's mmap and
+page cache (PRAGMA mmap_size, cache_size).
+
+How to run:
+    pip install numpy   # optional, for the vectorized mode
+    python benchmarks/bench_tat.py [--rows 10000000]
+
+Uses a throwaway database in a temp directory, never hospital.db.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hospital_lab_system as hls  # noqa: E402
+
+TESTS = ["CBC", "Lipid Panel", "HbA1c", "LFT", "KFT", "TSH", "Urinalysis", "ECG", "X-Ray", "MRI"]
+START = 1672531200  # 2023-01-01
+FILL = f"""
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?),
+    t(i, ordered, tat) AS (  -- hashes of i, not random(): each reference would redraw it
+        SELECT i, {START} + i * 7919 * 104729 % (730 * 86400),
+               (i * 2654435761 % 600) * (1 + i * 40503 % 120) FROM n)
+    INSERT INTO lab_tests(patient_id, test_name, cost, ordered_on, reported_on, result)
+    SELECT 1, json_extract(?, '$[' || (i % {len(TESTS)}) || ']'), 100,
+           strftime('%Y-%m-%dT%H:%M:%S', ordered, 'unixepoch'),
+           strftime('%Y-%m-%dT%H:%M:%S', ordered + tat, 'unixepoch'), 'Normal'
+      FROM t
+"""
+RUN = """
+import sys, time
+import hospital_lab_system as hls
+if sys.argv[2] == "stdlib":
+    hls.np = None
+conn = hls.connect(sys.argv[1])
+start = time.perf_counter()
+by_test, by_week = hls.lab_turnaround(conn)
+elapsed = time.perf_counter() - start
+rows = sum(t.reported for t in by_test.values())
+with open("/proc/self/status") as status:  # ru_maxrss would include the parent's load
+    peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+print(rows, elapsed, peak // 1024)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lab turnaround analytics.")
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--modes", nargs="*", default=["numpy", "stdlib"])
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="hms-bench-"), "tat.db")
+    hls.init_db(path, "throughput")
+    conn = hls.connect(path, "throughput")
+    conn.execute("INSERT INTO patients(id, name) VALUES(1, 'Bench Patient')")
+    start = time.perf_counter()
+    conn.execute(FILL, (args.rows, hls.json.dumps(TESTS)))
+    conn.commit()
+    conn.close()
+    print(f"loaded {args.rows} lab tests in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'mode':<8} {'seconds':>8} {'rows/s':>10} {'peak MB':>8}")
+    for mode in args.modes:
+        if mode == "numpy" and hls.np is None:
+            print(f"{mode:<8} (not installed)")
+            continue
+        out = subprocess.run([sys.executable, "-c", RUN, path, mode], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout.split()
+        rows, elapsed, peak = int(out[0]), float(out[1]), int(out[2])
+        print(f"{mode:<8} {elapsed:8.1f} {rows / elapsed:10.0f} {peak:8d}")
+
+
+if __name__ == "__main__":
+    main()
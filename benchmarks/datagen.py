@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic data for benchmarking, from 1k to 10M patients.
+
+The same --seed and --patients always produce the same rows. Per patient the
+generator draws ~3 appointments, ~1.5 lab tests and a bill per appointment
+and per lab test; doctors are ~1 per 500 patients with a skewed (Zipf-like)
+share of the patients. Rows are produced lazily and written with batched
+executemany, so memory does not grow with the scale.
+
+How to run:
+    python benchmarks/datagen.py out.db --patients 100000 [--seed 42] [--schema console|legacy]
+
+--schema console writes the schema shared by hospital_lab_system.py and
+app.py; --schema legacy the one older app.py versions used (names instead of
+ids), e.g. to try `hospital_lab_system.py migrate-legacy` at scale.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hospital_lab_system as hls  # noqa: E402
+
+BATCH_SIZE = 20000
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Arjun", "Sai", "Reyansh", "Ishaan", "Kabir",
+               "Ananya", "Diya", "Aadhya", "Saanvi", "Myra", "Anika", "Riya", "Meera",
+               "Rahul", "Priya", "Amit", "Sneha", "Rohan", "Pooja", "Vikram", "Neha",
+               "Sourav", "Tanvi", "Karan", "Nisha", "Dev", "Kavya", "Imran", "Fatima"]
+LAST_NAMES = ["Chatterjee", "Das", "Khan", "Sen", "Gupta", "Bose", "Sharma", "Verma",
+              "Iyer", "Nair", "Reddy", "Patel", "Singh", "Mukherjee", "Banerjee", "Ghosh",
+              "Roy", "Mehta", "Joshi", "Kulkarni", "Pillai", "Menon", "Dutta", "Saha"]
+SPECIALIZATIONS = [("General Medicine", 30), ("Pediatrics", 12), ("Orthopedics", 10),
+                   ("Cardiology", 9), ("Gynecology", 9), ("Dermatology", 7), ("ENT", 6),
+                   ("Neurology", 5), ("Oncology", 4), ("Psychiatry", 4)]
+DISEASES = ["Fever", "Cough", "Back Pain", "Chest Pain", "Diabetes", "Hypertension",
+            "Migraine", "Fracture", "Asthma", "Skin Rash", "Checkup", "Anxiety"]
+LAB_TESTS = [("CBC", 400, 30), ("Lipid Panel", 700, 15), ("HbA1c", 550, 12),
+             ("LFT", 800, 10), ("KFT", 750, 10), ("TSH", 500, 8), ("Urinalysis", 250, 8),
+             ("ECG", 800, 4), ("X-Ray", 900, 2), ("MRI", 6500, 1)]
+SLOTS = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 15, 30, 45)]
+START = date(2023, 1, 1)
+DAYS = 730
+
+
+def patient_name(pid):
+    # A pure function of the id, so children can name their patient without a lookup.
+    return f"{FIRST_NAMES[pid * 7919 % len(FIRST_NAMES)]} {LAST_NAMES[pid * 104729 % len(LAST_NAMES)]}"
+
+
+def doctor_name(did):
+    return f"Dr. {FIRST_NAMES[did * 31 % len(FIRST_NAMES)][0]}. {LAST_NAMES[did * 17 % len(LAST_NAMES)]} {did}"
+
+
+def _cum(weights):
+    total, out = 0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+def generate(patients, seed=42):
+    """Yield (table, row) in foreign-key order; rows use explicit ids."""
+    rng = random.Random(seed)
+    n_doctors = max(3, patients // 500)
+    spec_names = [s for s, _ in SPECIALIZATIONS]
+    spec_cum = _cum(w for _, w in SPECIALIZATIONS)
+    doctor_cum = _cum(1 / (i + 1) ** 0.8 for i in range(n_doctors))  # a few busy doctors
+    test_cum = _cum(w for _, _, w in LAB_TESTS)
+    doctor_ids = range(1, n_doctors + 1)
+
+    for did in doctor_ids:
+        spec = rng.choices(spec_names, cum_weights=spec_cum)[0]
+        yield "doctors", (did, doctor_name(did), spec, f"98{did:08d}")
+
+    appt_id = lab_id = bill_id = 0
+    for pid in range(1, patients + 1):
+        doctor_id = rng.choices(doctor_ids, cum_weights=doctor_cum)[0] if rng.random() < 0.85 else None
+        gender = "F" if rng.random() < 0.5 else ("M" if rng.random() < 0.96 else "Other")
+        yield "patients", (pid, patient_name(pid), int(rng.triangular(0, 95, 40)), gender,
+                           f"90{pid:08d}", rng.choice(DISEASES), doctor_id)
+
+        for _ in range(int(rng.expovariate(1 / 3.0))):
+            appt_id += 1
+            day = START + timedelta(days=rng.randrange(DAYS))
+            did = doctor_id if doctor_id and rng.random() < 0.7 else rng.choice(doctor_ids)
+            yield "appointments", (appt_id, pid, did, day.isoformat(), rng.choice(SLOTS), "")
+            bill_id += 1
+            yield "billing", (bill_id, pid, float(rng.randrange(300, 1500, 50)), "Consultation",
+                              day.isoformat(), int(rng.random() < 0.75))
+
+        for _ in range(int(rng.expovariate(1 / 1.5))):
+            lab_id += 1
+            name, cost, _ = LAB_TESTS[rng.choices(range(len(LAB_TESTS)), cum_weights=test_cum)[0]]
+            ordered = datetime.combine(START, datetime.min.time()) + timedelta(
+                seconds=rng.randrange(DAYS * 86400))
+            if rng.random() < 0.85:
+                turnaround = timedelta(seconds=int(rng.lognormvariate(10, 1)))  # median ~6h
+                result = "Normal" if rng.random() < 0.8 else "Abnormal"
+                reported = (ordered + turnaround).isoformat(timespec="seconds")
+            else:
+                result = reported = None
+            yield "lab_tests", (lab_id, pid, name, float(cost), result,
+                                ordered.isoformat(timespec="seconds"), reported)
+            bill_id += 1
+            yield "billing", (bill_id, pid, float(cost), f"{name} Test",
+                              ordered.date().isoformat(), int(rng.random() < 0.75))
+
+
+# table -> INSERT for each schema, and how to map a console row onto it
+CONSOLE_INSERTS = {
+    "doctors": "INSERT INTO doctors(id, name, specialization, contact) VALUES(?,?,?,?)",
+    "patients": """INSERT INTO patients(id, name, age, gender, contact, disease, doctor_id)
+                   VALUES(?,?,?,?,?,?,?)""",
+    "appointments": "INSERT INTO appointments(id, patient_id, doctor_id, date, time, notes) VALUES(?,?,?,?,?,?)",
+    "lab_tests": """INSERT INTO lab_tests(id, patient_id, test_name, cost, result, ordered_on, reported_on)
+                    VALUES(?,?,?,?,?,?,?)""",
+    "billing": "INSERT INTO billing(id, patient_id, amount, description, billed_on, paid) VALUES(?,?,?,?,?,?)",
+}
+LEGACY_DDL = [
+    "CREATE TABLE patients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, age INTEGER, gender TEXT)",
+    "CREATE TABLE doctors (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, specialization TEXT)",
+    "CREATE TABLE appointments (id INTEGER PRIMARY KEY AUTOINCREMENT, patient TEXT, doctor TEXT, date TEXT)",
+    "CREATE TABLE lab_tests (id INTEGER PRIMARY KEY AUTOINCREMENT, patient TEXT, test_name TEXT)",
+    "CREATE TABLE billing (id INTEGER PRIMARY KEY AUTOINCREMENT, patient TEXT, amount REAL)",
+]
+LEGACY_INSERTS = {
+    "doctors": ("INSERT INTO doctors(id, name, specialization) VALUES(?,?,?)",
+                lambda r: r[:3]),
+    "patients": ("INSERT INTO patients(id, name, age, gender) VALUES(?,?,?,?)",
+                 lambda r: r[:4]),
+    "appointments": ("INSERT INTO appointments(id, patient, doctor, date) VALUES(?,?,?,?)",
+                     lambda r: (r[0], patient_name(r[1]), doctor_name(r[2]), r[3])),
+    "lab_tests": ("INSERT INTO lab_tests(id, patient, test_name) VALUES(?,?,?)",
+                  lambda r: (r[0], patient_name(r[1]), r[2])),
+    "billing": ("INSERT INTO billing(id, patient, amount) VALUES(?,?,?)",
+                lambda r: (r[0], patient_name(r[1]), r[2])),
+}
+FLUSH_ORDER = ["doctors", "patients", "appointments", "lab_tests", "billing"]
+
+
+def load(path, patients, seed=42, schema="console", progress=None):
+    """Create the schema in path and fill it; returns {table: rows written}."""
+    if schema == "console":
+        hls.init_db(path, "throughput")
+        conn = hls.connect(path, "throughput")
+        inserts = {t: (sql, None) for t, sql in CONSOLE_INSERTS.items()}
+    else:
+        conn = sqlite3.connect(path)
+        hls.apply_profile(conn, "throughput")
+        for sql in LEGACY_DDL:
+            conn.execute(sql)
+        inserts = LEGACY_INSERTS
+
+    buffers = {t: [] for t in FLUSH_ORDER}
+    counts = dict.fromkeys(FLUSH_ORDER, 0)
+
+    def flush():
+        for table in FLUSH_ORDER:  # parents before children
+            rows = buffers[table]
+            if rows:
+                sql, convert = inserts[table]
+                conn.executemany(sql, rows if convert is None else map(convert, rows))
+                counts[table] += len(rows)
+                rows.clear()
+        conn.commit()
+        if progress:
+            progress(counts)
+
+    pending = 0
+    for table, row in generate(patients, seed):
+        buffers[table].append(row)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            flush()
+            pending = 0
+    flush()
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic hospital database.")
+    parser.add_argument("path")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema", choices=["console", "legacy"], default="console")
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+
+    start = time.perf_counter()
+
+    def progress(counts):
+        print(f"\r{counts['patients']:>10} / {args.patients} patients", end="", file=sys.stderr)
+
+    counts = load(args.path, args.patients, args.seed, args.schema, progress)
+    print(file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(", ".join(f"{t}={n}" for t, n in counts.items()) + f" in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
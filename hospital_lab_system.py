@@ -6,102 +6,1732 @@ Hospital & Lab Management System (Console, SQLite)
 Single-file Python project suitable for college submissions.
 
 How to run:
-    python hospital_lab_system.py
+    python hospital_lab_system.py            # interactive menu
+    python hospital_lab_system.py explain    # check query plans use the indexes
+    python hospital_lab_system.py rebuild-summaries
+    python hospital_lab_system.py import patients.csv [--table patients] [--reject rejects.csv]
+    python hospital_lab_system.py next-slot DOCTOR_ID [--after "YYYY-MM-DD HH:MM"]
+    python hospital_lab_system.py search "ananya sen" [--table doctors] [-k 10]
+    python hospital_lab_system.py migrate-legacy hospital.db [--drop-legacy-columns]
+    python hospital_lab_system.py export [bills ...] [--out DIR] [--format csv|columnar]
+    python hospital_lab_system.py revenue [--from 2025-01-01] [--to 2025-12-31] [--by day|month]
+    python hospital_lab_system.py lab-tat [--by test|week] [--from DATE] [--to DATE] [--histogram] [--history]
+    python hospital_lab_system.py archive --before 2024-01-01 [--archive hospital_lab_archive.db] [--vacuum]
+    python hospital_lab_system.py --profile [command]   # SQL timings on exit
 
 Python version: 3.8+
-Dependencies: Only Python standard library (sqlite3, datetime, textwrap, os, sys)
+Dependencies: Only Python standard library (sqlite3, datetime, textwrap, argparse, csv, json, ...)
+              NumPy, if installed, speeds up lab-tat on large tables.
+
+Set HOSPITAL_DB_PROFILE to "durable" (default), "throughput" or "rollback"
+to pick the SQLite performance profile (see PERF_PROFILES).
 
 Author: Your Team
 """
 
+import argparse
+import atexit
+import csv
+import inspect
+import json
+import math
 import os
+import re
 import sys
 import sqlite3
-from datetime import datetime
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
 from textwrap import dedent
 
+try:
+    import numpy as np  # optional: vectorizes lab turnaround analytics
+except ImportError:
+    np = None
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "hospital_lab.db")
 
+# Named PRAGMA presets applied to every connection when it is opened.
+# "durable" fsyncs on every commit; "throughput" only at WAL checkpoints,
+# so a power loss can drop the last few commits (never corrupts the file).
+PERF_PROFILES = {
+    "rollback": {"journal_mode": "DELETE"},  # SQLite built-ins, the old behaviour
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,       # negative = KiB, i.e. 64 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,           # ms
+    },
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 1024 * 1024 * 1024,
+        "cache_size": -256 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+DB_PROFILE = os.environ.get("HOSPITAL_DB_PROFILE", "durable")
+
 
 # ---------------------------
 # Database Utilities
 # ---------------------------
-def connect():
-    conn = sqlite3.connect(DB_PATH)
+def apply_profile(conn, profile=None):
+    name = profile or DB_PROFILE
+    if name not in PERF_PROFILES:
+        raise ValueError(f"Unknown DB profile {name!r}; choose from {', '.join(PERF_PROFILES)}")
+    for pragma, value in PERF_PROFILES[name].items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+def connect(db_path=None, profile=None):
+    conn = sqlite3.connect(db_path or DB_PATH, factory=connection_class())
+    conn.row_factory = sqlite3.Row
+    # The schema relies on ON DELETE CASCADE / SET NULL; SQLite needs this per connection.
+    conn.execute("PRAGMA foreign_keys = ON")
+    return apply_profile(conn, profile)
+
+
+def init_db(db_path=None, profile=None):
+    """Bring the database schema up to date; returns the number of migrations run."""
+    # A bare connection reads user_version without parsing the schema (the
+    # profile PRAGMAs would), so a current database costs the same at any size.
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        if schema_version(conn) == SCHEMA_VERSION:
+            return 0
+    finally:
+        conn.close()
+    conn = connect(db_path, profile)
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+def table_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    return row is not None
+
+
+# Secondary indexes. The listing indexes end with (id, <join keys>) so that
+# the ORDER BY is served by an index walk that also carries the join keys;
+# the partial ones only hold the rows the "pending"/"unpaid" views read.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_patients_doctor ON patients(doctor_id)",
+    "CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name)",
+    "CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors(name)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments(patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_doctor ON appointments(doctor_id, date, time)",
+    "CREATE INDEX IF NOT EXISTS idx_lab_tests_patient ON lab_tests(patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_billing_patient ON billing(patient_id)",
+    """CREATE INDEX IF NOT EXISTS idx_appointments_date_time
+           ON appointments(date, time, id, patient_id, doctor_id)""",
+    """CREATE INDEX IF NOT EXISTS idx_lab_tests_ordered_on
+           ON lab_tests(ordered_on, id, patient_id)""",
+    """CREATE INDEX IF NOT EXISTS idx_lab_tests_pending
+           ON lab_tests(ordered_on, id, patient_id) WHERE result IS NULL""",
+    """CREATE INDEX IF NOT EXISTS idx_billing_billed_on
+           ON billing(billed_on, id, patient_id)""",
+    """CREATE INDEX IF NOT EXISTS idx_billing_unpaid
+           ON billing(billed_on, id, patient_id) WHERE paid = 0""",
+]
+
+
+# ---------------------------
+# Profiling
+# ---------------------------
+# Opt-in SQL timing for `--profile` and app.py's /metrics. Until
+# enable_profiling() is called, connect() hands out plain sqlite3
+# connections and nothing below runs.
+SLOW_QUERY_MS = float(os.environ.get("HOSPITAL_SLOW_QUERY_MS", "100"))
+PROFILE_MAX_STATEMENTS = 500  # distinct statement texts tracked; the rest go to "(other)"
+PROFILER = None
+
+
+class SQLStats:
+    """Statements run and seconds spent in SQLite."""
+    __slots__ = ("statements", "seconds", "max_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class Profiler:
+    """Totals per statement text, and a log line for each statement slower than slow_ms.
+
+    A statement's time is its execute() plus the fetch*() calls on its cursor
+    (rows read by iterating a cursor are not timed), so a slow SELECT is
+    logged once its rows have taken slow_ms to produce.
+    """
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=None):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log or (lambda line: print(line, file=sys.stderr))
+        self.totals = SQLStats()
+        self.slow = 0
+        self.by_sql = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed, statements, stats, before, after):
+        if stats is not None:
+            stats.statements += statements
+            stats.seconds += elapsed
+        slow = before * 1000 < self.slow_ms <= after * 1000
+        with self._lock:
+            entry = self.by_sql.get(sql)
+            if entry is None:
+                if len(self.by_sql) >= PROFILE_MAX_STATEMENTS:
+                    sql = "(other)"
+                entry = self.by_sql.setdefault(sql, SQLStats())
+            entry.statements += statements
+            entry.seconds += elapsed
+            entry.max_seconds = max(entry.max_seconds, after)
+            self.totals.statements += statements
+            self.totals.seconds += elapsed
+            self.slow += slow
+        if slow:
+            self.slow_log(f"slow query ({after * 1000:.1f} ms): {' '.join(sql.split())}")
+
+    def report(self, top=10, file=None):
+        file = file or sys.stderr
+        with self._lock:
+            rows = sorted(self.by_sql.items(), key=lambda kv: kv[1].seconds, reverse=True)[:top]
+            totals, slow = self.totals, self.slow
+        print(f"\nSQL: {totals.statements} statements, {totals.seconds * 1000:.1f} ms in SQLite, "
+              f"{slow} slower than {self.slow_ms:g} ms", file=file)
+        if rows:
+            print(f"{'calls':>8} {'total ms':>10} {'max ms':>9}  statement", file=file)
+        for sql, entry in rows:
+            text = " ".join(sql.split())
+            print(f"{entry.statements:>8} {entry.seconds * 1000:>10.1f} "
+                  f"{entry.max_seconds * 1000:>9.1f}  {text[:100]}", file=file)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    sql = None
+    spent = 0.0  # seconds so far on the current statement
+
+    def _timed(self, start, statements):
+        elapsed = time.perf_counter() - start
+        before, self.spent = self.spent, self.spent + elapsed
+        conn = self.connection
+        conn.profiler.record(self.sql, elapsed, statements, conn.stats, before, self.spent)
+
+    def _begin(self, sql):
+        self.sql, self.spent = sql, 0.0
+        return time.perf_counter()
+
+    def execute(self, sql, parameters=()):
+        start = self._begin(sql)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._timed(start, 1)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = self._begin(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._timed(start, 1)
+
+    def executescript(self, script):
+        start = self._begin(script)
+        try:
+            return super().executescript(script)
+        finally:
+            self._timed(start, 1)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._timed(start, 0)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._timed(start, 0)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._timed(start, 0)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """A connection whose statements and commits are timed into PROFILER.
+
+    Set .stats to an SQLStats to also add them up per request or command.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profiler = PROFILER
+        self.stats = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.profiler.record("COMMIT", elapsed, 1, self.stats, 0.0, elapsed)
+
+
+def enable_profiling(profiler=None):
+    """Time every statement on connections opened from now on; returns the Profiler."""
+    global PROFILER
+    PROFILER = profiler or Profiler()
+    return PROFILER
+
+
+def connection_class():
+    return sqlite3.Connection if PROFILER is None else ProfiledConnection
+
+
+# ---------------------------
+# Snapshot Replica
+# ---------------------------
+# Reports and listings can read from a copy of the database instead of the
+# live file. The copy is refreshed with the online backup API a few pages
+# at a time and swapped in atomically, so long reads never hold locks on
+# the live database. Off unless HOSPITAL_SNAPSHOT_MAX_AGE (the staleness
+# bound, in seconds) is set.
+SNAPSHOT_MAX_AGE = float(os.environ.get("HOSPITAL_SNAPSHOT_MAX_AGE", "0"))
+SNAPSHOT_PAGES = 256     # pages copied per backup step
+SNAPSHOT_PAUSE = 0.001   # seconds between steps, to leave the disk to writers
+
+
+class Snapshot:
+    """A read-only copy of db_path, never older than max_age seconds when read."""
+
+    def __init__(self, db_path, max_age=None, pages=SNAPSHOT_PAGES, pause=SNAPSHOT_PAUSE):
+        self.db_path = db_path
+        self.path = db_path + ".snapshot"
+        self.max_age = SNAPSHOT_MAX_AGE if max_age is None else max_age
+        self.pages = pages
+        self.pause = pause
+        self.taken = None        # time.monotonic() the current copy is as of
+        self.generation = 0      # bumped by every refresh
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def age(self):
+        return float("inf") if self.taken is None else time.monotonic() - self.taken
+
+    def refresh(self):
+        """Copy the live database into a new snapshot file and swap it in."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        source = sqlite3.connect(self.db_path)
+        dest = sqlite3.connect(tmp)
+        try:
+            taken = time.monotonic()
+            if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                # Pin one WAL snapshot for every step: the copy is consistent
+                # and is not restarted by commits, which carry on meanwhile.
+                source.execute("BEGIN")
+                source.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+            source.backup(dest, pages=self.pages,
+                          progress=lambda *_: self.pause and time.sleep(self.pause))
+            dest.execute("PRAGMA journal_mode = DELETE")  # readable with mode=ro
+        finally:
+            source.close()
+            dest.close()
+        os.replace(tmp, self.path)
+        self.taken = taken
+        self.generation += 1
+
+    def connect(self, **kwargs):
+        """Read-only connection to the snapshot, refreshing it first if it is too old."""
+        if self.age() > self.max_age:
+            with self._lock:
+                if self.age() > self.max_age:  # another thread may have just refreshed
+                    self._refresh()
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                               factory=connection_class(), **kwargs)
+
+    def start(self, interval=None):
+        """Refresh in a background thread every interval seconds (default max_age / 2)."""
+        interval = interval or max(self.max_age / 2, 0.1)
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except sqlite3.Error as e:
+                    print(f"Snapshot refresh failed: {e}", file=sys.stderr)
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=run, name="hms-snapshot", daemon=True)
+        self._thread.start()
+
+
+_snapshots = {}
+
+
+def connect_reports(db_path=None):
+    """Connection for reports and listings: the snapshot when enabled, else connect()."""
+    if SNAPSHOT_MAX_AGE <= 0:
+        return connect(db_path)
+    path = db_path or DB_PATH
+    snapshot = _snapshots.get(path)
+    if snapshot is None:
+        snapshot = _snapshots[path] = Snapshot(path)
+    conn = snapshot.connect()
     conn.row_factory = sqlite3.Row
     return conn
 
 
-def init_db():
+# ---------------------------
+# Summary Tables
+# ---------------------------
+# patient_summary and doctor_load hold counters that triggers keep current,
+# so the two reports are one read each instead of fan-out joins over the
+# appointments, lab_tests, billing and patients tables.
+SUMMARY_TABLES = ("patient_summary", "doctor_load")
+
+SUMMARY_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS patient_summary (
+        patient_id INTEGER PRIMARY KEY,
+        appointments INTEGER NOT NULL DEFAULT 0,
+        lab_tests INTEGER NOT NULL DEFAULT 0,
+        unpaid_amount REAL NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_patients_summary_ins AFTER INSERT ON patients
+    BEGIN
+        INSERT OR IGNORE INTO patient_summary(patient_id) VALUES (NEW.id);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_patients_summary_del AFTER DELETE ON patients
+    BEGIN
+        DELETE FROM patient_summary WHERE patient_id = OLD.id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_appointments_summary_ins AFTER INSERT ON appointments
+    BEGIN
+        UPDATE patient_summary SET appointments = appointments + 1
+         WHERE patient_id = NEW.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_appointments_summary_del AFTER DELETE ON appointments
+    BEGIN
+        UPDATE patient_summary SET appointments = appointments - 1
+         WHERE patient_id = OLD.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_appointments_summary_upd
+    AFTER UPDATE OF patient_id ON appointments
+    WHEN OLD.patient_id IS NOT NEW.patient_id
+    BEGIN
+        UPDATE patient_summary SET appointments = appointments - 1
+         WHERE patient_id = OLD.patient_id;
+        UPDATE patient_summary SET appointments = appointments + 1
+         WHERE patient_id = NEW.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_lab_tests_summary_ins AFTER INSERT ON lab_tests
+    BEGIN
+        UPDATE patient_summary SET lab_tests = lab_tests + 1
+         WHERE patient_id = NEW.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_lab_tests_summary_del AFTER DELETE ON lab_tests
+    BEGIN
+        UPDATE patient_summary SET lab_tests = lab_tests - 1
+         WHERE patient_id = OLD.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_lab_tests_summary_upd
+    AFTER UPDATE OF patient_id ON lab_tests
+    WHEN OLD.patient_id IS NOT NEW.patient_id
+    BEGIN
+        UPDATE patient_summary SET lab_tests = lab_tests - 1
+         WHERE patient_id = OLD.patient_id;
+        UPDATE patient_summary SET lab_tests = lab_tests + 1
+         WHERE patient_id = NEW.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_billing_summary_ins AFTER INSERT ON billing
+    WHEN NEW.paid = 0
+    BEGIN
+        UPDATE patient_summary SET unpaid_amount = unpaid_amount + NEW.amount
+         WHERE patient_id = NEW.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_billing_summary_del AFTER DELETE ON billing
+    WHEN OLD.paid = 0
+    BEGIN
+        UPDATE patient_summary SET unpaid_amount = unpaid_amount - OLD.amount
+         WHERE patient_id = OLD.patient_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_billing_summary_upd
+    AFTER UPDATE OF patient_id, amount, paid ON billing
+    BEGIN
+        UPDATE patient_summary
+           SET unpaid_amount = unpaid_amount - CASE OLD.paid WHEN 0 THEN OLD.amount ELSE 0 END
+         WHERE patient_id = OLD.patient_id;
+        UPDATE patient_summary
+           SET unpaid_amount = unpaid_amount + CASE NEW.paid WHEN 0 THEN NEW.amount ELSE 0 END
+         WHERE patient_id = NEW.patient_id;
+    END;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS doctor_load (
+        doctor_id INTEGER PRIMARY KEY,
+        appointments_count INTEGER NOT NULL DEFAULT 0,
+        patients_assigned INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_doctors_load_ins AFTER INSERT ON doctors
+    BEGIN
+        INSERT OR IGNORE INTO doctor_load(doctor_id) VALUES (NEW.id);
+    END;
+    """,
+    # Deleting a doctor cascades to appointments and nulls patients.doctor_id;
+    # those fire the triggers below against a row that is already gone.
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_doctors_load_del AFTER DELETE ON doctors
+    BEGIN
+        DELETE FROM doctor_load WHERE doctor_id = OLD.id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_appointments_load_ins AFTER INSERT ON appointments
+    BEGIN
+        UPDATE doctor_load SET appointments_count = appointments_count + 1
+         WHERE doctor_id = NEW.doctor_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_appointments_load_del AFTER DELETE ON appointments
+    BEGIN
+        UPDATE doctor_load SET appointments_count = appointments_count - 1
+         WHERE doctor_id = OLD.doctor_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_appointments_load_upd
+    AFTER UPDATE OF doctor_id ON appointments
+    WHEN OLD.doctor_id IS NOT NEW.doctor_id
+    BEGIN
+        UPDATE doctor_load SET appointments_count = appointments_count - 1
+         WHERE doctor_id = OLD.doctor_id;
+        UPDATE doctor_load SET appointments_count = appointments_count + 1
+         WHERE doctor_id = NEW.doctor_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_patients_load_ins AFTER INSERT ON patients
+    WHEN NEW.doctor_id IS NOT NULL
+    BEGIN
+        UPDATE doctor_load SET patients_assigned = patients_assigned + 1
+         WHERE doctor_id = NEW.doctor_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_patients_load_del AFTER DELETE ON patients
+    WHEN OLD.doctor_id IS NOT NULL
+    BEGIN
+        UPDATE doctor_load SET patients_assigned = patients_assigned - 1
+         WHERE doctor_id = OLD.doctor_id;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_patients_load_upd
+    AFTER UPDATE OF doctor_id ON patients
+    WHEN OLD.doctor_id IS NOT NEW.doctor_id
+    BEGIN
+        UPDATE doctor_load SET patients_assigned = patients_assigned - 1
+         WHERE doctor_id = OLD.doctor_id;
+        UPDATE doctor_load SET patients_assigned = patients_assigned + 1
+         WHERE doctor_id = NEW.doctor_id;
+    END;
+    """,
+]
+
+
+SUMMARY_FILL = [
+    ("patients", """
+        INSERT OR REPLACE INTO patient_summary(patient_id, appointments, lab_tests, unpaid_amount)
+        SELECT p.id,
+               (SELECT COUNT(*) FROM {appointments} a WHERE a.patient_id = p.id),
+               (SELECT COUNT(*) FROM {lab_tests} lt WHERE lt.patient_id = p.id),
+               (SELECT COALESCE(SUM(b.amount), 0) FROM {billing} b
+                 WHERE b.patient_id = p.id AND b.paid = 0)
+          FROM patients p
+         WHERE p.id > ? AND p.id <= ?;
+    """),
+    ("doctors", """
+        INSERT OR REPLACE INTO doctor_load(doctor_id, appointments_count, patients_assigned)
+        SELECT d.id,
+               (SELECT COUNT(*) FROM {appointments} a WHERE a.doctor_id = d.id),
+               (SELECT COUNT(*) FROM patients p WHERE p.doctor_id = d.id)
+          FROM doctors d
+         WHERE d.id > ? AND d.id <= ?;
+    """),
+]
+
+
+def fill_summaries(conn, chunk=None, history=False):
+    """Recompute summary rows in id ranges of chunk rows (all at once if None).
+
+    A generator: it yields after each range, so callers can commit between
+    ranges. Triggers keep rows already filled current in the meantime. With
+    history=True archived rows count too (the archive must be attached).
+    """
+    sources = history_sources(history)
+    for table, sql in SUMMARY_FILL:
+        sql = sql.format(**sources)
+        last = 0
+        while True:
+            (upper,) = conn.execute(f"SELECT MAX(id) FROM (SELECT id FROM {table} WHERE id > ? "
+                                    f"ORDER BY id LIMIT ?)", (last, chunk or -1)).fetchone()
+            if upper is None:
+                break
+            conn.execute(sql, (last, upper))
+            last = upper
+            yield
+
+
+def rebuild_summaries(conn):
+    """Recompute the summary tables and revenue rollups from the base tables and archive."""
+    history = attach_archive(conn, create=False)
+    conn.execute("DELETE FROM patient_summary")
+    conn.execute("DELETE FROM doctor_load")
+    for _ in fill_summaries(conn, history=history):
+        pass
+    fill_revenue(conn, history)
+
+
+def rebuild_summaries_command():
     with connect() as conn:
-        cur = conn.cursor()
+        rebuild_summaries(conn)
+        conn.commit()
+        patients = conn.execute("SELECT COUNT(*) FROM patient_summary").fetchone()[0]
+        doctors = conn.execute("SELECT COUNT(*) FROM doctor_load").fetchone()[0]
+        days = conn.execute("SELECT COUNT(*) FROM revenue_daily").fetchone()[0]
+    print(f"Summary tables rebuilt ({patients} patients, {doctors} doctors, {days} billing days).")
+    return 0
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS doctors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                specialization TEXT,
-                contact TEXT
-            );
-        """)
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS patients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                age INTEGER,
-                gender TEXT,
-                contact TEXT,
-                disease TEXT,
-                doctor_id INTEGER,
-                FOREIGN KEY (doctor_id) REFERENCES doctors(id)
-                    ON UPDATE CASCADE ON DELETE SET NULL
-            );
+# ---------------------------
+# Revenue Rollups
+# ---------------------------
+# Bills, billed and collected amounts per billing day and per month, kept
+# current by triggers on billing, so a revenue report over any date range
+# reads rollup rows (whole months, plus the days of partial months at the
+# ends) instead of scanning billing. Amounts are integer cents, so adding
+# and removing bills never drifts. "Collected" is what is paid now of the
+# bills billed in the period; billing has no payment date. Legacy bills have
+# no billed_on until migrate_legacy fills it; that UPDATE counts them then.
+REVENUE_ROLLUPS = [
+    # (table, key column, key expression over a billing row)
+    ("revenue_daily", "day", "{row}.billed_on"),
+    ("revenue_monthly", "month", "substr({row}.billed_on, 1, 7)"),
+]
+REVENUE_CENTS = "CAST(ROUND({row}.amount * 100) AS INTEGER)"
+REVENUE_HEADERS = ["Period", "Bills", "Billed", "Collected", "Outstanding"]
+
+
+def _revenue_upsert(table, key, expr, row, sign):
+    cents = REVENUE_CENTS.format(row=row)
+    return f"""
+        INSERT INTO {table}({key}, bills, billed_cents, collected_cents)
+        VALUES ({expr.format(row=row)}, {sign}1, {sign}{cents},
+                {sign}CASE {row}.paid WHEN 0 THEN 0 ELSE {cents} END)
+        ON CONFLICT({key}) DO UPDATE SET
+            bills = bills + excluded.bills,
+            billed_cents = billed_cents + excluded.billed_cents,
+            collected_cents = collected_cents + excluded.collected_cents;"""
+
+
+def revenue_ddl():
+    """CREATE statements for the rollup tables and their triggers on billing."""
+    ddl = []
+    for table, key, expr in REVENUE_ROLLUPS:
+        ddl += [
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} TEXT PRIMARY KEY,
+                bills INTEGER NOT NULL,
+                billed_cents INTEGER NOT NULL,
+                collected_cents INTEGER NOT NULL
+            ) WITHOUT ROWID""",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_billing_{table}_ins AFTER INSERT ON billing
+            BEGIN {_revenue_upsert(table, key, expr, "NEW", "")}
+            END""",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_billing_{table}_del AFTER DELETE ON billing
+            BEGIN {_revenue_upsert(table, key, expr, "OLD", "-")}
+            END""",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_billing_{table}_upd
+            AFTER UPDATE OF amount, paid, billed_on ON billing
+            BEGIN {_revenue_upsert(table, key, expr, "OLD", "-")}
+                  {_revenue_upsert(table, key, expr, "NEW", "")}
+            END""",
+        ]
+    return ddl
+
+
+def _revenue_change(table, key, expr, row, sign):
+    """Add (sign "") or take off (sign "-") a dated bill, dropping a period left with no bills."""
+    cents = REVENUE_CENTS.format(row=row)
+    sql = f"""
+        INSERT INTO {table}({key}, bills, billed_cents, collected_cents)
+        SELECT {expr.format(row=row)}, {sign}1, {sign}{cents},
+               {sign}CASE {row}.paid WHEN 0 THEN 0 ELSE {cents} END
+         WHERE {row}.billed_on IS NOT NULL
+        ON CONFLICT({key}) DO UPDATE SET
+            bills = bills + excluded.bills,
+            billed_cents = billed_cents + excluded.billed_cents,
+            collected_cents = collected_cents + excluded.collected_cents;"""
+    if sign:
+        sql += f"""
+        DELETE FROM {table} WHERE {key} = {expr.format(row=row)} AND bills = 0;"""
+    return sql
+
+
+def revenue_triggers():
+    """(name, CREATE statement) of each rollup trigger on billing.
+
+    They replace the ones revenue_ddl created: bills without a billing date
+    (legacy rows before migrate_legacy backfills it) are left out, and a day
+    or month is deleted once its last bill is taken off, as fill_revenue
+    would leave it.
+    """
+    triggers = []
+    for table, key, expr in REVENUE_ROLLUPS:
+        triggers += [
+            (f"trg_billing_{table}_ins", f"""
+            CREATE TRIGGER trg_billing_{table}_ins AFTER INSERT ON billing
+            WHEN NEW.billed_on IS NOT NULL
+            BEGIN {_revenue_change(table, key, expr, "NEW", "")}
+            END"""),
+            (f"trg_billing_{table}_del", f"""
+            CREATE TRIGGER trg_billing_{table}_del AFTER DELETE ON billing
+            WHEN OLD.billed_on IS NOT NULL
+            BEGIN {_revenue_change(table, key, expr, "OLD", "-")}
+            END"""),
+            # NEW is added before OLD is taken off, so a bill that stays in
+            # its period never empties (and drops) that period on the way.
+            (f"trg_billing_{table}_upd", f"""
+            CREATE TRIGGER trg_billing_{table}_upd
+            AFTER UPDATE OF amount, paid, billed_on ON billing
+            WHEN OLD.billed_on IS NOT NULL OR NEW.billed_on IS NOT NULL
+            BEGIN {_revenue_change(table, key, expr, "NEW", "")}
+                  {_revenue_change(table, key, expr, "OLD", "-")}
+            END"""),
+        ]
+    return triggers
+
+
+def fill_revenue(conn, history=False):
+    """Recompute both rollup tables from billing (one grouped scan each)."""
+    cents = REVENUE_CENTS.format(row="b")
+    source = history_sources(history)["billing"]
+    for table, key, expr in REVENUE_ROLLUPS:
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table}({key}, bills, billed_cents, collected_cents)
+            SELECT {expr.format(row="b")}, COUNT(*), SUM({cents}),
+                   SUM(CASE b.paid WHEN 0 THEN 0 ELSE {cents} END)
+              FROM {source} b
+             WHERE b.billed_on IS NOT NULL
+             GROUP BY 1
         """)
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                doctor_id INTEGER NOT NULL,
-                date TEXT NOT NULL,     -- YYYY-MM-DD
-                time TEXT NOT NULL,     -- HH:MM (24h)
-                notes TEXT,
-                FOREIGN KEY (patient_id) REFERENCES patients(id)
-                    ON UPDATE CASCADE ON DELETE CASCADE,
-                FOREIGN KEY (doctor_id) REFERENCES doctors(id)
-                    ON UPDATE CASCADE ON DELETE CASCADE
-            );
-        """)
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS lab_tests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                test_name TEXT NOT NULL,
-                cost REAL NOT NULL DEFAULT 0,
-                result TEXT,
-                ordered_on TEXT NOT NULL,   -- ISO timestamp
-                reported_on TEXT,           -- ISO timestamp
-                FOREIGN KEY (patient_id) REFERENCES patients(id)
-                    ON UPDATE CASCADE ON DELETE CASCADE
-            );
-        """)
+def _month_bounds(start, end):
+    """First day of the first whole month in start..end, and the day after the last one."""
+    first, after = date.fromisoformat(start), date.fromisoformat(end) + timedelta(days=1)
+    if first.day != 1:
+        first = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, after.replace(day=1)
+
+
+def revenue(conn, start, end, by="day"):
+    """(period, bills, billed, collected, outstanding) rows for start..end inclusive.
+
+    by="day" reads the daily rollup for the range. by="month" reads whole
+    months from the monthly rollup and sums only the days of a partial
+    first or last month from the daily one.
+    """
+    if start > end:
+        return []
+    amounts = ("bills, billed_cents / 100.0, collected_cents / 100.0, "
+               "(billed_cents - collected_cents) / 100.0")
+    if by == "day":
+        return conn.execute(f"SELECT day, {amounts} FROM revenue_daily "
+                            f"WHERE day BETWEEN ? AND ? AND bills > 0 ORDER BY day",
+                            (start, end)).fetchall()
+    if by != "month":
+        raise ValueError(f"Unknown revenue period {by!r}; use day or month")
+    first, after = _month_bounds(start, end)
+    end_excl = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+    if first >= after:  # no whole month: all of it from the daily rollup
+        months, head, tail = ("", ""), (start, end_excl), ("", "")
+    else:
+        months = (first.isoformat()[:7], (after - timedelta(days=1)).isoformat()[:7])
+        head, tail = (start, first.isoformat()), (after.isoformat(), end_excl)
+    return conn.execute(f"""
+        SELECT month, {amounts} FROM (
+            SELECT month, bills, billed_cents, collected_cents
+              FROM revenue_monthly WHERE month BETWEEN ? AND ?
+            UNION ALL
+            SELECT substr(day, 1, 7), SUM(bills), SUM(billed_cents), SUM(collected_cents)
+              FROM revenue_daily WHERE day >= ? AND day < ? GROUP BY 1
+            UNION ALL
+            SELECT substr(day, 1, 7), SUM(bills), SUM(billed_cents), SUM(collected_cents)
+              FROM revenue_daily WHERE day >= ? AND day < ? GROUP BY 1
+        ) WHERE bills > 0 ORDER BY month
+    """, (*months, *head, *tail)).fetchall()
+
+
+def revenue_totals(rows):
+    """("Total", bills, billed, collected, outstanding) summed over revenue() rows."""
+    sums = [sum(r[i] for r in rows) for i in range(1, 5)]
+    return ("Total", sums[0], *(round(x, 2) for x in sums[1:]))
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS billing (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                amount REAL NOT NULL CHECK (amount >= 0),
-                description TEXT,
-                billed_on TEXT NOT NULL,   -- ISO date
-                paid INTEGER NOT NULL DEFAULT 0, -- 0/1
-                FOREIGN KEY (patient_id) REFERENCES patients(id)
-                    ON UPDATE CASCADE ON DELETE CASCADE
-            );
-        """)
 
+# ---------------------------
+# Archive
+# ---------------------------
+# Past appointments, reported lab tests and paid bills older than a cutoff
+# move to a second database file, ATTACHed as "archive", so the hot tables
+# and their indexes stay small enough for the page cache. Rows move in
+# batches of ARCHIVE_BATCH_ROWS ids, each its own short transaction, so the
+# console and API keep writing in between. Archived rows still count in the
+# summary tables and revenue rollups: while a batch runs, a row in
+# maintenance_flags makes their delete triggers skip it (the flag is removed
+# before the commit, so no other connection ever sees it).
+# With the archive attached, <table>_history temp views UNION ALL the hot
+# and archived rows; the archive has the same indexes, so SQLite merges two
+# index walks and history listings page as cheaply as the hot ones. Ids are
+# AUTOINCREMENT, so a new hot row never reuses an archived id. An id in both
+# files (a snapshot taken before a batch moved, read with the live archive,
+# or a crash between the two commits) is read from the hot side only, at
+# the cost of one primary-key probe per archived row.
+ARCHIVE_PATH = os.environ.get("HOSPITAL_ARCHIVE_DB")  # default: <db>_archive.db beside it
+ARCHIVE_SCHEMA = "archive"
+ARCHIVE_BATCH_ROWS = 5000
+ARCHIVE_PAUSE = 0.01  # seconds between batches, to let writers in
+ARCHIVE_TABLES = {
+    # table -> rows old enough to archive (:cutoff is a YYYY-MM-DD date)
+    "appointments": "date < :cutoff",
+    "lab_tests": "reported_on IS NOT NULL AND ordered_on < :cutoff",
+    "billing": "paid = 1 AND billed_on < :cutoff",
+}
+ARCHIVING = "NOT EXISTS (SELECT 1 FROM maintenance_flags WHERE name = 'archiving')"
+# Delete triggers that keep counters; archiving a row must not undo them.
+ARCHIVE_GUARDED_TRIGGERS = [
+    "trg_appointments_summary_del",
+    "trg_appointments_load_del",
+    "trg_lab_tests_summary_del",
+    "trg_billing_summary_del",
+] + [f"trg_billing_{table}_del" for table, _, _ in REVENUE_ROLLUPS]
+
+
+def _guard_trigger(sql):
+    """sql with the trigger's WHEN clause extended to skip rows being archived."""
+    head, begin, body = sql.partition("BEGIN")
+    head = head.rstrip()
+    if re.search(r"\bWHEN\b", head):
+        head = re.sub(r"\bWHEN\s+(.*)$", rf"WHEN (\1) AND {ARCHIVING}", head, flags=re.S)
+    else:
+        head += f"\n    WHEN {ARCHIVING}"
+    return f"{head}\n    {begin}{body}"
+
+
+def archive_path(db_path=None):
+    if ARCHIVE_PATH:
+        return ARCHIVE_PATH
+    root, ext = os.path.splitext(db_path or DB_PATH)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def _archive_ddl(conn, table):
+    """CREATE statements for table and its indexes in the archive schema."""
+    info = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+    columns = ", ".join("id INTEGER PRIMARY KEY" if row[1] == "id" else f"{row[1]} {row[2]}"
+                        for row in info)
+    ddl = [f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{table} ({columns})"]
+    ddl += [sql.replace("EXISTS idx_", f"EXISTS {ARCHIVE_SCHEMA}.idx_", 1)
+            for sql in INDEXES if re.search(rf"\bON {table}\(", sql)]
+    return ddl
+
+
+def attach_archive(conn, path=None, create=True):
+    """ATTACH the archive and create the <table>_history views; False if there is none.
+
+    path defaults to archive_path() of the connection's own file, so pass it
+    for snapshot connections. With create=False (readers) a missing archive
+    file is not created, and the views are not made.
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if ARCHIVE_SCHEMA not in attached:
+        main_path = conn.execute("PRAGMA database_list").fetchone()[2]
+        path = path or archive_path(main_path or None)
+        if not create and not os.path.exists(path):
+            return False
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+    for table in ARCHIVE_TABLES:
+        if create:
+            for sql in _archive_ddl(conn, table):
+                conn.execute(sql)
+            # Columns added to the hot table since the archive was made.
+            archived = set(table_columns(conn, table, ARCHIVE_SCHEMA))
+            for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if row[1] not in archived:
+                    conn.execute(f"ALTER TABLE {ARCHIVE_SCHEMA}.{table} ADD COLUMN {row[1]} {row[2]}")
+        columns = ", ".join(table_columns(conn, table))
+        conn.execute(f"""
+            CREATE TEMP VIEW IF NOT EXISTS {table}_history AS
+            SELECT {columns} FROM main.{table}
+            UNION ALL
+            SELECT {columns} FROM {ARCHIVE_SCHEMA}.{table} a
+             WHERE NOT EXISTS (SELECT 1 FROM main.{table} h WHERE h.id = a.id)""")
+    return True
+
+
+def _archive_batch(conn, table, cutoff, last_id, batch_size):
+    """Move one id range of table's archivable rows; returns (its upper id, rows moved)."""
+    where = f"id > :last AND id <= :upper AND {ARCHIVE_TABLES[table]}"
+    params = {"cutoff": cutoff, "last": last_id, "batch": batch_size}
+    (upper,) = conn.execute(f"""
+        SELECT MAX(id) FROM (SELECT id FROM main.{table}
+                              WHERE id > :last AND {ARCHIVE_TABLES[table]}
+                              ORDER BY id LIMIT :batch)""", params).fetchone()
+    if upper is None:
+        return None, 0
+    params["upper"] = upper
+    columns = ", ".join(table_columns(conn, table))
+    # OR REPLACE: a WAL database commits the two files separately, so a crash
+    # can leave a batch in both; the hot copy is the one kept.
+    conn.execute(f"""INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{table}({columns})
+                     SELECT {columns} FROM main.{table} WHERE {where}""", params)
+    moved = conn.execute(f"DELETE FROM main.{table} WHERE {where}", params).rowcount
+    return upper, moved
+
+
+def archive_rows(db_path=None, before=None, path=None, batch_size=ARCHIVE_BATCH_ROWS,
+                 pause=ARCHIVE_PAUSE, vacuum=False):
+    """Move rows older than before (YYYY-MM-DD) to the archive; returns {table: rows moved}.
+
+    Archived rows are spread over the id order, so they leave the hot tables'
+    pages part empty; vacuum=True then rewrites the database compactly (it
+    blocks writers while it runs).
+    """
+    init_db(db_path)
+    conn = connect(db_path)
+    moved = dict.fromkeys(ARCHIVE_TABLES, 0)
+    try:
+        attach_archive(conn, path)
+        conn.commit()
+        for table in ARCHIVE_TABLES:
+            last_id = 0
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("INSERT INTO maintenance_flags(name) VALUES('archiving')")
+                    last_id, n = _archive_batch(conn, table, before, last_id, batch_size)
+                    conn.execute("DELETE FROM maintenance_flags WHERE name = 'archiving'")
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                if last_id is None:
+                    break
+                moved[table] += n
+                print(f"\r{table}: {moved[table]} archived", end="", file=sys.stderr, flush=True)
+                time.sleep(pause)
+            print(f"\r{table}: {moved[table]} archived        ", file=sys.stderr)
+        if vacuum:
+            conn.execute("VACUUM main")
+    finally:
+        conn.close()
+    return moved
+
+
+def archive_command(before, path=None, batch_size=ARCHIVE_BATCH_ROWS, vacuum=False):
+    moved = archive_rows(before=before, path=path, batch_size=batch_size, vacuum=vacuum)
+    print(f"Archived {', '.join(f'{n} {t}' for t, n in moved.items())} "
+          f"older than {before} to {path or archive_path()}.")
+    return 0
+
+
+def history_sources(history):
+    """table -> what to read it from: the <table>_history view when history is wanted."""
+    return {table: f"{table}_history" if history else table for table in ARCHIVE_TABLES}
+
+
+# Deleting a patient or doctor cascades to its hot rows only: the archive is
+# another file, out of the foreign keys' reach. delete_archived removes the
+# archived rows in the deleting transaction, and first takes them off the
+# counters that still include them.
+ARCHIVE_CASCADES = {
+    # parent table -> [(archived table, column referencing the parent)]
+    "patients": [("appointments", "patient_id"), ("lab_tests", "patient_id"),
+                 ("billing", "patient_id")],
+    "doctors": [("appointments", "doctor_id")],
+}
+
+
+def _revenue_uncount(table, key, expr):
+    cents = REVENUE_CENTS.format(row="r")
+    return f"""
+        INSERT INTO {table}({key}, bills, billed_cents, collected_cents)
+        SELECT {expr.format(row="r")}, -COUNT(*), -SUM({cents}),
+               -SUM(CASE r.paid WHEN 0 THEN 0 ELSE {cents} END)
+          FROM {{rows}} r
+         WHERE r.billed_on IS NOT NULL
+         GROUP BY 1
+        ON CONFLICT({key}) DO UPDATE SET
+            bills = bills + excluded.bills,
+            billed_cents = billed_cents + excluded.billed_cents,
+            collected_cents = collected_cents + excluded.collected_cents"""
+
+
+def _revenue_prune(table, key, expr):
+    return f"""DELETE FROM {table} WHERE bills = 0
+                AND {key} IN (SELECT {expr.format(row="r")} FROM {{rows}} r)"""
+
+
+# archived table -> statements taking {rows} (a subquery of them) off the counters
+ARCHIVE_UNCOUNT = {
+    "appointments": [
+        """UPDATE patient_summary SET appointments = appointments -
+               (SELECT COUNT(*) FROM {rows} r WHERE r.patient_id = patient_summary.patient_id)
+            WHERE patient_id IN (SELECT patient_id FROM {rows} r)""",
+        """UPDATE doctor_load SET appointments_count = appointments_count -
+               (SELECT COUNT(*) FROM {rows} r WHERE r.doctor_id = doctor_load.doctor_id)
+            WHERE doctor_id IN (SELECT doctor_id FROM {rows} r)""",
+    ],
+    "lab_tests": [
+        """UPDATE patient_summary SET lab_tests = lab_tests -
+               (SELECT COUNT(*) FROM {rows} r WHERE r.patient_id = patient_summary.patient_id)
+            WHERE patient_id IN (SELECT patient_id FROM {rows} r)""",
+    ],
+    "billing": [
+        """UPDATE patient_summary SET unpaid_amount = unpaid_amount -
+               (SELECT COALESCE(SUM(r.amount), 0) FROM {rows} r
+                 WHERE r.patient_id = patient_summary.patient_id AND r.paid = 0)
+            WHERE patient_id IN (SELECT patient_id FROM {rows} r)""",
+    ] + [_revenue_uncount(table, key, expr) for table, key, expr in REVENUE_ROLLUPS]
+      + [_revenue_prune(table, key, expr) for table, key, expr in REVENUE_ROLLUPS],
+}
+
+
+def delete_archived(conn, parent, row_id, path=None):
+    """Delete the archived rows of patient/doctor row_id, which the caller is deleting.
+
+    Call it before the parent's DELETE, with no transaction open yet (it may
+    ATTACH the archive); the caller commits both. Returns rows deleted.
+    """
+    if not attach_archive(conn, path, create=False):
+        return 0
+    deleted = 0
+    for table, column in ARCHIVE_CASCADES[parent]:
+        rows = f"(SELECT * FROM {ARCHIVE_SCHEMA}.{table} WHERE {column} = :id)"
+        for sql in ARCHIVE_UNCOUNT[table]:
+            conn.execute(sql.format(rows=rows), {"id": row_id})
+        deleted += conn.execute(f"DELETE FROM {ARCHIVE_SCHEMA}.{table} WHERE {column} = ?",
+                                (row_id,)).rowcount
+    return deleted
+
+
+# ---------------------------
+# Search (FTS5)
+# ---------------------------
+# <table>_fts is an external-content FTS5 index over the listed columns (the
+# text lives only in the base table), kept in sync by triggers. Prefix
+# indexes make "term*" lookups cheap; <table>_fts_vocab lists the indexed
+# terms, which is where typo-tolerant search finds its candidate spellings.
+SEARCH_INDEXES = {
+    "patients": ["name", "contact", "disease"],
+    "doctors": ["name", "specialization"],
+}
+SEARCH_K = 10
+SEARCH_MAX_CANDIDATES = 5  # alternative spellings tried per misspelt term
+SEARCH_MAX_SCANNED = 2000  # vocabulary terms compared per misspelt term, at most
+
+
+def search_ddl(table, columns):
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {cols}, content='{table}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts}_vocab USING fts5vocab({fts}, 'row')",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_ins AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_del AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{fts}_upd AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+            END""",
+    ]
+
+
+def init_search(conn, indexes=None):
+    """Create the search indexes (filling any new one); False if FTS5 is unavailable."""
+    for table, columns in (indexes or SEARCH_INDEXES).items():
+        fresh = not table_exists(conn, f"{table}_fts")
+        try:
+            for sql in search_ddl(table, columns):
+                conn.execute(sql)
+        except sqlite3.OperationalError:  # SQLite built without FTS5
+            return False
+        if fresh:
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+    return True
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _fuzzy_terms(conn, table, term):
+    """Indexed terms within edit distance 1 (2 for long words) of term, most common first."""
+    limit = 1 if len(term) < 7 else 2
+    # Candidates start with the term's first two letters, or its first and
+    # third (a second letter added, dropped or swapped). Each is a short range
+    # scan of the vocabulary, filtered by length in SQLite and capped, so a
+    # common prefix cannot make Python score a large part of the index.
+    scored = []
+    for prefix in dict.fromkeys((term[:2], term[0] + term[2])):
+        rows = conn.execute(f"""
+            SELECT term, doc FROM {table}_fts_vocab
+             WHERE term >= ? AND term < ? AND length(term) BETWEEN ? AND ?
+             LIMIT ?""", (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1),
+                          len(term) - limit, len(term) + limit, SEARCH_MAX_SCANNED))
+        scored += [(edit_distance(term, t, limit), -doc, t) for t, doc in rows]
+    return [t for d, _, t in sorted(scored) if 0 < d <= limit][:SEARCH_MAX_CANDIDATES]
+
+
+def _match_expr(terms, alternatives=None):
+    parts = []
+    for term in terms:
+        options = [f'"{term}"*'] + [f'"{t}"' for t in (alternatives or {}).get(term, [])]
+        parts.append(options[0] if len(options) == 1 else "(" + " OR ".join(options) + ")")
+    return " AND ".join(parts)
+
+
+def search(conn, table, query, k=SEARCH_K):
+    """Top-k rows of table matching query, best (BM25) first.
+
+    Every word is matched as a prefix. If that finds fewer than k rows, words
+    of 4+ letters are also matched against close spellings from the index
+    (edit distance 1, or 2 for words of 7+ letters, with the same first
+    letter and the same second or third; see _fuzzy_terms).
+    """
+    terms = [t.lower() for t in re.findall(r"\w+", query)]
+    if not terms:
+        return []
+    if not table_exists(conn, f"{table}_fts"):
+        return conn.execute(f"SELECT * FROM {table} WHERE name LIKE ? ORDER BY name LIMIT ?",
+                            (query.strip() + "%", k)).fetchall()
+    sql = f"""
+        SELECT t.* FROM (SELECT rowid, rank FROM {table}_fts
+                          WHERE {table}_fts MATCH ? ORDER BY rank LIMIT ?) f
+          JOIN {table} t ON t.id = f.rowid
+         ORDER BY f.rank"""
+    rows = conn.execute(sql, (_match_expr(terms), k)).fetchall()
+    if len(rows) < k:
+        # Only words: a "typo" in a phone number is a different phone number.
+        alternatives = {t: _fuzzy_terms(conn, table, t) for t in terms
+                        if len(t) >= 4 and t.isalpha()}
+        if any(alternatives.values()):
+            rows = conn.execute(sql, (_match_expr(terms, alternatives), k)).fetchall()
+    return rows
+
+
+SEARCH_HEADERS = {
+    "patients": ["id", "name", "age", "gender", "contact", "disease"],
+    "doctors": ["id", "name", "specialization", "contact"],
+}
+
+
+def search_records():
+    print("\n== Search ==")
+    table = "doctors" if input("Search (P)atients or (D)octors? [P]: ").strip().lower() == "d" \
+        else "patients"
+    query = input_nonempty("Name, contact, disease or specialization: ")
+    with connect() as conn:
+        start = time.perf_counter()
+        rows = search(conn, table, query)
+        elapsed = time.perf_counter() - start
+    headers = SEARCH_HEADERS[table]
+    pager = TablePager(headers, PAGE_SIZE, interactive=False)
+    pager.show(rows)
+    pager.close()
+    print(f"{len(rows)} match(es) in {elapsed * 1000:.1f} ms")
+
+
+# ---------------------------
+# Legacy API Databases
+# ---------------------------
+# Databases created by older versions of app.py store patient and doctor
+# names as free TEXT in appointments, lab_tests and billing. They are brought
+# onto this schema online: init_db adds the missing columns (metadata-only
+# ALTERs), then migrate_legacy fills the id columns in small batches, each a
+# short write transaction, so the API keeps serving. Progress is kept in
+# legacy_migration, so an interrupted run resumes where it stopped.
+LEGACY_NAME_COLUMNS = {
+    # table -> [(legacy name column, id column, referenced table)]
+    "appointments": [("patient", "patient_id", "patients"), ("doctor", "doctor_id", "doctors")],
+    "lab_tests": [("patient", "patient_id", "patients")],
+    "billing": [("patient", "patient_id", "patients")],
+}
+_PATIENT_FK = "INTEGER REFERENCES patients(id) ON UPDATE CASCADE ON DELETE CASCADE"
+LEGACY_ADD_COLUMNS = {
+    "doctors": [("contact", "TEXT")],
+    "patients": [("contact", "TEXT"), ("disease", "TEXT"),
+                 ("doctor_id", "INTEGER REFERENCES doctors(id) ON UPDATE CASCADE ON DELETE SET NULL")],
+    "appointments": [("patient_id", _PATIENT_FK),
+                     ("doctor_id", "INTEGER REFERENCES doctors(id) ON UPDATE CASCADE ON DELETE CASCADE"),
+                     ("time", "TEXT"), ("notes", "TEXT")],
+    "lab_tests": [("patient_id", _PATIENT_FK), ("cost", "REAL NOT NULL DEFAULT 0"),
+                  ("result", "TEXT"), ("ordered_on", "TEXT"), ("reported_on", "TEXT")],
+    "billing": [("patient_id", _PATIENT_FK), ("description", "TEXT"), ("billed_on", "TEXT"),
+                ("paid", "INTEGER NOT NULL DEFAULT 0")],
+}
+# Values for legacy rows, which never recorded these.
+LEGACY_FILL = {
+    "appointments": "time = COALESCE(time, '00:00')",
+    "lab_tests": "ordered_on = COALESCE(ordered_on, :now)",
+    "billing": "billed_on = COALESCE(billed_on, :today)",
+}
+LEGACY_BATCH_SIZE = 500
+UNKNOWN_NAME = "Unknown"
+
+
+def table_columns(conn, table, schema="main"):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def has_legacy_columns(conn):
+    return "patient" in table_columns(conn, "appointments")
+
+
+def add_legacy_columns(conn):
+    if not has_legacy_columns(conn):
+        return False
+    for table, columns in LEGACY_ADD_COLUMNS.items():
+        existing = set(table_columns(conn, table))
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    return True
+
+
+def lookup_name(conn, table, name, cache=None):
+    """Id of the first patient/doctor called name, or None if there is none."""
+    if cache is not None and name in cache:
+        return cache[name]
+    row = conn.execute(f"SELECT id FROM {table} WHERE name = ? ORDER BY id LIMIT 1",
+                       (name,)).fetchone()
+    if row is None:
+        return None
+    if cache is not None:
+        cache[name] = row[0]
+    return row[0]
+
+
+def resolve_name(conn, table, name, cache=None):
+    """(id, created) of the first patient/doctor called name, creating one if needed."""
+    name = (name or "").strip() or UNKNOWN_NAME
+    rowid = lookup_name(conn, table, name, cache)
+    if rowid is not None:
+        return rowid, False
+    rowid = conn.execute(f"INSERT INTO {table}(name) VALUES(?)", (name,)).lastrowid
+    if cache is not None:
+        cache[name] = rowid
+    return rowid, True
+
+
+def _backfill_batch(conn, table, last_id, batch_size, caches, stamp):
+    refs = LEGACY_NAME_COLUMNS[table]
+    cols = ", ".join(f"{name}, {id_col}" for name, id_col, _ in refs)
+    rows = conn.execute(f"SELECT id, {cols} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, batch_size)).fetchall()
+    sets = ", ".join(f"{id_col} = :{id_col}" for _, id_col, _ in refs)
+    sql = f"UPDATE {table} SET {sets}, {LEGACY_FILL[table]} WHERE id = :id"
+    for row in rows:
+        if all(row[id_col] is not None for _, id_col, _ in refs):
+            continue
+        params = dict(stamp, id=row["id"])
+        for name, id_col, ref in refs:
+            params[id_col] = row[id_col] if row[id_col] is not None \
+                else resolve_name(conn, ref, row[name], caches[ref])[0]
+        conn.execute(sql, params)
+    return rows[-1]["id"] if rows else None
+
+
+def migrate_legacy(db_path, batch_size=LEGACY_BATCH_SIZE, pause=0.01):
+    """Backfill the id columns of a legacy app.py database; returns rows scanned."""
+    init_db(db_path)
+    conn = connect(db_path)
+    if not has_legacy_columns(conn):
+        conn.close()
+        print("Nothing to migrate: the database has no legacy name columns.", file=sys.stderr)
+        return 0
+    conn.execute("""CREATE TABLE IF NOT EXISTS legacy_migration (
+                        table_name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)""")
+    conn.commit()
+    now = datetime.now()
+    stamp = {"now": now.isoformat(timespec="seconds"), "today": now.date().isoformat()}
+    caches = {"patients": {}, "doctors": {}}
+    scanned = 0
+    try:
+        for table in LEGACY_NAME_COLUMNS:
+            row = conn.execute("SELECT last_id FROM legacy_migration WHERE table_name = ?",
+                               (table,)).fetchone()
+            last_id = row[0] if row else 0
+            max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    new_last = _backfill_batch(conn, table, last_id, batch_size, caches, stamp)
+                    if new_last is not None:
+                        conn.execute("INSERT OR REPLACE INTO legacy_migration VALUES(?, ?)",
+                                     (table, new_last))
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    for cache in caches.values():  # may hold ids of rolled-back inserts
+                        cache.clear()
+                    raise
+                if new_last is None:
+                    break
+                scanned += min(batch_size, new_last - last_id)
+                last_id = new_last
+                print(f"\r{table}: id {last_id} / {max_id}", end="", file=sys.stderr, flush=True)
+                time.sleep(pause)  # let API writers in between batches
+            print(f"\r{table}: done ({max_id} max id)        ", file=sys.stderr)
+    finally:
+        conn.close()
+    return scanned
+
+
+def drop_legacy_columns(db_path):
+    """Drop the legacy name columns once every row is backfilled."""
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        raise RuntimeError("DROP COLUMN needs SQLite 3.35 or newer.")
+    with connect(db_path) as conn:
+        if not has_legacy_columns(conn):
+            return False
+        for table, refs in LEGACY_NAME_COLUMNS.items():
+            missing = " OR ".join(f"{id_col} IS NULL" for _, id_col, _ in refs)
+            if conn.execute(f"SELECT 1 FROM {table} WHERE {missing} LIMIT 1").fetchone():
+                raise RuntimeError(f"{table} still has rows to backfill; run migrate-legacy first.")
+        for table, refs in LEGACY_NAME_COLUMNS.items():
+            for name, _, _ in refs:
+                conn.execute(f"ALTER TABLE {table} DROP COLUMN {name}")
+        conn.execute("DROP TABLE IF EXISTS legacy_migration")
         conn.commit()
+    return True
+
+
+# ---------------------------
+# Schema Migrations
+# ---------------------------
+# PRAGMA user_version holds how many MIGRATIONS have been applied. init_db
+# runs the missing ones in order, each in its own transaction together with
+# the version bump; when the database is current it only reads the version,
+# so startup does no DDL however large the schema grows. Never edit or
+# reorder a released migration: append a new one.
+# A migration that is a generator commits at every yield, so large backfills
+# run as a series of short transactions; its steps must be safe to repeat.
+MIGRATION_CHUNK_ROWS = 10000
+
+
+def _create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS doctors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            specialization TEXT,
+            contact TEXT
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            gender TEXT,
+            contact TEXT,
+            disease TEXT,
+            doctor_id INTEGER,
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
+                ON UPDATE CASCADE ON DELETE SET NULL
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL,
+            date TEXT NOT NULL,     -- YYYY-MM-DD
+            time TEXT NOT NULL,     -- HH:MM (24h)
+            notes TEXT,
+            FOREIGN KEY (patient_id) REFERENCES patients(id)
+                ON UPDATE CASCADE ON DELETE CASCADE,
+            FOREIGN KEY (doctor_id) REFERENCES doctors(id)
+                ON UPDATE CASCADE ON DELETE CASCADE
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lab_tests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            test_name TEXT NOT NULL,
+            cost REAL NOT NULL DEFAULT 0,
+            result TEXT,
+            ordered_on TEXT NOT NULL,   -- ISO timestamp
+            reported_on TEXT,           -- ISO timestamp
+            FOREIGN KEY (patient_id) REFERENCES patients(id)
+                ON UPDATE CASCADE ON DELETE CASCADE
+        );
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS billing (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            amount REAL NOT NULL CHECK (amount >= 0),
+            description TEXT,
+            billed_on TEXT NOT NULL,   -- ISO date
+            paid INTEGER NOT NULL DEFAULT 0, -- 0/1
+            FOREIGN KEY (patient_id) REFERENCES patients(id)
+                ON UPDATE CASCADE ON DELETE CASCADE
+        );
+    """)
+
+
+def _create_indexes(conn):
+    for sql in INDEXES:
+        conn.execute(sql)
+
+
+def _create_summary_tables(conn):
+    fresh = not all(table_exists(conn, name) for name in SUMMARY_TABLES)
+    for sql in SUMMARY_DDL:
+        conn.execute(sql)
+    if fresh:
+        yield from fill_summaries(conn, MIGRATION_CHUNK_ROWS)
+
+
+def _create_revenue_rollups(conn):
+    for sql in revenue_ddl():
+        conn.execute(sql)
+    fill_revenue(conn)
+
+
+def _guard_counter_triggers(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS maintenance_flags (name TEXT PRIMARY KEY) WITHOUT ROWID")
+    for name in ARCHIVE_GUARDED_TRIGGERS:
+        (sql,) = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                              (name,)).fetchone()
+        if ARCHIVING not in sql:
+            conn.execute(f"DROP TRIGGER {name}")
+            conn.execute(_guard_trigger(sql))
+
+
+def _replace_revenue_triggers(conn):
+    for name, sql in revenue_triggers():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(_guard_trigger(sql) if name in ARCHIVE_GUARDED_TRIGGERS else sql)
+    for table, _, _ in REVENUE_ROLLUPS:
+        conn.execute(f"DELETE FROM {table} WHERE bills = 0")
+
+
+MIGRATIONS = [
+    ("base tables", _create_tables),
+    ("columns missing from older app.py databases", add_legacy_columns),
+    ("secondary indexes", _create_indexes),
+    ("summary tables and triggers", _create_summary_tables),
+    ("full-text search indexes", init_search),
+    ("daily and monthly revenue rollups", _create_revenue_rollups),
+    ("counter triggers skip rows being archived", _guard_counter_triggers),
+    ("revenue triggers skip undated bills and drop emptied periods", _replace_revenue_triggers),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    version = schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return 0
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this program "
+                           f"({SCHEMA_VERSION}); upgrade the program.")
+    applied = 0
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        _, step = MIGRATIONS[number - 1]
+        conn.execute("BEGIN IMMEDIATE")
+        if schema_version(conn) >= number:  # another process applied it meanwhile
+            conn.rollback()
+            continue
+        try:
+            chunks = step(conn)
+            for _ in chunks if inspect.isgenerator(chunks) else ():
+                conn.commit()
+                conn.execute("BEGIN IMMEDIATE")
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied += 1
+    return applied
+
+
+# ---------------------------
+# Queries
+# ---------------------------
+# Listings are paged with keyset queries: each page continues after the sort
+# key of the last row shown, so a page costs the same wherever it is in the
+# table and no read transaction stays open while the user is reading.
+#   select  - SELECT ... FROM ... (no WHERE / ORDER BY)
+#   where   - optional filter
+#   keys    - (SQL expression, result column) pairs forming a unique sort key
+LISTINGS = {
+    "doctors": {
+        "select": "SELECT id, name, specialization, contact FROM doctors",
+        "keys": [("id", "id")],
+        "headers": ["id", "name", "specialization", "contact"],
+    },
+    "patients": {
+        "select": """
+            SELECT p.id, p.name, p.age, p.gender, p.contact, p.disease,
+                   d.name AS doctor
+              FROM patients p
+         LEFT JOIN doctors d ON d.id = p.doctor_id""",
+        "keys": [("p.id", "id")],
+        "headers": ["id", "name", "age", "gender", "contact", "disease", "doctor"],
+    },
+    "appointments": {
+        "select": """
+            SELECT a.id, a.date, a.time, p.name AS patient, d.name AS doctor, a.notes
+              FROM appointments a
+              JOIN patients p ON p.id = a.patient_id
+              JOIN doctors d ON d.id = a.doctor_id""",
+        "keys": [("a.date", "date"), ("a.time", "time"), ("a.id", "id")],
+        "headers": ["id", "date", "time", "patient", "doctor", "notes"],
+    },
+    "lab_tests": {
+        "select": """
+            SELECT lt.id, p.name AS patient, lt.test_name, lt.cost,
+                   lt.ordered_on, lt.reported_on, COALESCE(lt.result, '') AS result
+              FROM lab_tests lt
+              JOIN patients p ON p.id = lt.patient_id""",
+        "keys": [("lt.ordered_on", "ordered_on"), ("lt.id", "id")],
+        "desc": True,
+        "headers": ["id", "patient", "test_name", "cost", "ordered_on", "reported_on", "result"],
+    },
+    "pending_lab_tests": {
+        "select": """
+            SELECT lt.id, p.name AS patient, lt.test_name, lt.cost, lt.ordered_on
+              FROM lab_tests lt
+              JOIN patients p ON p.id = lt.patient_id""",
+        "where": "lt.result IS NULL",
+        "keys": [("lt.ordered_on", "ordered_on"), ("lt.id", "id")],
+        "desc": True,
+        "headers": ["id", "patient", "test_name", "cost", "ordered_on"],
+    },
+    "bills": {
+        "select": """
+            SELECT b.id, p.name AS patient, b.amount, b.description, b.billed_on,
+                   CASE b.paid WHEN 1 THEN 'YES' ELSE 'NO' END AS paid
+              FROM billing b
+              JOIN patients p ON p.id = b.patient_id""",
+        "keys": [("b.billed_on", "billed_on"), ("b.id", "id")],
+        "desc": True,
+        "headers": ["id", "patient", "amount", "description", "billed_on", "paid"],
+    },
+    "unpaid_bills": {
+        "select": """
+            SELECT b.id, p.name AS patient, b.amount, b.description, b.billed_on
+              FROM billing b
+              JOIN patients p ON p.id = b.patient_id""",
+        "where": "b.paid = 0",
+        "keys": [("b.billed_on", "billed_on"), ("b.id", "id")],
+        "desc": True,
+        "headers": ["id", "patient", "amount", "description", "billed_on"],
+    },
+    "patient_summary": {
+        "select": """
+            SELECT p.id, p.name,
+                   COALESCE(s.appointments, 0) AS appointments,
+                   COALESCE(s.lab_tests, 0) AS lab_tests,
+                   ROUND(COALESCE(s.unpaid_amount, 0), 2) AS unpaid_amount
+              FROM patients p
+         LEFT JOIN patient_summary s ON s.patient_id = p.id""",
+        "keys": [("p.id", "id")],
+        "headers": ["id", "name", "appointments", "lab_tests", "unpaid_amount"],
+    },
+}
+
+
+def listing_sql(name, after=False, limit=False, history=False):
+    """SQL for a listing; with after=True it continues after a key (one ? per key).
+
+    history=True reads archived tables through their <table>_history views
+    (see attach_archive).
+    """
+    spec = LISTINGS[name]
+    exprs = [expr for expr, _ in spec["keys"]]
+    desc = spec.get("desc", False)
+    where = [spec["where"]] if spec.get("where") else []
+    if after:
+        op = "<" if desc else ">"
+        where.append(f"({', '.join(exprs)}) {op} ({', '.join('?' * len(exprs))})")
+    sql = spec["select"]
+    if history:
+        sources = history_sources(True)
+        sql = re.sub(r"\bFROM (\w+)", lambda m: f"FROM {sources.get(m[1], m[1])}", sql)
+    if where:
+        sql += "\n WHERE " + " AND ".join(where)
+    sql += "\n ORDER BY " + ", ".join(expr + (" DESC" if desc else "") for expr in exprs)
+    if limit:
+        sql += "\n LIMIT ?"
+    return sql
+
+
+QUERIES = {name: listing_sql(name) for name in LISTINGS}
+QUERIES["doctor_load"] = """
+    SELECT d.id, d.name, d.specialization,
+           COALESCE(l.appointments_count, 0) AS appointments_count,
+           COALESCE(l.patients_assigned, 0) AS patients_assigned
+      FROM doctors d
+ LEFT JOIN doctor_load l ON l.doctor_id = d.id
+  ORDER BY appointments_count DESC, d.name;
+"""
+DOCTOR_LOAD_HEADERS = ["id", "name", "specialization", "appointments_count", "patients_assigned"]
+
+# Indexes each query must use (checked with EXPLAIN QUERY PLAN).
+EXPECTED_INDEXES = {
+    "doctors": [],
+    "patients": [],
+    "appointments": ["idx_appointments_date_time"],
+    "lab_tests": ["idx_lab_tests_ordered_on"],
+    "pending_lab_tests": ["idx_lab_tests_pending"],
+    "bills": ["idx_billing_billed_on"],
+    "unpaid_bills": ["idx_billing_unpaid"],
+    "patient_summary": [],
+    "doctor_load": [],
+}
+
+
+def _plans_to_check():
+    for name in EXPECTED_INDEXES:
+        yield name, QUERIES[name], ()
+        if name in LISTINGS:
+            params = (None,) * (len(LISTINGS[name]["keys"]) + 1)
+            yield name + " (next page)", listing_sql(name, after=True, limit=True), params
+
+
+def check_query_plans(conn):
+    """Return a list of problems; empty when every query uses its indexes."""
+    problems = []
+    for label, sql, params in _plans_to_check():
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        text = "\n".join(plan)
+        for index in EXPECTED_INDEXES[label.split()[0]]:
+            if index not in text:
+                problems.append(f"{label}: does not use {index}")
+        # doctor_load sorts by a counter, which is O(doctors log doctors) and fine.
+        if "TEMP B-TREE" in text and label != "doctor_load":
+            problems.append(f"{label}: sorts in a temp b-tree instead of walking an index")
+    return problems
+
+
+def explain_queries():
+    with connect() as conn:
+        for label, sql, params in _plans_to_check():
+            print(f"\n-- {label}")
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+                print("   " + row[3])
+        problems = check_query_plans(conn)
+    print()
+    for problem in problems:
+        print("FAIL " + problem)
+    print("All query plans use their indexes." if not problems else f"{len(problems)} problem(s).")
+    return 1 if problems else 0
 
 
 # ---------------------------
@@ -115,84 +1745,382 @@ def input_nonempty(prompt):
         print("Value cannot be empty. Try again.")
 
 
-def input_int(prompt, allow_blank=False, min_value=None, max_value=None):
+# Pure validators: return the parsed value or raise ValueError with the
+# message shown to the user. Shared by the prompts and the bulk importer.
+def _check_range(val, min_value, max_value):
+    if min_value is not None and val < min_value:
+        raise ValueError(f"Enter >= {min_value}")
+    if max_value is not None and val > max_value:
+        raise ValueError(f"Enter <= {max_value}")
+    return val
+
+
+def parse_int(s, min_value=None, max_value=None):
+    try:
+        val = int(s)
+    except ValueError:
+        raise ValueError("Please enter a valid integer.") from None
+    return _check_range(val, min_value, max_value)
+
+
+def parse_float(s, min_value=None, max_value=None):
+    try:
+        val = float(s)
+    except ValueError:
+        raise ValueError("Please enter a valid number.") from None
+    return _check_range(val, min_value, max_value)
+
+
+def parse_date(s):
+    """s as a zero-padded YYYY-MM-DD; strptime also takes 2024-1-5."""
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.") from None
+
+
+def parse_time(s):
+    """s as a zero-padded HH:MM."""
+    try:
+        return datetime.strptime(s, "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ValueError("Invalid time format. Use HH:MM (24h).") from None
+
+
+def parse_timestamp(s):
+    try:
+        datetime.fromisoformat(s)
+    except ValueError:
+        raise ValueError("Invalid timestamp. Use YYYY-MM-DDTHH:MM:SS.") from None
+    return s
+
+
+def _input_parsed(prompt, parse, allow_blank):
     while True:
         s = input(prompt).strip()
         if allow_blank and s == "":
             return None
         try:
-            val = int(s)
-            if min_value is not None and val < min_value:
-                print(f"Enter >= {min_value}")
-                continue
-            if max_value is not None and val > max_value:
-                print(f"Enter <= {max_value}")
-                continue
-            return val
-        except ValueError:
-            print("Please enter a valid integer.")
+            return parse(s)
+        except ValueError as e:
+            print(e)
+
+
+def input_int(prompt, allow_blank=False, min_value=None, max_value=None):
+    return _input_parsed(prompt, lambda s: parse_int(s, min_value, max_value), allow_blank)
 
 
 def input_float(prompt, allow_blank=False, min_value=None, max_value=None):
-    while True:
-        s = input(prompt).strip()
-        if allow_blank and s == "":
-            return None
-        try:
-            val = float(s)
-            if min_value is not None and val < min_value:
-                print(f"Enter >= {min_value}")
-                continue
-            if max_value is not None and val > max_value:
-                print(f"Enter <= {max_value}")
-                continue
-            return val
-        except ValueError:
-            print("Please enter a valid number.")
+    return _input_parsed(prompt, lambda s: parse_float(s, min_value, max_value), allow_blank)
 
 
 def input_date(prompt="Date (YYYY-MM-DD): ", allow_blank=False):
-    while True:
-        s = input(prompt).strip()
-        if allow_blank and s == "":
-            return None
-        try:
-            datetime.strptime(s, "%Y-%m-%d")
-            return s
-        except ValueError:
-            print("Invalid date format. Use YYYY-MM-DD.")
+    return _input_parsed(prompt, parse_date, allow_blank)
 
 
 def input_time(prompt="Time (HH:MM, 24h): ", allow_blank=False):
-    while True:
-        s = input(prompt).strip()
-        if allow_blank and s == "":
-            return None
-        try:
-            datetime.strptime(s, "%H:%M")
-            return s
-        except ValueError:
-            print("Invalid time format. Use HH:MM (24h).")
+    return _input_parsed(prompt, parse_time, allow_blank)
 
 
 def press_enter():
     input("\nPress Enter to continue...")
 
 
-def print_table(rows, headers=None):
-    if not rows:
-        print("No records found.")
-        return
-    if headers is None:
-        headers = rows[0].keys()
-    widths = [max(len(str(h)), max(len(str(r[h])) for r in rows)) for h in headers]
-    sep = "+".join("-" * (w + 2) for w in widths)
-    print("+" + sep + "+")
-    print("| " + " | ".join(str(h).ljust(w) for h, w in zip(headers, widths)) + " |")
-    print("+" + sep + "+")
-    for r in rows:
-        print("| " + " | ".join(str(r[h]).ljust(w) for h, w in zip(headers, widths)) + " |")
-    print("+" + sep + "+")
+# ---------------------------
+# Paged Output
+# ---------------------------
+PAGE_SIZE = 25
+MAX_CELL_WIDTH = 32
+
+
+class TablePager:
+    """Prints rows a page at a time with column widths fixed by the first page.
+
+    Cells wider than the fixed width are cut and end in "...", so nothing
+    after the first page needs to be measured in advance.
+    """
+
+    def __init__(self, headers, page_size=PAGE_SIZE, interactive=None):
+        self.headers = list(headers)
+        self.page_size = page_size
+        if interactive is None:
+            interactive = sys.stdin.isatty() and sys.stdout.isatty()
+        self.interactive = interactive
+        self.widths = None
+        self.shown = 0
+
+    def _line(self, values):
+        cells = []
+        for value, width in zip(values, self.widths):
+            s = str(value)
+            if len(s) > width:
+                s = s[:width - 3] + "..."
+            cells.append(s.ljust(width))
+        return "| " + " | ".join(cells) + " |"
+
+    def _border(self):
+        return "+" + "+".join("-" * (w + 2) for w in self.widths) + "+"
+
+    def show(self, rows):
+        if self.widths is None:
+            self.widths = [
+                min(MAX_CELL_WIDTH, max([len(h)] + [len(str(r[h])) for r in rows]))
+                for h in self.headers
+            ]
+            print(self._border())
+            print(self._line(self.headers))
+            print(self._border())
+        for r in rows:
+            print(self._line([r[h] for h in self.headers]))
+        self.shown += len(rows)
+
+    def more(self):
+        if not self.interactive:
+            return True
+        answer = input(f"-- {self.shown} shown; Enter for more, q to stop -- ").strip().lower()
+        return answer != "q"
+
+    def close(self):
+        if self.widths is None:
+            print("No records found.")
+        else:
+            print(self._border())
+
+
+def page_listing(name, page_size=PAGE_SIZE, history=False):
+    spec = LISTINGS[name]
+    keys = [column for _, column in spec["keys"]]
+    pager = TablePager(spec["headers"], page_size)
+    with connect_reports() as conn:
+        history = history and attach_archive(conn, archive_path(), create=False)
+        rows = conn.execute(listing_sql(name, limit=True, history=history), (page_size,)).fetchall()
+        while rows:
+            pager.show(rows)
+            if len(rows) < page_size or not pager.more():
+                break
+            last = [rows[-1][k] for k in keys]
+            rows = conn.execute(listing_sql(name, after=True, limit=True, history=history),
+                                (*last, page_size)).fetchall()
+    pager.close()
+
+
+def ask_history():
+    """Whether a listing should include archived rows (asked once an archive exists)."""
+    if not os.path.exists(archive_path()):
+        return False
+    return input("Include archived history? [y/N]: ").strip().lower().startswith("y")
+
+
+def page_cursor(cur, headers, page_size=PAGE_SIZE):
+    pager = TablePager(headers, page_size)
+    rows = cur.fetchmany(page_size)
+    while rows:
+        pager.show(rows)
+        if len(rows) < page_size or not pager.more():
+            break
+        rows = cur.fetchmany(page_size)
+    cur.close()
+    pager.close()
+
+
+# ---------------------------
+# Lookups
+# ---------------------------
+# Interactive flows ask for one record without printing whole tables: a
+# number is taken as the ID, words are searched (showing at most a page of
+# candidates) and "*" opts in to the full paged listing.
+def _row_exists(table):
+    def exists(row_id):
+        with connect() as conn:
+            return conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (row_id,)).fetchone() is not None
+    return exists
+
+
+def _pick(label, find, headers, show_all, exists, allow_blank=False):
+    """An id typed in, or picked from the rows find(conn, words) returns.
+
+    A number is the ID when exists(id) says there is such a row, and is
+    searched for otherwise (a contact number, say); #123 is always an ID.
+    """
+    default = None
+    while True:
+        hint = f" [{default}]" if default is not None else (" (blank to skip)" if allow_blank else "")
+        s = input(f"{label} - ID or #ID{hint}, name or number to search, or * to list all: ").strip()
+        if not s:
+            if default is not None:
+                return default
+            if allow_blank:
+                return None
+            continue
+        if s == "*":
+            show_all()
+            continue
+        forced = s.startswith("#")
+        row_id = s[1:].strip() if forced else s
+        if row_id.isdigit():
+            if exists(int(row_id)):
+                return int(row_id)
+            if forced:
+                print(f"No record with ID {row_id}.")
+                continue
+        with connect() as conn:
+            rows = find(conn, s)
+        if not rows:
+            print(f"No record with ID {s}, and no matches." if s.isdigit() else "No matches.")
+            continue
+        pager = TablePager(headers, PAGE_SIZE, interactive=False)
+        pager.show(rows)
+        pager.close()
+        if len(rows) == PAGE_SIZE:
+            print(f"Showing the first {PAGE_SIZE} matches; refine the search to narrow them down.")
+        default = rows[0]["id"] if len(rows) == 1 else None
+
+
+def _patient_ids(conn, words):
+    return [row["id"] for row in search(conn, "patients", words, PAGE_SIZE)]
+
+
+def _for_patients(listing, patient_column, conn, words):
+    ids = _patient_ids(conn, words)
+    if not ids:
+        return []
+    spec = LISTINGS[listing]
+    where = [spec["where"]] if spec.get("where") else []
+    where.append(f"{patient_column} IN ({', '.join('?' * len(ids))})")
+    order = ", ".join(f"{expr} DESC" for expr, _ in spec["keys"])
+    sql = f"{spec['select']} WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+    return conn.execute(sql, ids + [PAGE_SIZE]).fetchall()
+
+
+def pick_patient(label="Patient", allow_blank=False):
+    return _pick(label, lambda conn, s: search(conn, "patients", s, PAGE_SIZE),
+                 SEARCH_HEADERS["patients"], view_patients, _row_exists("patients"), allow_blank)
+
+
+def pick_doctor(label="Doctor", allow_blank=False):
+    return _pick(label, lambda conn, s: search(conn, "doctors", s, PAGE_SIZE),
+                 SEARCH_HEADERS["doctors"], view_doctors, DOCTORS.exists, allow_blank)
+
+
+def pick_pending_lab_test(label="Lab Test"):
+    """A lab test found by ID or by patient (their pending tests)."""
+    return _pick(label, lambda conn, s: _for_patients("pending_lab_tests", "lt.patient_id", conn, s),
+                 LISTINGS["pending_lab_tests"]["headers"], lambda: view_lab_tests(show_results=False),
+                 _row_exists("lab_tests"))
+
+
+def pick_unpaid_bill(label="Bill"):
+    """A bill found by ID or by patient (their unpaid bills)."""
+    return _pick(label, lambda conn, s: _for_patients("unpaid_bills", "b.patient_id", conn, s),
+                 LISTINGS["unpaid_bills"]["headers"], lambda: view_bills(include_paid=False),
+                 _row_exists("billing"))
+
+
+# ---------------------------
+# Doctor Directory
+# ---------------------------
+# doctors is small and read on every doctor pick, appointment and API
+# listing, so each process keeps all of it in memory: compact records by
+# id, and ids by specialization. It is loaded on first use and dropped when
+# this process writes doctors. Other processes' writes show within
+# DOCTOR_CACHE_TTL seconds, and an id missing from the directory is looked
+# up in the table before it is rejected.
+DOCTOR_CACHE_TTL = float(os.environ.get("HOSPITAL_DOCTOR_CACHE_TTL", "60"))
+DOCTOR_COLUMNS = "id, name, specialization, contact"
+
+
+class Doctor:
+    """One doctors row."""
+    __slots__ = ("id", "name", "specialization", "contact")
+
+    def __init__(self, id, name, specialization, contact):
+        self.id = id
+        self.name = name
+        self.specialization = specialization
+        self.contact = contact
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class DoctorDirectory:
+    """Every doctor by id, and doctor ids by specialization, for this process.
+
+    Methods take the connection to load with; without one they open and
+    close their own (console use).
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = DOCTOR_CACHE_TTL if ttl is None else ttl
+        self._index = None    # (loaded at, {id: Doctor} in id order, {specialization: [id]}, [id])
+        self._generation = 0  # bumped by invalidate(), so a load that raced it is not kept
+        self._lock = threading.Lock()
+
+    def _load(self, conn):
+        generation, loaded = self._generation, time.monotonic()
+        by_id, by_specialization = {}, {}
+        for row in conn.execute(f"SELECT {DOCTOR_COLUMNS} FROM doctors ORDER BY id"):
+            doctor = Doctor(*row)
+            by_id[doctor.id] = doctor
+            by_specialization.setdefault(doctor.specialization, []).append(doctor.id)
+        index = (loaded, by_id, by_specialization, list(by_id))
+        with self._lock:
+            if generation == self._generation:
+                self._index = index
+        return index
+
+    def _current(self, conn=None):
+        index = self._index
+        if index is not None and time.monotonic() - index[0] <= self.ttl:
+            return index
+        if conn is not None:
+            return self._load(conn)
+        own = connect()
+        try:
+            return self._load(own)
+        finally:
+            own.close()
+
+    def get(self, doctor_id, conn=None):
+        """The Doctor with doctor_id, or None if there is none."""
+        doctor = self._current(conn)[1].get(doctor_id)
+        if doctor is None:
+            own = conn or connect()
+            try:
+                row = own.execute(f"SELECT {DOCTOR_COLUMNS} FROM doctors WHERE id = ?",
+                                  (doctor_id,)).fetchone()
+            finally:
+                if conn is None:
+                    own.close()
+            if row is not None:  # added by another process since the load
+                self.invalidate()
+                doctor = Doctor(*row)
+        return doctor
+
+    def exists(self, doctor_id, conn=None):
+        return self.get(doctor_id, conn) is not None
+
+    def all(self, conn=None):
+        """Every Doctor, in id order."""
+        return list(self._current(conn)[1].values())
+
+    def page(self, after_id=0, limit=None, conn=None):
+        """Doctors with id > after_id, in id order, at most limit of them."""
+        _, by_id, _, ids = self._current(conn)
+        start = bisect_right(ids, after_id)
+        return [by_id[i] for i in ids[start:start + limit if limit else None]]
+
+    def with_specialization(self, specialization, conn=None):
+        _, by_id, by_specialization, _ = self._current(conn)
+        return [by_id[i] for i in by_specialization.get(specialization, ())]
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+
+DOCTORS = DoctorDirectory()
 
 
 # ---------------------------
@@ -207,21 +2135,24 @@ def add_doctor():
         conn.execute("INSERT INTO doctors(name, specialization, contact) VALUES(?,?,?)",
                      (name, specialization, contact))
         conn.commit()
+    DOCTORS.invalidate()
     print("Doctor added successfully!")
 
 
 def view_doctors():
     print("\n== Doctors ==")
-    with connect() as conn:
-        cur = conn.execute("SELECT * FROM doctors ORDER BY id;")
-        rows = cur.fetchall()
-        print_table(rows)
+    doctors = DOCTORS.all()
+    pager = TablePager(LISTINGS["doctors"]["headers"])
+    for start in range(0, len(doctors), PAGE_SIZE):
+        pager.show([d.as_dict() for d in doctors[start:start + PAGE_SIZE]])
+        if start + PAGE_SIZE >= len(doctors) or not pager.more():
+            break
+    pager.close()
 
 
 def update_doctor():
     print("\n== Update Doctor ==")
-    view_doctors()
-    doc_id = input_int("Enter Doctor ID to update: ")
+    doc_id = pick_doctor("Doctor to update")
     with connect() as conn:
         cur = conn.execute("SELECT * FROM doctors WHERE id = ?", (doc_id,))
         row = cur.fetchone()
@@ -234,16 +2165,19 @@ def update_doctor():
         conn.execute("UPDATE doctors SET name=?, specialization=?, contact=? WHERE id=?",
                      (name, spec, contact, doc_id))
         conn.commit()
+    DOCTORS.invalidate()
     print("Doctor updated successfully!")
 
 
 def delete_doctor():
     print("\n== Delete Doctor ==")
-    view_doctors()
-    doc_id = input_int("Enter Doctor ID to delete: ")
+    doc_id = pick_doctor("Doctor to delete")
     with connect() as conn:
+        delete_archived(conn, "doctors", doc_id)
         conn.execute("DELETE FROM doctors WHERE id=?", (doc_id,))
         conn.commit()
+    DOCTORS.invalidate()
+    SLOTS.invalidate(doc_id)
     print("Doctor deleted (if existed).")
 
 
@@ -257,35 +2191,28 @@ def add_patient():
     gender = input("Gender (M/F/Other): ").strip()
     contact = input("Contact: ").strip()
     disease = input("Disease/Complaint: ").strip()
-    view_doctors()
-    doctor_id = input_int("Assign Doctor ID (or blank to skip): ", allow_blank=True)
+    doctor_id = pick_doctor("Assign Doctor", allow_blank=True)
     with connect() as conn:
-        conn.execute("""
-            INSERT INTO patients(name, age, gender, contact, disease, doctor_id)
-            VALUES(?,?,?,?,?,?)
-        """, (name, age, gender, contact, disease, doctor_id))
+        try:
+            conn.execute("""
+                INSERT INTO patients(name, age, gender, contact, disease, doctor_id)
+                VALUES(?,?,?,?,?,?)
+            """, (name, age, gender, contact, disease, doctor_id))
+        except sqlite3.IntegrityError:
+            print("Doctor not found.")
+            return
         conn.commit()
     print("Patient added successfully!")
 
 
 def view_patients():
     print("\n== Patients ==")
-    with connect() as conn:
-        cur = conn.execute("""
-            SELECT p.id, p.name, p.age, p.gender, p.contact, p.disease,
-                   d.name AS doctor
-            FROM patients p
-            LEFT JOIN doctors d ON d.id = p.doctor_id
-            ORDER BY p.id;
-        """)
-        rows = cur.fetchall()
-        print_table(rows, headers=["id", "name", "age", "gender", "contact", "disease", "doctor"])
+    page_listing("patients")
 
 
 def update_patient():
     print("\n== Update Patient ==")
-    view_patients()
-    pid = input_int("Enter Patient ID to update: ")
+    pid = pick_patient("Patient to update")
     with connect() as conn:
         cur = conn.execute("SELECT * FROM patients WHERE id = ?", (pid,))
         row = cur.fetchone()
@@ -300,71 +2227,249 @@ def update_patient():
         disease = input(f"Disease [{row['disease'] or ''}]: ").strip() or row['disease']
 
         print("\nAssign/Change Doctor:")
-        view_doctors()
-        doctor_id = input_int(f"Doctor ID [{row['doctor_id'] or ''}] (blank to keep): ", allow_blank=True)
+        doctor_id = pick_doctor(f"Doctor (currently {row['doctor_id'] or 'none'})", allow_blank=True)
         doctor_id = row['doctor_id'] if doctor_id is None else doctor_id
 
-        conn.execute("""
-            UPDATE patients
-               SET name=?, age=?, gender=?, contact=?, disease=?, doctor_id=?
-             WHERE id=?
-        """, (name, age, gender, contact, disease, doctor_id, pid))
+        try:
+            conn.execute("""
+                UPDATE patients
+                   SET name=?, age=?, gender=?, contact=?, disease=?, doctor_id=?
+                 WHERE id=?
+            """, (name, age, gender, contact, disease, doctor_id, pid))
+        except sqlite3.IntegrityError:
+            print("Doctor not found.")
+            return
         conn.commit()
     print("Patient updated successfully!")
 
 
 def delete_patient():
     print("\n== Delete Patient ==")
-    view_patients()
-    pid = input_int("Enter Patient ID to delete: ")
+    pid = pick_patient("Patient to delete")
     with connect() as conn:
+        delete_archived(conn, "patients", pid)
         conn.execute("DELETE FROM patients WHERE id=?", (pid,))
         conn.commit()
+    SLOTS.invalidate()  # their appointments, with any doctor, are gone
     print("Patient deleted (if existed).")
 
 
+# ---------------------------
+# Slot Finder
+# ---------------------------
+# Each appointment books SLOT_MINUTES from its start time. Per doctor, the
+# bookings are kept as merged busy intervals in two sorted lists of minutes
+# since day 0 (starts / ends), so conflict checks and next-free-slot
+# lookups are a bisect plus at most one jump per busy run or closed night.
+# The schedules only see this process's writes, so a booking is decided by
+# an indexed probe of appointments inside the inserting transaction, and a
+# suggested slot is probed before it is offered; a probe that disagrees
+# with a schedule reloads it.
+SLOT_MINUTES = 15
+WORK_START = "09:00"
+WORK_END = "17:00"
+
+
+_DAY_MINUTES = {}  # "YYYY-MM-DD" -> minutes; strptime dominates schedule builds otherwise
+
+
+def to_minutes(date, hhmm):
+    day = _DAY_MINUTES.get(date)
+    if day is None:
+        if len(_DAY_MINUTES) > 100000:
+            _DAY_MINUTES.clear()
+        day = _DAY_MINUTES[date] = datetime.strptime(date, "%Y-%m-%d").toordinal() * 1440
+    h, _, m = hhmm.partition(":")
+    return day + int(h) * 60 + int(m)
+
+
+def from_minutes(t):
+    day, minute = divmod(t, 1440)
+    return datetime.fromordinal(day).strftime("%Y-%m-%d"), f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class DoctorSchedule:
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, times=()):
+        # times must be sorted (they come from the index range scan)
+        self.starts, self.ends = [], []
+        for t in times:
+            if self.ends and t <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], t + SLOT_MINUTES)
+            else:
+                self.starts.append(t)
+                self.ends.append(t + SLOT_MINUTES)
+
+    def is_free(self, t, length=SLOT_MINUTES):
+        i = bisect_right(self.starts, t)
+        if i and self.ends[i - 1] > t:
+            return False
+        return i == len(self.starts) or self.starts[i] >= t + length
+
+    def add(self, t):
+        i = bisect_right(self.starts, t)
+        start, end = t, t + SLOT_MINUTES
+        lo = i - 1 if i and self.ends[i - 1] >= start else i
+        hi = i
+        while hi < len(self.starts) and self.starts[hi] <= end:
+            hi += 1
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def next_free(self, t, day_start, day_end, length=SLOT_MINUTES):
+        """Earliest free slot at or after t on the SLOT_MINUTES grid within work hours."""
+        t = -(-t // SLOT_MINUTES) * SLOT_MINUTES
+        while True:
+            day, minute = divmod(t, 1440)
+            if minute < day_start:
+                t = day * 1440 + day_start
+            elif minute + length > day_end:
+                t = (day + 1) * 1440 + day_start
+                continue
+            i = bisect_right(self.starts, t)
+            if i and self.ends[i - 1] > t:
+                t = -(-self.ends[i - 1] // SLOT_MINUTES) * SLOT_MINUTES  # jump past the run
+            elif i < len(self.starts) and self.starts[i] < t + length:
+                t = -(-self.ends[i] // SLOT_MINUTES) * SLOT_MINUTES
+            else:
+                return t
+
+
+class SlotIndex:
+    """Per-doctor schedules, loaded on first use and dropped on writes."""
+
+    def __init__(self, work_start=WORK_START, work_end=WORK_END):
+        self.day_start = to_minutes("0001-01-01", work_start) - 1440
+        self.day_end = to_minutes("0001-01-01", work_end) - 1440
+        self._schedules = {}
+
+    def schedule(self, conn, doctor_id):
+        sched = self._schedules.get(doctor_id)
+        if sched is None:
+            # Range scan of idx_appointments_doctor(doctor_id, date, time), already in order.
+            rows = conn.execute("SELECT date, time FROM appointments WHERE doctor_id = ? "
+                                "ORDER BY date, time", (doctor_id,))
+            times, skipped = [], 0
+            for d, t in rows:
+                try:
+                    times.append(to_minutes(d, t))
+                except (ValueError, TypeError, AttributeError):
+                    skipped += 1
+            if skipped:
+                print(f"Slot finder: skipped {skipped} appointment(s) of doctor {doctor_id} "
+                      f"with an unreadable date or time.", file=sys.stderr)
+            sched = DoctorSchedule(times)
+            self._schedules[doctor_id] = sched
+        return sched
+
+    def is_free(self, conn, doctor_id, date, hhmm):
+        return self.schedule(conn, doctor_id).is_free(to_minutes(date, hhmm))
+
+    def taken(self, conn, doctor_id, date, hhmm):
+        """Whether a stored appointment overlaps the slot, asked of the database itself.
+
+        One seek of idx_appointments_doctor over the day or two the window spans.
+        """
+        t = to_minutes(date, hhmm)
+        lo = from_minutes(t - SLOT_MINUTES)
+        hi = from_minutes(t + SLOT_MINUTES)
+        return conn.execute("""
+            SELECT 1 FROM appointments
+             WHERE doctor_id = ? AND date BETWEEN ? AND ?
+               AND date || ' ' || time > ? AND date || ' ' || time < ?
+             LIMIT 1""", (doctor_id, lo[0], hi[0], " ".join(lo), " ".join(hi))).fetchone() is not None
+
+    def next_free(self, conn, doctor_id, date, hhmm="00:00"):
+        for _ in range(2):
+            t = self.schedule(conn, doctor_id).next_free(
+                to_minutes(date, hhmm), self.day_start, self.day_end)
+            slot = from_minutes(t)
+            if not self.taken(conn, doctor_id, *slot):
+                break
+            self.invalidate(doctor_id)  # booked by another process since the load
+        return slot
+
+    def booked(self, doctor_id, date, hhmm):
+        sched = self._schedules.get(doctor_id)
+        if sched is not None:
+            sched.add(to_minutes(date, hhmm))
+
+    def invalidate(self, doctor_id=None):
+        if doctor_id is None:
+            self._schedules.clear()
+        else:
+            self._schedules.pop(doctor_id, None)
+
+
+SLOTS = SlotIndex()
+
+
+def find_next_slot():
+    print("\n== Next Free Slot ==")
+    did = pick_doctor()
+    date = input_date("From date (YYYY-MM-DD, blank = now): ", allow_blank=True)
+    hhmm = "00:00"
+    if date is None:
+        date, hhmm = datetime.now().strftime("%Y-%m-%d %H:%M").split()
+    with connect() as conn:
+        if not DOCTORS.exists(did, conn):
+            print("Doctor not found.")
+            return
+        print("Next free slot: {} {}".format(*SLOTS.next_free(conn, did, date, hhmm)))
+
+
 # ---------------------------
 # Appointments
 # ---------------------------
 def schedule_appointment():
     print("\n== Schedule Appointment ==")
-    view_patients()
-    pid = input_int("Patient ID: ")
-    view_doctors()
-    did = input_int("Doctor ID: ")
+    pid = pick_patient()
+    did = pick_doctor()
     date = input_date("Date (YYYY-MM-DD): ")
     time = input_time("Time (HH:MM, 24h): ")
     notes = input("Notes (optional): ").strip()
     with connect() as conn:
-        conn.execute("""
-            INSERT INTO appointments(patient_id, doctor_id, date, time, notes)
-            VALUES(?,?,?,?,?)
-        """, (pid, did, date, time, notes))
+        conn.execute("BEGIN IMMEDIATE")  # no other booking between the probe and the insert
+        taken = SLOTS.taken(conn, did, date, time)
+        if taken == SLOTS.is_free(conn, did, date, time):
+            SLOTS.invalidate(did)  # it missed another process's booking or deletion
+        if taken:
+            print("Doctor is already booked at that time. Next free slot: {} {}".format(
+                *SLOTS.next_free(conn, did, date, time)))
+            conn.rollback()
+            return
+        try:
+            conn.execute("""
+                INSERT INTO appointments(patient_id, doctor_id, date, time, notes)
+                VALUES(?,?,?,?,?)
+            """, (pid, did, date, time, notes))
+        except sqlite3.IntegrityError:
+            print("Patient or doctor not found.")
+            return
         conn.commit()
+    SLOTS.booked(did, date, time)
     print("Appointment scheduled!")
 
 
 def view_appointments():
     print("\n== Appointments ==")
-    with connect() as conn:
-        cur = conn.execute("""
-            SELECT a.id, a.date, a.time, p.name AS patient, d.name AS doctor, a.notes
-              FROM appointments a
-              JOIN patients p ON p.id = a.patient_id
-              JOIN doctors d ON d.id = a.doctor_id
-             ORDER BY a.date, a.time;
-        """)
-        rows = cur.fetchall()
-        print_table(rows, headers=["id", "date", "time", "patient", "doctor", "notes"])
+    page_listing("appointments", history=ask_history())
 
 
 def delete_appointment():
     print("\n== Delete Appointment ==")
-    view_appointments()
+    page_listing("appointments")
     aid = input_int("Appointment ID to delete: ")
     with connect() as conn:
+        row = conn.execute("SELECT doctor_id FROM appointments WHERE id=?", (aid,)).fetchone()
         conn.execute("DELETE FROM appointments WHERE id=?", (aid,))
         conn.commit()
+    if row:
+        SLOTS.invalidate(row["doctor_id"])
     print("Appointment deleted (if existed).")
 
 
@@ -373,24 +2478,26 @@ def delete_appointment():
 # ---------------------------
 def order_lab_test():
     print("\n== Order Lab Test ==")
-    view_patients()
-    pid = input_int("Patient ID: ")
+    pid = pick_patient()
     test_name = input_nonempty("Test Name: ")
     cost = input_float("Cost: ", min_value=0)
     ordered_on = datetime.now().isoformat(timespec="seconds")
     with connect() as conn:
-        conn.execute("""
-            INSERT INTO lab_tests(patient_id, test_name, cost, ordered_on)
-            VALUES(?,?,?,?)
-        """, (pid, test_name, cost, ordered_on))
+        try:
+            conn.execute("""
+                INSERT INTO lab_tests(patient_id, test_name, cost, ordered_on)
+                VALUES(?,?,?,?)
+            """, (pid, test_name, cost, ordered_on))
+        except sqlite3.IntegrityError:
+            print("Patient not found.")
+            return
         conn.commit()
     print("Lab test ordered!")
 
 
 def enter_lab_result():
     print("\n== Enter/Update Lab Result ==")
-    view_lab_tests(show_results=False)
-    tid = input_int("Lab Test ID to update: ")
+    tid = pick_pending_lab_test("Lab Test to update")
     result = input_nonempty("Result (text): ")
     reported_on = datetime.now().isoformat(timespec="seconds")
     with connect() as conn:
@@ -403,27 +2510,10 @@ def enter_lab_result():
 
 def view_lab_tests(show_results=True):
     print("\n== Lab Tests ==")
-    with connect() as conn:
-        if show_results:
-            cur = conn.execute("""
-                SELECT lt.id, p.name AS patient, lt.test_name, lt.cost,
-                       lt.ordered_on, lt.reported_on, COALESCE(lt.result, '') AS result
-                  FROM lab_tests lt
-                  JOIN patients p ON p.id = lt.patient_id
-                 ORDER BY lt.ordered_on DESC;
-            """)
-            rows = cur.fetchall()
-            print_table(rows, headers=["id", "patient", "test_name", "cost", "ordered_on", "reported_on", "result"])
-        else:
-            cur = conn.execute("""
-                SELECT lt.id, p.name AS patient, lt.test_name, lt.cost, lt.ordered_on
-                  FROM lab_tests lt
-                  JOIN patients p ON p.id = lt.patient_id
-                 WHERE lt.result IS NULL
-                 ORDER BY lt.ordered_on DESC;
-            """)
-            rows = cur.fetchall()
-            print_table(rows, headers=["id", "patient", "test_name", "cost", "ordered_on"])
+    if show_results:
+        page_listing("lab_tests", history=ask_history())
+    else:
+        page_listing("pending_lab_tests")
 
 
 # ---------------------------
@@ -431,50 +2521,34 @@ def view_lab_tests(show_results=True):
 # ---------------------------
 def create_bill():
     print("\n== Create Bill ==")
-    view_patients()
-    pid = input_int("Patient ID: ")
+    pid = pick_patient()
     description = input("Description (e.g., Consultation/Lab Test): ").strip()
     amount = input_float("Amount: ", min_value=0)
     billed_on = datetime.now().date().isoformat()
     with connect() as conn:
-        conn.execute("""
-            INSERT INTO billing(patient_id, amount, description, billed_on, paid)
-            VALUES(?,?,?,?,0)
-        """, (pid, amount, description, billed_on))
+        try:
+            conn.execute("""
+                INSERT INTO billing(patient_id, amount, description, billed_on, paid)
+                VALUES(?,?,?,?,0)
+            """, (pid, amount, description, billed_on))
+        except sqlite3.IntegrityError:
+            print("Patient not found.")
+            return
         conn.commit()
     print("Bill created!")
 
 
 def view_bills(include_paid=True):
     print("\n== Bills ==")
-    with connect() as conn:
-        if include_paid:
-            cur = conn.execute("""
-                SELECT b.id, p.name AS patient, b.amount, b.description, b.billed_on,
-                       CASE b.paid WHEN 1 THEN 'YES' ELSE 'NO' END AS paid
-                  FROM billing b
-                  JOIN patients p ON p.id = b.patient_id
-                 ORDER BY b.billed_on DESC, b.id DESC;
-            """)
-        else:
-            cur = conn.execute("""
-                SELECT b.id, p.name AS patient, b.amount, b.description, b.billed_on
-                  FROM billing b
-                  JOIN patients p ON p.id = b.patient_id
-                 WHERE b.paid = 0
-                 ORDER BY b.billed_on DESC, b.id DESC;
-            """)
-        rows = cur.fetchall()
-        if include_paid:
-            print_table(rows, headers=["id", "patient", "amount", "description", "billed_on", "paid"])
-        else:
-            print_table(rows, headers=["id", "patient", "amount", "description", "billed_on"])
+    if include_paid:
+        page_listing("bills", history=ask_history())
+    else:
+        page_listing("unpaid_bills")
 
 
 def mark_bill_paid():
     print("\n== Mark Bill as Paid ==")
-    view_bills(include_paid=False)
-    bid = input_int("Bill ID to mark as paid: ")
+    bid = pick_unpaid_bill("Bill to mark as paid")
     with connect() as conn:
         conn.execute("UPDATE billing SET paid=1 WHERE id=?", (bid,))
         conn.commit()
@@ -486,38 +2560,252 @@ def mark_bill_paid():
 # ---------------------------
 def report_patient_summary():
     print("\n== Report: Patient Summary ==")
-    with connect() as conn:
-        cur = conn.execute("""
-            SELECT p.id, p.name,
-                   COUNT(DISTINCT a.id) AS appointments,
-                   COUNT(DISTINCT lt.id) AS lab_tests,
-                   COALESCE(SUM(CASE WHEN b.paid=0 THEN b.amount ELSE 0 END), 0) AS unpaid_amount
-              FROM patients p
-         LEFT JOIN appointments a ON a.patient_id = p.id
-         LEFT JOIN lab_tests lt ON lt.patient_id = p.id
-         LEFT JOIN billing b ON b.patient_id = p.id
-          GROUP BY p.id, p.name
-          ORDER BY p.id;
-        """)
-        rows = cur.fetchall()
-        print_table(rows, headers=["id", "name", "appointments", "lab_tests", "unpaid_amount"])
+    page_listing("patient_summary")
 
 
 def report_doctor_load():
     print("\n== Report: Doctor Workload ==")
-    with connect() as conn:
-        cur = conn.execute("""
-            SELECT d.id, d.name, d.specialization,
-                   COUNT(DISTINCT a.id) AS appointments_count,
-                   COUNT(DISTINCT p.id) AS patients_assigned
-              FROM doctors d
-         LEFT JOIN appointments a ON a.doctor_id = d.id
-         LEFT JOIN patients p ON p.doctor_id = d.id
-          GROUP BY d.id, d.name, d.specialization
-          ORDER BY appointments_count DESC, d.name;
-        """)
-        rows = cur.fetchall()
-        print_table(rows, headers=["id", "name", "specialization", "appointments_count", "patients_assigned"])
+    with connect_reports() as conn:
+        page_cursor(conn.execute(QUERIES["doctor_load"]), DOCTOR_LOAD_HEADERS)
+
+
+def print_revenue(start, end, by="day", interactive=True):
+    with connect_reports() as conn:
+        rows = revenue(conn, start, end, by)
+    pager = TablePager(REVENUE_HEADERS, PAGE_SIZE, interactive=interactive)
+    pager.show([dict(zip(REVENUE_HEADERS, (*r[:2], *(f"{x:.2f}" for x in r[2:]))))
+                for r in rows + [revenue_totals(rows)]])
+    pager.close()
+
+
+def report_revenue():
+    print("\n== Report: Revenue ==")
+    today = date.today()
+    start = input_date(f"From (YYYY-MM-DD, blank = {today.replace(day=1)}): ", allow_blank=True)
+    end = input_date(f"To (YYYY-MM-DD, blank = {today}): ", allow_blank=True)
+    by = "month" if input("Per day or month? [d/m]: ").strip().lower().startswith("m") else "day"
+    print_revenue(start or today.replace(day=1).isoformat(), end or today.isoformat(), by)
+
+
+# ---------------------------
+# Lab Turnaround Analytics
+# ---------------------------
+# Turnaround (reported_on - ordered_on) percentiles per test and per week.
+# SQLite converts the ISO text to epoch seconds and packs each test's name
+# code, week and turnaround into one integer, because handing rows to Python
+# is the slow part and costs per column. Rows are read in chunks of
+# TAT_CHUNK_ROWS and added to log-spaced histograms, so memory grows with
+# the number of tests and weeks, not of rows. Bins are TAT_BIN_GROWTH apart,
+# so a percentile is within 1% of the exact value. With NumPy a chunk is
+# unpacked and binned with array operations; without it, row by row.
+TAT_CHUNK_ROWS = 65536
+TAT_BIN_GROWTH = 1.02
+TAT_LOG_GROWTH = math.log(TAT_BIN_GROWTH)
+TAT_BINS = 2 + int(math.log(400 * 86400) / TAT_LOG_GROWTH)  # bin 0 is < 1 s; the last takes > 400 days
+TAT_PERCENTILES = (50, 90, 99)
+TAT_HISTOGRAM_HOURS = (1, 2, 4, 8, 12, 24, 48, 96)
+TAT_WEEK_EPOCH = date(1969, 12, 29)  # the Monday before the Unix epoch
+TAT_SEP = "\x1f"  # between test names in the lookup string; its offsets are the name codes
+# code << 47 | week << 32 | seconds + 1: 16 + 15 + 32 bits, weeks counted from
+# TAT_WEEK_EPOCH. 0 in the low bits marks a row to skip (reported before ordered,
+# or a date SQLite cannot read). No subquery: SQLite would flatten it and parse
+# the dates once per reference. The unary + keeps the 1970 bound off the
+# ordered_on index, whose lookups cost more than a table scan for a wide range.
+TAT_SQL = """
+    SELECT ifnull((instr(:names, char(31) || test_name || char(31)) << 47)
+                  | ((({ordered} + 259200) / 604800) << 32)
+                  | (min(max({reported} - {ordered}, -1), 4294967294) + 1), 0)
+      FROM {table}
+     WHERE reported_on IS NOT NULL AND +ordered_on >= '1970'{range}
+"""
+# unixepoch() is SQLite 3.38+; strftime('%s') gives the same, a little slower.
+TAT_EPOCH = ("unixepoch({})" if sqlite3.sqlite_version_info >= (3, 38, 0)
+             else "CAST(strftime('%s', {}) AS INTEGER)")
+
+
+class Turnaround:
+    """Log-binned turnaround times of one test or one week."""
+    __slots__ = ("counts", "reported", "seconds")
+
+    def __init__(self):
+        self.counts = np.zeros(TAT_BINS, dtype=np.int64) if np is not None else [0] * TAT_BINS
+        self.reported = 0
+        self.seconds = 0
+
+    def add(self, other):
+        if np is not None:
+            self.counts += other.counts
+        else:
+            self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.reported += other.reported
+        self.seconds += other.seconds
+
+    def percentile(self, p):
+        rank, seen = p / 100 * self.reported, 0
+        for k, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return tat_bin_seconds(k)
+        return None
+
+    def histogram(self, hours=TAT_HISTOGRAM_HOURS):
+        """Counts below each of hours, and above the last (by bin midpoint)."""
+        edges = [h * 3600 for h in hours]
+        out = [0] * (len(edges) + 1)
+        for k, n in enumerate(self.counts):
+            if n:
+                out[bisect_right(edges, tat_bin_seconds(k))] += int(n)
+        return out
+
+
+def tat_bin(seconds):
+    return 0 if seconds < 1 else min(TAT_BINS - 1, 1 + int(math.log(seconds) / TAT_LOG_GROWTH))
+
+
+def tat_bin_seconds(k):
+    """Midpoint (geometric) of bin k."""
+    return 0.0 if k == 0 else TAT_BIN_GROWTH ** (k - 0.5)
+
+
+def _tat_chunk_numpy(rows, names, by_test, by_week):
+    packed = np.array(rows, dtype=np.int64).ravel()
+    packed = packed[(packed & 0xFFFFFFFF) != 0]
+    codes = names[packed >> 47]
+    weeks = (packed >> 32) & 0x7FFF
+    tat = (packed & 0xFFFFFFFF) - 1
+    bins = np.zeros(len(tat), dtype=np.int64)
+    positive = tat >= 1
+    bins[positive] = np.minimum(
+        1 + (np.log(tat[positive]) / TAT_LOG_GROWTH).astype(np.int64), TAT_BINS - 1)
+    for keys, groups in ((codes, by_test), (weeks, by_week)):
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse * TAT_BINS + bins, minlength=len(unique) * TAT_BINS)
+        counts = counts.reshape(len(unique), TAT_BINS)
+        seconds = np.bincount(inverse, weights=tat, minlength=len(unique))
+        for i, key in enumerate(unique.tolist()):
+            entry = groups.get(key)
+            if entry is None:
+                entry = groups[key] = Turnaround()
+            entry.counts += counts[i]
+            entry.reported += int(counts[i].sum())
+            entry.seconds += int(seconds[i])
+
+
+def _tat_chunk_python(rows, names, by_test, by_week):
+    for (packed,) in rows:
+        tat = (packed & 0xFFFFFFFF) - 1
+        if tat < 0:
+            continue
+        k = tat_bin(tat)
+        for groups, key in ((by_test, names[packed >> 47]), (by_week, (packed >> 32) & 0x7FFF)):
+            entry = groups.get(key)
+            if entry is None:
+                entry = groups[key] = Turnaround()
+            entry.counts[k] += 1
+            entry.reported += 1
+            entry.seconds += tat
+
+
+def lab_turnaround(conn, start=None, end=None, chunk=TAT_CHUNK_ROWS, history=False):
+    """({test_name: Turnaround}, {week's Monday: Turnaround}) for tests ordered in start..end.
+
+    history=True includes archived tests (the archive must be attached).
+    """
+    table = history_sources(history)["lab_tests"]
+    params, where = {}, ""
+    if start:
+        params["start"], where = start, where + " AND ordered_on >= :start"
+    if end:
+        params["end"] = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+        where += " AND ordered_on < :end"
+    test_names = [name for (name,) in conn.execute(
+        f"SELECT DISTINCT test_name FROM {table} WHERE reported_on IS NOT NULL{where}", params)]
+    lookup = TAT_SEP + TAT_SEP.join(test_names) + TAT_SEP
+    # The code of a name is its offset in lookup; index them back to names.
+    offsets, offset = {}, 1
+    for name in test_names:
+        offsets[offset] = name
+        offset += len(name) + 1
+    if offset >= 1 << 16:
+        raise ValueError("Too many distinct test names for lab turnaround analytics.")
+    sql = TAT_SQL.format(ordered=TAT_EPOCH.format("ordered_on"),
+                         reported=TAT_EPOCH.format("reported_on"), table=table, range=where)
+    cur = conn.cursor()
+    cur.row_factory = None  # plain tuples; sqlite3.Row costs more than the rest of the pass
+    cur.execute(sql, dict(params, names=lookup))
+
+    # Offset 0 (not found) is a name added since the first query.
+    test_names.append("(other)")
+    by_test, by_week = {}, {}
+    if np is not None:
+        names = np.full(offset, len(test_names) - 1, dtype=np.int64)  # offset -> test_names index
+        for i, at in enumerate(offsets):
+            names[at] = i
+        add_chunk = _tat_chunk_numpy
+    else:
+        names = [test_names[-1]] * offset
+        for at, name in offsets.items():
+            names[at] = name
+        add_chunk = _tat_chunk_python
+    while True:
+        rows = cur.fetchmany(chunk)
+        if not rows:
+            break
+        add_chunk(rows, names, by_test, by_week)
+    if np is not None:
+        by_test = {test_names[i]: t for i, t in by_test.items()}
+    weeks = {(TAT_WEEK_EPOCH + timedelta(weeks=int(w))).isoformat(): t for w, t in by_week.items()}
+    return by_test, weeks
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes:02d}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours:02d}h"
+
+
+def print_lab_turnaround(by="test", start=None, end=None, histogram=False, interactive=True,
+                         history=False):
+    with connect_reports() as conn:
+        history = history and attach_archive(conn, archive_path(), create=False)
+        by_test, by_week = lab_turnaround(conn, start, end, history=history)
+    groups = by_test if by == "test" else by_week
+    overall = Turnaround()
+    for entry in by_test.values():
+        overall.add(entry)
+    label = "Test" if by == "test" else "Week of"
+    headers = [label, "Reported", "Mean"] + [f"p{p}" for p in TAT_PERCENTILES]
+    rows = []
+    for key, entry in sorted(groups.items()) + [("All", overall)]:
+        row = {label: key, "Reported": entry.reported,
+               "Mean": format_duration(entry.seconds / entry.reported if entry.reported else None)}
+        row.update((f"p{p}", format_duration(entry.percentile(p))) for p in TAT_PERCENTILES)
+        rows.append(row)
+    pager = TablePager(headers, PAGE_SIZE, interactive=interactive)
+    pager.show(rows)
+    pager.close()
+    if histogram and overall.reported:
+        counts = overall.histogram()
+        bounds = (0,) + TAT_HISTOGRAM_HOURS
+        labels = [f"{lo}-{hi}h" for lo, hi in zip(bounds, bounds[1:])] + [f">= {bounds[-1]}h"]
+        print("\nTurnaround, all tests:")
+        for text, n in zip(labels, counts):
+            print(f"  {text:>7} {n:>10}  {'#' * round(50 * n / max(counts))}")
+
+
+def report_lab_turnaround():
+    print("\n== Report: Lab Turnaround ==")
+    start = input_date("Ordered from (YYYY-MM-DD, blank = all): ", allow_blank=True)
+    end = input_date("Ordered to (YYYY-MM-DD, blank = all): ", allow_blank=True)
+    by = "week" if input("Per test or week? [t/w]: ").strip().lower().startswith("w") else "test"
+    print_lab_turnaround(by, start, end, histogram=True, history=ask_history())
 
 
 # ---------------------------
@@ -575,6 +2863,346 @@ def seed_sample_data():
     print("Sample data inserted!")
 
 
+# ---------------------------
+# Bulk Import (CSV / NDJSON)
+# ---------------------------
+IMPORT_CHUNK_SIZE = 5000
+
+
+def _text(s):
+    return s
+
+
+def _required(s):
+    if not s:
+        raise ValueError("Value cannot be empty.")
+    return s
+
+
+def _paid(s):
+    if s not in ("0", "1"):
+        raise ValueError("Use 0 or 1.")
+    return int(s)
+
+
+# table -> [(column, parser, default when blank; REQUIRED = no default)]
+REQUIRED = object()
+IMPORT_SPECS = {
+    "doctors": [
+        ("name", _required, REQUIRED),
+        ("specialization", _text, ""),
+        ("contact", _text, ""),
+    ],
+    "patients": [
+        ("name", _required, REQUIRED),
+        ("age", lambda s: parse_int(s, min_value=0), None),
+        ("gender", _text, ""),
+        ("contact", _text, ""),
+        ("disease", _text, ""),
+        ("doctor_id", parse_int, None),
+    ],
+    "appointments": [
+        ("patient_id", parse_int, REQUIRED),
+        ("doctor_id", parse_int, REQUIRED),
+        ("date", parse_date, REQUIRED),
+        ("time", parse_time, REQUIRED),
+        ("notes", _text, ""),
+    ],
+    "lab_tests": [
+        ("patient_id", parse_int, REQUIRED),
+        ("test_name", _required, REQUIRED),
+        ("cost", lambda s: parse_float(s, min_value=0), 0.0),
+        ("result", _text, None),
+        ("ordered_on", parse_timestamp, lambda: datetime.now().isoformat(timespec="seconds")),
+        ("reported_on", parse_timestamp, None),
+    ],
+    "billing": [
+        ("patient_id", parse_int, REQUIRED),
+        ("amount", lambda s: parse_float(s, min_value=0), REQUIRED),
+        ("description", _text, ""),
+        ("billed_on", parse_date, lambda: datetime.now().date().isoformat()),
+        ("paid", _paid, 0),
+    ],
+}
+
+
+def validate_import_row(spec, row):
+    """Map one input record (dict of strings) to insert parameters."""
+    params = []
+    for column, parse, default in spec:
+        value = row.get(column)
+        value = "" if value is None else str(value).strip()
+        if value == "":
+            if default is REQUIRED:
+                raise ValueError(f"{column}: Value cannot be empty.")
+            params.append(default() if callable(default) else default)
+            continue
+        try:
+            params.append(parse(value))
+        except ValueError as e:
+            raise ValueError(f"{column}: {e}") from None
+    return params
+
+
+def _read_records(f, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else {"_invalid": line.rstrip("\n")}
+
+
+class RejectWriter:
+    """Streams rejected records and their error to a CSV or NDJSON file."""
+
+    def __init__(self, path, fmt, columns):
+        self.path, self.fmt, self.columns = path, fmt, columns
+        self.count = 0
+        self._f = self._writer = None
+
+    def write(self, record, error):
+        if self._f is None:
+            self._f = open(self.path, "w", newline="", encoding="utf-8")
+            if self.fmt == "csv":
+                self._writer = csv.DictWriter(self._f, self.columns + ["error"],
+                                              extrasaction="ignore")
+                self._writer.writeheader()
+        self.count += 1
+        if self.fmt == "csv":
+            self._writer.writerow(dict(record, error=error))
+        else:
+            self._f.write(json.dumps(dict(record, _error=error)) + "\n")
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+
+def _insert_chunk(conn, sql, chunk, rejects):
+    try:
+        with conn:
+            conn.executemany(sql, [params for _, params in chunk])
+        return len(chunk)
+    except sqlite3.Error:
+        pass
+    # Replay row by row so only the offending rows (e.g. unknown IDs) are rejected.
+    inserted = 0
+    with conn:
+        for record, params in chunk:
+            try:
+                conn.execute(sql, params)
+                inserted += 1
+            except sqlite3.Error as e:
+                rejects.write(record, str(e))
+    return inserted
+
+
+def import_file(path, table=None, fmt=None, reject_path=None, chunk_size=IMPORT_CHUNK_SIZE):
+    base, ext = os.path.splitext(path)
+    table = table or os.path.basename(base)
+    if table not in IMPORT_SPECS:
+        raise ValueError(f"Unknown table {table!r}; use --table ({', '.join(IMPORT_SPECS)})")
+    fmt = fmt or ("ndjson" if ext.lower() in (".ndjson", ".jsonl") else "csv")
+    spec = IMPORT_SPECS[table]
+    columns = [column for column, _, _ in spec]
+    # Doctor ids are checked against the directory, on this connection, so an
+    # unknown one rejects its row rather than failing the chunk's insert.
+    doctor_at = columns.index("doctor_id") if "doctor_id" in columns else None
+    sql = (f"INSERT INTO {table}({', '.join(columns)}) "
+           f"VALUES({', '.join('?' * len(columns))})")
+    rejects = RejectWriter(reject_path or f"{base}.rejects.{fmt}", fmt, columns)
+
+    inserted = seen = 0
+    start = time.perf_counter()
+    with connect() as conn, open(path, newline="", encoding="utf-8") as f:
+        chunk = []
+        for record in _read_records(f, fmt):
+            seen += 1
+            try:
+                if "_invalid" in record:
+                    raise ValueError("Not a JSON object.")
+                params = validate_import_row(spec, record)
+                if doctor_at is not None and params[doctor_at] is not None \
+                        and not DOCTORS.exists(params[doctor_at], conn):
+                    raise ValueError(f"doctor_id: No doctor with ID {params[doctor_at]}.")
+                chunk.append((record, params))
+            except ValueError as e:
+                rejects.write(record, str(e))
+            if len(chunk) >= chunk_size:
+                inserted += _insert_chunk(conn, sql, chunk, rejects)
+                chunk = []
+                rate = seen / (time.perf_counter() - start)
+                print(f"\r{seen} rows read, {inserted} imported, {rejects.count} rejected "
+                      f"({rate:.0f} rows/s)", end="", file=sys.stderr, flush=True)
+        if chunk:
+            inserted += _insert_chunk(conn, sql, chunk, rejects)
+    rejects.close()
+    print(f"\r{seen} rows read, {inserted} imported into {table}, {rejects.count} rejected "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if rejects.count:
+        print(f"Rejected rows written to {rejects.path}", file=sys.stderr)
+    return inserted, rejects.count
+
+
+# ---------------------------
+# Export (CSV / columnar)
+# ---------------------------
+# Columnar files (.hmsc) hold a query result as row groups of typed arrays,
+# so analytics jobs can load a column with one array.frombytes() call:
+#   magic b"HMSC1\n", u32 header length, JSON header {"name", "columns"}
+#   per row group: u32 row count (0 ends the file), then per column
+#     1 byte type: b"q" int64 / b"d" float64 / b"s" uint32 dictionary codes
+#     null bitmap (1 bit per row, set = NULL), ceil(rows / 8) bytes
+#     for b"s": u32 entry count, then u32 length + UTF-8 bytes per entry
+#     the values array (NULLs stored as 0)
+# Integers are little-endian. Types are chosen per row group from the values.
+EXPORT_GROUP_ROWS = 65536
+COLUMNAR_MAGIC = b"HMSC1\n"
+EXPORTS = {name: LISTINGS[name]["headers"] for name in LISTINGS}
+EXPORTS["doctor_load"] = DOCTOR_LOAD_HEADERS
+
+
+def _le(arr):
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _encode_column(values):
+    nulls = bytearray((len(values) + 7) // 8)
+    for i, v in enumerate(values):
+        if v is None:
+            nulls[i >> 3] |= 1 << (i & 7)
+    present = [v for v in values if v is not None]
+    if all(type(v) is int for v in present):
+        return b"q" + bytes(nulls) + _le(array("q", [0 if v is None else v for v in values]))
+    if all(type(v) in (int, float) for v in present):
+        return b"d" + bytes(nulls) + _le(array("d", [0.0 if v is None else v for v in values]))
+    codes, entries = {}, []
+    for v in present:
+        if v not in codes:
+            codes[v] = len(entries)
+            entries.append(v if isinstance(v, str) else str(v))
+    out = [b"s", bytes(nulls), struct.pack("<I", len(entries))]
+    for entry in entries:
+        data = entry.encode("utf-8")
+        out += [struct.pack("<I", len(data)), data]
+    out.append(_le(array("I", [0 if v is None else codes[v] for v in values])))
+    return b"".join(out)
+
+
+def write_columnar(f, name, columns, cur, group_rows=EXPORT_GROUP_ROWS):
+    header = json.dumps({"name": name, "columns": columns}).encode("utf-8")
+    f.write(COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header)
+    total = 0
+    while True:
+        rows = cur.fetchmany(group_rows)
+        if not rows:
+            break
+        f.write(struct.pack("<I", len(rows)))
+        for values in zip(*rows):
+            f.write(_encode_column(values))
+        total += len(rows)
+    f.write(struct.pack("<I", 0))
+    return total
+
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("Truncated columnar file.")
+    return data
+
+
+def _read_array(f, typecode, n):
+    arr = array(typecode)
+    arr.frombytes(_read_exact(f, arr.itemsize * n))
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def read_columnar(path):
+    """Yield (header, {column: (values, nulls)}) per row group of a .hmsc file.
+
+    values is an array (int64 / float64) or, for text columns, a list of
+    strings; nulls is the bitmap (bit i set = row i is NULL).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar export.")
+        (size,) = struct.unpack("<I", _read_exact(f, 4))
+        header = json.loads(_read_exact(f, size))
+        while True:
+            (n,) = struct.unpack("<I", _read_exact(f, 4))
+            if n == 0:
+                return
+            group = {}
+            for column in header["columns"]:
+                kind = _read_exact(f, 1)
+                nulls = _read_exact(f, (n + 7) // 8)
+                if kind == b"s":
+                    (count,) = struct.unpack("<I", _read_exact(f, 4))
+                    entries = []
+                    for _ in range(count):
+                        (length,) = struct.unpack("<I", _read_exact(f, 4))
+                        entries.append(_read_exact(f, length).decode("utf-8"))
+                    values = [entries[code] if entries else None
+                              for code in _read_array(f, "I", n)]
+                else:
+                    values = _read_array(f, kind.decode(), n)
+                group[column] = (values, nulls)
+            yield header, group
+
+
+def columnar_rows(path):
+    """Rows of a .hmsc file as tuples, with None for NULL."""
+    for header, group in read_columnar(path):
+        columns = []
+        for values, nulls in (group[c] for c in header["columns"]):
+            columns.append([None if nulls[i >> 3] >> (i & 7) & 1 else v
+                            for i, v in enumerate(values)])
+        yield from zip(*columns)
+
+
+def export_tables(names, out_dir, fmt="csv"):
+    """Export each query in names to out_dir; all from one read snapshot."""
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    with connect() as conn:
+        conn.execute("BEGIN")  # one snapshot for every export; writers continue (WAL)
+        try:
+            for name in names:
+                cur = conn.execute(QUERIES[name])
+                path = os.path.join(out_dir, f"{name}.{'csv' if fmt == 'csv' else 'hmsc'}")
+                start = time.perf_counter()
+                if fmt == "csv":
+                    with open(path, "w", newline="", encoding="utf-8") as f:
+                        writer = csv.writer(f)
+                        writer.writerow(EXPORTS[name])
+                        counts[name] = 0
+                        while True:
+                            rows = cur.fetchmany(EXPORT_GROUP_ROWS)
+                            if not rows:
+                                break
+                            writer.writerows(rows)
+                            counts[name] += len(rows)
+                else:
+                    with open(path, "wb") as f:
+                        counts[name] = write_columnar(f, name, EXPORTS[name], cur)
+                print(f"{name}: {counts[name]} rows -> {path} "
+                      f"({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+        finally:
+            conn.rollback()
+    return counts
+
+
 # ---------------------------
 # Menus
 # ---------------------------
@@ -589,6 +3217,7 @@ MAIN_MENU = dedent("""\
     5) Billing
     6) Reports
     7) Seed Sample Data
+    8) Search Patients / Doctors
     0) Exit
 """)
 
@@ -615,6 +3244,7 @@ APPT_MENU = dedent("""\
     1) Schedule Appointment
     2) View Appointments
     3) Delete Appointment
+    4) Find Next Free Slot
     0) Back
 """)
 
@@ -640,6 +3270,8 @@ REPORT_MENU = dedent("""\
     \n-- Reports --
     1) Patient Summary
     2) Doctor Workload
+    3) Revenue
+    4) Lab Turnaround
     0) Back
 """)
 
@@ -690,6 +3322,8 @@ def appointments_menu():
             view_appointments(); press_enter()
         elif choice == "3":
             delete_appointment(); press_enter()
+        elif choice == "4":
+            find_next_slot(); press_enter()
         elif choice == "0":
             return
         else:
@@ -740,6 +3374,10 @@ def reports_menu():
             report_patient_summary(); press_enter()
         elif choice == "2":
             report_doctor_load(); press_enter()
+        elif choice == "3":
+            report_revenue(); press_enter()
+        elif choice == "4":
+            report_lab_turnaround(); press_enter()
         elif choice == "0":
             return
         else:
@@ -765,6 +3403,8 @@ def main():
             reports_menu()
         elif choice == "7":
             seed_sample_data(); press_enter()
+        elif choice == "8":
+            search_records(); press_enter()
         elif choice == "0":
             print("Goodbye!")
             break
@@ -772,9 +3412,150 @@ def main():
             print("Invalid choice! Try again.")
 
 
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Hospital & Lab Management System")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every SQL statement; log slow ones (HOSPITAL_SLOW_QUERY_MS, "
+                             "default 100) and print the busiest on exit")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("explain", help="print query plans and check that each query uses its indexes")
+    sub.add_parser("rebuild-summaries", help="recompute the trigger-maintained summary tables")
+    imp = sub.add_parser("import", help="bulk-load a CSV or NDJSON file into a table")
+    imp.add_argument("file")
+    imp.add_argument("--table", choices=list(IMPORT_SPECS),
+                     help="target table (default: the file name, e.g. patients.csv)")
+    imp.add_argument("--format", choices=["csv", "ndjson"],
+                     help="default: from the file extension")
+    imp.add_argument("--reject", help="where to write rejected rows (default: <file>.rejects.<fmt>)")
+    imp.add_argument("--chunk", type=int, default=IMPORT_CHUNK_SIZE, help="rows per transaction")
+    slot = sub.add_parser("next-slot", help="print a doctor's next free appointment slot")
+    slot.add_argument("doctor_id", type=int)
+    slot.add_argument("--after", help="YYYY-MM-DD[ HH:MM] to search from (default: now)")
+    srch = sub.add_parser("search", help="full-text search patients or doctors")
+    srch.add_argument("query")
+    srch.add_argument("--table", choices=list(SEARCH_INDEXES), default="patients")
+    srch.add_argument("-k", type=int, default=SEARCH_K, help="number of results")
+    mig = sub.add_parser("migrate-legacy",
+                         help="move an old app.py database (hospital.db) onto this schema, online")
+    mig.add_argument("database")
+    mig.add_argument("--batch", type=int, default=LEGACY_BATCH_SIZE, help="rows per transaction")
+    mig.add_argument("--pause", type=float, default=0.01, help="seconds to sleep between batches")
+    mig.add_argument("--drop-legacy-columns", action="store_true",
+                     help="afterwards drop the old name columns")
+    rev = sub.add_parser("revenue", help="billed, collected and outstanding amounts by day or month")
+    rev.add_argument("--from", dest="start", help="first day, YYYY-MM-DD (default: first of this month)")
+    rev.add_argument("--to", dest="end", help="last day, YYYY-MM-DD (default: today)")
+    rev.add_argument("--by", choices=["day", "month"], default="day")
+    tat = sub.add_parser("lab-tat", help="lab turnaround percentiles per test or per week")
+    tat.add_argument("--by", choices=["test", "week"], default="test")
+    tat.add_argument("--from", dest="start", help="first order day, YYYY-MM-DD")
+    tat.add_argument("--to", dest="end", help="last order day, YYYY-MM-DD")
+    tat.add_argument("--histogram", action="store_true", help="also print a turnaround histogram")
+    tat.add_argument("--history", action="store_true", help="include archived lab tests")
+    arc = sub.add_parser("archive", help="move old appointments, reported lab tests and paid bills "
+                                         "to the archive database")
+    arc.add_argument("--before", required=True, help="archive rows dated before this day, YYYY-MM-DD")
+    arc.add_argument("--archive", dest="path", help="archive file (default: HOSPITAL_ARCHIVE_DB "
+                                                    "or <database>_archive.db)")
+    arc.add_argument("--batch", type=int, default=ARCHIVE_BATCH_ROWS, help="ids per transaction")
+    arc.add_argument("--vacuum", action="store_true",
+                     help="afterwards compact the database (blocks writers meanwhile)")
+    exp = sub.add_parser("export", help="export listings and reports to CSV or columnar files")
+    exp.add_argument("names", nargs="*", metavar="NAME",
+                     help=f"what to export (default: all of {', '.join(EXPORTS)})")
+    exp.add_argument("--out", default="export", help="output directory (default: ./export)")
+    exp.add_argument("--format", choices=["csv", "columnar"], default="csv")
+    args = parser.parse_args(argv)
+    if args.profile:
+        atexit.register(enable_profiling().report)
+
+    if args.command == "explain":
+        init_db()
+        return explain_queries()
+    if args.command == "rebuild-summaries":
+        init_db()
+        return rebuild_summaries_command()
+    if args.command == "import":
+        init_db()
+        try:
+            _, rejected = import_file(args.file, args.table, args.format, args.reject, args.chunk)
+        except (OSError, ValueError) as e:
+            print(f"Import failed: {e}", file=sys.stderr)
+            return 2
+        return 1 if rejected else 0
+    if args.command == "next-slot":
+        init_db()
+        date, _, hhmm = (args.after or datetime.now().strftime("%Y-%m-%d %H:%M")).partition(" ")
+        try:
+            date, hhmm = parse_date(date), parse_time(hhmm or "00:00")
+        except ValueError as e:
+            parser.error(str(e))
+        with connect() as conn:
+            if not DOCTORS.exists(args.doctor_id, conn):
+                print("Doctor not found.", file=sys.stderr)
+                return 1
+            print("{} {}".format(*SLOTS.next_free(conn, args.doctor_id, date, hhmm)))
+        return 0
+    if args.command == "search":
+        init_db()
+        headers = SEARCH_HEADERS[args.table]
+        with connect() as conn:
+            rows = search(conn, args.table, args.query, args.k)
+        pager = TablePager(headers, PAGE_SIZE, interactive=False)
+        pager.show(rows)
+        pager.close()
+        return 0 if rows else 1
+    if args.command == "migrate-legacy":
+        if not os.path.exists(args.database):
+            parser.error(f"{args.database} does not exist")
+        migrate_legacy(args.database, args.batch, args.pause)
+        if args.drop_legacy_columns:
+            try:
+                drop_legacy_columns(args.database)
+            except RuntimeError as e:
+                print(e, file=sys.stderr)
+                return 1
+            print("Legacy name columns dropped.", file=sys.stderr)
+        return 0
+    if args.command == "revenue":
+        today = datetime.now().date()
+        try:
+            start = parse_date(args.start or today.replace(day=1).isoformat())
+            end = parse_date(args.end or today.isoformat())
+        except ValueError as e:
+            parser.error(str(e))
+        init_db()
+        print_revenue(start, end, args.by, interactive=False)
+        return 0
+    if args.command == "lab-tat":
+        try:
+            start, end = (parse_date(day) if day else None for day in (args.start, args.end))
+        except ValueError as e:
+            parser.error(str(e))
+        init_db()
+        print_lab_turnaround(args.by, start, end, args.histogram, interactive=False,
+                             history=args.history)
+        return 0
+    if args.command == "archive":
+        try:
+            before = parse_date(args.before)
+        except ValueError as e:
+            parser.error(str(e))
+        return archive_command(before, args.path, args.batch, args.vacuum)
+    if args.command == "export":
+        unknown = [name for name in args.names if name not in EXPORTS]
+        if unknown:
+            parser.error(f"unknown export {unknown[0]!r} (choose from {', '.join(EXPORTS)})")
+        init_db()
+        export_tables(args.names or list(EXPORTS), args.out, args.format)
+        return 0
+    main()
+    return 0
+
+
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(cli())
     except KeyboardInterrupt:
         print("\nExiting...")
         sys.exit(0)